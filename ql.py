@@ -4,21 +4,160 @@
 # (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
 #
 
-import sys
+from __future__ import print_function
 
-import src.gui
-import src.cmp_plot
+import sys
 
 def usage():
-    print './ql.py : simulates a robot'
-    print './ql.py cmp [FILES] : compares several runs'
+    print('./ql.py : simulates a robot')
+    print('./ql.py cmp [OPTIONS] FILES : compares several runs')
+    print('    -s, --summary=OUT     save statistics across runs (- for stdout)')
+    print('    -p, --png=OUT         plot the runs (or their statistics) to OUT')
+    print('    -q, --quantiles=Q     comma separated quantiles (default .1,.5,.9)')
+    print('    -w, --window=W        width of the moving average (default 10)')
+    print('    -r, --rows=R          at most R rows, epochs are grouped (1000)')
+    print('                          (without -s or -p: print all rewards)')
+    print('./ql.py convert OLD NEW : converts a run saved as a pickle')
+    print('./ql.py run [OPTIONS] FILE : trains a robot without the GUI')
+    print('    -a, --alpha=α         learning rate (default .1)')
+    print('    -g, --gamma=γ         discount factor (default .1)')
+    print('    -e, --epsilon=ε       use ε-greedy selection (default, ε = .1)')
+    print('    -t, --tau=τ           use softmax selection')
+    print('    -S, --sarsa           use SARSA instead of Q-learning')
+    print('    -L, --lambda=λ        use eligibility traces: Q(λ) or SARSA(λ)')
+    print('    -r, --max-steps=R     steps in an epoch (default 100)')
+    print('    -d, --dense           keep the utilities in an array')
+    print('    -p, --precompute      precompute states, rewards and moves')
+    print('    --replay=C            replay transitions, keeping the last C')
+    print('    --minibatch=B         transitions replayed at once (default 32)')
+    print('    --replay-every=K      steps between minibatches (default 8)')
+    print('    --plan=MODE           plan with a learned model: dyna or sweep')
+    print('    --plan-steps=N        simulated backups after each step (10)')
+    print('    --plan-threshold=θ    smallest error queued by sweep (1e-4)')
+    print('    --converge=W          stop when the learning converged over the')
+    print('                          last W epochs')
+    print('    --policy-tol=P        greedy policy changes per epoch allowed,')
+    print('                          on average over W (default .5)')
+    print('    --delta-tol=Δ         largest utility change allowed in W')
+    print('    -W, --warm-start      start from the solution of the world')
+    print('                          (needs numpy, see solve)')
+    print('    -b, --batch=K         train K robots at once (needs numpy)')
+    print('    -s, --seed=S          seed of the random numbers')
+    print('    -n, --epochs=E        stop after E epochs')
+    print('    -k, --steps=K         stop after K steps')
+    print('    -o, --output=OUT      save rewards to OUT (default: print them)')
+    print('                          (OUT.k for the k-th robot in batch mode)')
+    print('    -c, --checkpoint=CP   save the simulation in CP periodically')
+    print('    --every=E             epochs between checkpoints (default 100)')
+    print('    --resume              continue from CP if it exists (-n and -k')
+    print('                          count from the start of the run)')
+    print('    -T, --telemetry=OUT   time the hot paths, write JSON lines to OUT')
+    print('                          (- for a readable report on stderr)')
+    print('    --telemetry-every=S   seconds between reports (default 1)')
+    print('    --store=DIR           reuse the results of the same run (same')
+    print('                          world, settings, seed and limits) kept in')
+    print('                          DIR, keep them there otherwise')
+    print('./ql.py sweep [OPTIONS] FILES : runs all combinations of settings')
+    print('    -a, -g, -e, -t        comma separated lists of values')
+    print('    -l, --learning=L      comma separated list of q, sarsa')
+    print('    -L, --lambda=L        comma separated list of λ values')
+    print('    -r, -d, -p, -n, -k    same as for run')
+    print('    -W, --converge, --policy-tol, --delta-tol  same as for run')
+    print('    --store=DIR           same as for run, only the missing runs')
+    print('                          are done')
+    print('    -o, --output=DIR      save rewards in DIR (default .)')
+    print('    -j, --jobs=J          parallel jobs (default: all processors)')
+    print('    -c, --chunk=C         jobs sent to a worker at once')
+    print('    -s, --seed=S          base seed, each run gets its own from it')
+    print('./ql.py search [OPTIONS] FILES : searches the settings on a budget')
+    print('    -n, --epochs=E        epochs of the first rung')
+    print('    -N, --max-epochs=E    epochs of the last rung')
+    print('    --eta=η               promote the best 1/η of each rung (3)')
+    print('    --hyperband           run all the Hyperband brackets instead of')
+    print('                          a single successive halving')
+    print('    -o, --output=DIR      rewards and checkpoints in DIR (default .)')
+    print('    -a, -g, -e, -t, -l, -L  same as for sweep')
+    print('    -r, -d, -p, -W, -j, -s  same as for sweep')
+    print('    --converge, --policy-tol, --delta-tol  same as for run')
+    print('./ql.py seeds [OPTIONS] FILE : runs seeds until the confidence')
+    print('                          intervals are narrow enough')
+    print('    -m, --metric=M:W      stop when the interval of metric M is at')
+    print('                          most ±W: final (mean reward of the last')
+    print('                          10 epochs) or reach (epochs to reach the')
+    print('                          threshold), can be repeated')
+    print('    --threshold=R         reward to reach, averaged over a window')
+    print('    --window=W            width of the window (default 10)')
+    print('    --confidence=C        confidence level (default .95)')
+    print('    --min-seeds=N         seeds done at least (default 5)')
+    print('    --max-seeds=N         seeds done at most (default 100)')
+    print('    -o, --output=DIR      save the rewards of each seed in DIR')
+    print('    -j, -s, --store       same as for sweep')
+    print('    other options         same as for run')
+    print('./ql.py solve [OPTIONS] FILE [RUNS] : solves a world exactly')
+    print('    -g, --gamma=γ         discount factor (default .1)')
+    print('    -r, --max-steps=R     steps in an epoch (default 100)')
+    print('                          (RUNS: reward logs, prints their regret)')
+    print('                          (needs numpy)')
+    print('./ql.py store [OPTIONS] DIR : shows or cleans a store of results')
+    print('    -l, --list            list the runs in the store')
+    print('    -a, --max-age=DAYS    remove the runs not used for DAYS days')
+    print('    -z, --max-size=MB     remove the least recently used runs until')
+    print('                          the store takes at most MB megabytes')
+    print('./ql.py bench [OPTIONS] : measures the speed of the learning loop')
+    print('    -o, --output=OUT      save the results in OUT (JSON)')
+    print('    -b, --baseline=BASE   compare with results saved earlier, exit')
+    print('                          with status 1 on regressions')
+    print('    -t, --threshold=T     slowdown flagged as a regression (.1)')
+    print('    -r, --repeat=R        best of R measurements (default 3)')
+    print('    -k, --select=PAT      only benchmarks matching PAT (glob)')
+    print('    -q, --quick           do less work for each benchmark')
 
 if __name__ == '__main__':
+    # each command imports only what it needs
     if len(sys.argv) >= 3 and sys.argv[1] == 'cmp':
+        import src.cmp_plot
         if not src.cmp_plot.main(sys.argv[2:]):
             usage()
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'convert':
+        import src.cmp_plot
+        if not src.cmp_plot.convert(sys.argv[2:]):
+            usage()
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'run':
+        import src.headless
+        if not src.headless.main(sys.argv[2:]):
+            usage()
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'sweep':
+        import src.sweep
+        if not src.sweep.main(sys.argv[2:]):
+            usage()
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'search':
+        import src.search
+        if not src.search.main(sys.argv[2:]):
+            usage()
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'seeds':
+        import src.seeds
+        if not src.seeds.main(sys.argv[2:]):
+            usage()
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'solve':
+        try:
+            # needs numpy, import only when really used
+            import src.solver
+        except ImportError:
+            print('Solving needs numpy')
+        else:
+            if not src.solver.main(sys.argv[2:]):
+                usage()
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'store':
+        import src.store
+        if not src.store.main(sys.argv[2:]):
+            usage()
+    elif len(sys.argv) >= 2 and sys.argv[1] == 'bench':
+        import src.bench
+        if not src.bench.main(sys.argv[2:]):
+            usage()
     elif len(sys.argv) == 1:
-       src.gui.main()
+        # import here, the GUI is not needed (nor available) everywhere
+        import src.gui
+        src.gui.main()
     else:
         usage()
-
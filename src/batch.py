@@ -0,0 +1,445 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Several independent copies of the world and of the robot, stepped together
+# using numpy arrays. The dynamics and the learning rules are the same as the
+# ones from world.py and robot.py, only that everything is done for all the
+# environments at once.
+#
+# Internally, actions are column indices (see ACTIONS), states are codes (see
+# encode_state). As in World with precomputed tables, the positions of the
+# robots are indices, (x * M + y) * 4 + orientation - 1, so a step is only a
+# few lookups in flat arrays (numpy.take), done for all the robots at once.
+#
+# The random numbers are drawn in blocks, one uniform number for each robot
+# and each action chosen: it decides both whether to explore and the random
+# action (see BatchRobot._choose_actions). The results are the same, in
+# distribution, as those of K robots from robot.py, not the same numbers.
+#
+
+import numpy
+
+from . import fields
+from . import worldfile
+from .globaldefs import *
+
+def build_state_table(N, M, D, dist_fields=None):
+    """
+    Builds the table of state codes for each position and orientation.
+
+    dist_fields the distances to the obstacles (see fields.distance_fields),
+                if the world has any
+    return      array of shape (N, M, 4), indexed by x, y and orientation - 1
+    """
+    if dist_fields is not None:
+        dist = numpy.frombuffer(dist_fields, numpy.dtype(dist_fields.typecode))
+        dist = dist.reshape(N, M, 4).astype(int)
+    else:
+        x = numpy.arange(N).reshape(N, 1)
+        y = numpy.arange(M).reshape(1, M)
+        # distances to the walls when facing north (NESW), trimmed to D
+        dist = numpy.empty((N, M, 4), dtype=int)
+        dist[:, :, 0] = y
+        dist[:, :, 1] = N - x - 1
+        dist[:, :, 2] = M - y - 1
+        dist[:, :, 3] = x
+        numpy.minimum(dist, D, out=dist)
+    weights = (D + 1) ** numpy.arange(3, -1, -1)
+    codes = numpy.empty((N, M, 4), dtype=int)
+    for o in range(4):
+        # rotate: facing orientation o + 1, sensor i sees direction o + i
+        rotated = dist[:, :, (numpy.arange(4) + o) % 4]
+        codes[:, :, o] = rotated.dot(weights)
+    return codes
+
+def build_reward_table(D, d1, d2):
+    """
+    Builds the table of rewards for each state code, with the same rules as
+    World._get_reward.
+
+    return  array of shape (state_count(D),)
+    """
+    codes = numpy.arange(state_count(D))
+    state = numpy.empty((len(codes), 4), dtype=int)
+    for i in range(3, -1, -1):
+        codes, state[:, i] = numpy.divmod(codes, D + 1)
+    front, right, back = state[:, FRONT], state[:, RIGHT], state[:, BACK]
+    m = state.min(axis=1)
+    closest = right == m
+    a = numpy.where(closest, 5, -5)
+    a += numpy.where(front == right, numpy.where(closest, -8, 0),
+            numpy.where(back == right, numpy.where(closest, -4, 0), 0))
+    a = numpy.where(m > d2, -50, a)
+    return numpy.where((m < d1) | (front == 0), -100, a)
+
+# The rows have only a few columns, reducing them with numpy (max(axis=1),
+# argmax, cumsum) is much slower than going through the columns.
+
+def row_max(qs):
+    """
+    Returns the max of each row of qs.
+    """
+    m = qs[:, 0].copy()
+    for c in range(1, qs.shape[1]):
+        numpy.maximum(m, qs[:, c], out=m)
+    return m
+
+def best_columns(qs):
+    """
+    Returns the column of the max of each row of qs, the last one on ties (as
+    qtable.best_column).
+    """
+    m = row_max(qs)
+    a = numpy.zeros(len(qs), dtype=int)
+    for c in range(1, qs.shape[1]):
+        numpy.copyto(a, c, where=qs[:, c] == m)
+    return a
+
+def softmax_choices(qs, tau, u, buf=None):
+    """
+    Selects a column for each row of qs using a Gibbs distribution (see
+    robot.Softmax). The max of each row is subtracted before exponentiating.
+
+    qs      array of shape (K, n), the values for each row
+    tau     the temperature τ
+    u       uniform random numbers in [0, 1), one for each row
+    buf     optional array of the same shape as qs, used to avoid allocating
+            the intermediate values
+    return  array of K columns
+    """
+    z = numpy.divide(qs, tau, out=buf)
+    z -= row_max(z)[:, None]
+    numpy.exp(z, out=z)
+    n = qs.shape[1]
+    for c in range(1, n):
+        z[:, c] += z[:, c - 1]
+    u = u * z[:, -1]
+    a = numpy.zeros(len(qs), dtype=int)
+    for c in range(n - 1):
+        a += z[:, c] <= u
+    return a
+
+# Uniform numbers drawn at once, for all robots.
+BLOCK = 1 << 16
+
+class BatchRobot(object):
+    """
+    K independent robots, each with its own Q-table, learning together.
+
+    Simple workflow:
+        __init__ -> [a:] step -> receive_reward_and_state -> goto a
+    """
+
+    def __init__(self, config, K, rng):
+        """
+        Construct the robots.
+
+        config  The user configurations which affect the robots (same keys
+                as for the Robot).
+        K       Number of robots.
+        rng     numpy RandomState used for all random decisions.
+        """
+        self._greedy = config['greedy?']
+        self._eps_or_tau = config['___ε/τ']
+        # with ε = 0, never explore (but don't divide by 0)
+        self._eps = max(self._eps_or_tau, numpy.finfo(float).tiny)
+        self._Q_or_SARSA = config['Q?']
+        self._alpha = config['___α']
+        self._gamma = config['___γ']
+        self._rng = rng
+        self._rows = numpy.arange(K)
+
+        # state, action utilities of each robot and the states each one saw
+        # (only needed by ε-greedy)
+        S = config['states']
+        self._Q = numpy.zeros((K, S, len(ACTIONS)))
+        self._seen = numpy.zeros((K, S), dtype=bool)
+        # the same, flat: the row of state s of robot k is k * S + s
+        self._rowsQ = self._Q.reshape(K * S, len(ACTIONS))
+        self._flatQ = self._Q.reshape(-1)
+        self._flatseen = self._seen.reshape(-1)
+        self._base = self._rows * S
+        # offset of the first utility of each row of a (K, 3) array
+        self._cols = self._rows * len(ACTIONS)
+
+        # decided upon actions (when using SARSA), None if none
+        self._next = None
+        # rows of the current states and if they were seen, None if not known
+        self._i = self._known = None
+        # offsets of the utilities of the actions taken
+        self._j = None
+
+        # uniform numbers, a row for each step
+        self._u = numpy.empty((0, K))
+        self._ui = 0
+
+        # buffer for the softmax selection
+        self._buf = numpy.empty((K, len(ACTIONS)))
+
+    def step(self, states):
+        """
+        Does a single step for each robot.
+
+        states  Current states
+        return  Actions (columns)
+        """
+        i = self._i
+        if i is None:
+            i = self._base + states
+            if self._greedy:
+                self._known = self._flatseen.take(i)
+        if self._next is not None:
+            # SARSA, chosen when learning
+            a = self._next
+        else:
+            a = self._choose_actions(self._rowsQ.take(i, axis=0), self._known)
+        if self._greedy:
+            self._flatseen[i] = True
+        self._j = i * len(ACTIONS) + a
+        return a
+
+    def end_epoch(self):
+        """
+        Called when the epochs end, before the robots are moved back to the
+        start position.
+        """
+        self._i = None
+
+    def receive_reward_and_state(self, olds, a, news, r):
+        """
+        Receive the rewards after taking actions from olds states, reaching
+        news states. Does the update of all robots at once.
+
+        olds    Old states
+        a       Actions (columns) taken in those states
+        news    New states
+        r       Rewards given
+        """
+        # the rows of states never seen are 0, so their utility is 0
+        i = self._i = self._base + news
+        qs = self._rowsQ.take(i, axis=0)
+        if self._greedy:
+            self._known = self._flatseen.take(i)
+        if self._Q_or_SARSA:
+            # Q learning
+            q = row_max(qs)
+        else:
+            # SARSA
+            n = self._next = self._choose_actions(qs, self._known)
+            q = qs.take(self._cols + n)
+        j = self._j
+        qa = self._flatQ.take(j)
+        q *= self._gamma
+        q += r
+        q -= qa
+        q *= self._alpha
+        q += qa
+        self._flatQ[j] = q
+
+    def _uniforms(self):
+        """
+        Returns a uniform number in [0, 1) for each robot.
+        """
+        if self._ui == len(self._u):
+            K = len(self._rows)
+            self._u = self._rng.random_sample((max(1, BLOCK // K), K))
+            self._ui = 0
+        self._ui += 1
+        return self._u[self._ui - 1]
+
+    def _choose_actions(self, qs, known):
+        """
+        Choose an action for each robot, given the utilities of the actions.
+        The action of a robot in a state never seen is random.
+
+        qs      Array of shape (K, 3), the utilities for each robot.
+        known   Array of K values, True if the state was seen (only used by
+                ε-greedy, softmax is uniform on the 0 utilities of a new state)
+        return  Actions (columns)
+        """
+        u = self._uniforms()
+        if self._greedy:
+            # ε-greedy selection, ties go to the last column as in Robot;
+            # u < ε explores and then u / ε is uniform in [0, 1) too
+            eps = numpy.where(known, self._eps, 1.0)
+            best = best_columns(qs)
+            a = numpy.where(u < eps, u * len(ACTIONS) / eps, best)
+            return a.astype(int)
+        # softmax selection
+        return softmax_choices(qs, self._eps_or_tau, u, self._buf)
+
+    def get_Q(self):
+        """
+        Returns the utilities of all robots, array of shape (K, states, 3).
+        """
+        return self._Q
+
+class BatchWorld(object):
+    """
+    K independent worlds, each with one robot, stepped together. All worlds
+    have the same description (from the configuration) and the same epoch
+    length.
+
+    Simple workflow:
+        __init__ -> [a:] step -> goto a
+    """
+
+    def __init__(self, config, K, seed=None):
+        """
+        Constructs the worlds.
+
+        config  The user configuration dictionary.
+        K       Number of worlds.
+        seed    Seed of the random generator used by all robots.
+        """
+        self._N = config['N']
+        self._M = config['M']
+        self._D = config['D']
+        self._xs = config['xs']
+        self._ys = config['ys']
+        self._runs = config['runs']
+        self._K = K
+
+        self._walls = None
+        dist = None
+        walls = worldfile.get_map(config)
+        if walls is not None:
+            dist = fields.distance_fields(walls, self._N, self._M, self._D)
+            self._walls = numpy.frombuffer(bytes(walls), numpy.uint8)
+            self._walls = self._walls.reshape(self._N, self._M).astype(bool)
+        codes = build_state_table(self._N, self._M, self._D, dist)
+        rewards = build_reward_table(self._D, config['d1'], config['d2'])
+        self._build_tables(codes, rewards)
+        start = self._index(self._xs, self._ys, ROBOT_S)
+        self._start = start * len(ACTIONS)
+        self._startstate = self._tstate[start]
+
+        # all the epochs end at the same time, one counter is enough
+        self._crun = 0
+        # positions, times len(ACTIONS)
+        self._pos = numpy.full(K, self._start, dtype=int)
+        self._state = numpy.full(K, self._startstate, dtype=int)
+        self._rec = numpy.zeros(K, dtype=int)
+        self._build_robots(config, numpy.random.RandomState(seed))
+
+    def _index(self, x, y, o):
+        """
+        Returns the indices of positions and orientations.
+        """
+        return (x * self._M + y) * ROBOT_W + o - 1
+
+    def _build_tables(self, codes, rewards):
+        """
+        Precomputes, for every position and orientation, the state, the reward
+        and the position and orientation reached after each action.
+
+        codes   the state codes, see build_state_table
+        rewards the rewards of each state code, see build_reward_table
+        """
+        x, y, o = numpy.meshgrid(numpy.arange(self._N), numpy.arange(self._M),
+                numpy.arange(ROBOT_N, ROBOT_W + 1), indexing='ij')
+        x, y, o = x.ravel(), y.ravel(), o.ravel()
+        self._tstate = codes[x, y, o - 1]
+        self._treward = rewards[self._tstate]
+        # each position with each action, in the order of ACTIONS: the
+        # position reached (times len(ACTIONS), to add the next action to
+        # it), its state and its reward
+        n = len(ACTIONS)
+        act = numpy.tile(numpy.arange(n), len(x))
+        x, y, o = self._move(x.repeat(n), y.repeat(n), o.repeat(n), act)
+        nxt = self._index(x, y, o)
+        self._tnext = nxt * n
+        self._tnextstate = self._tstate.take(nxt)
+        self._tnextreward = self._treward.take(nxt)
+
+    def _build_robots(self, config, rng):
+        """
+        Builds the robots.
+        """
+        d = {}
+        d['greedy?'] = config['greedy?']
+        d['___ε/τ'] = config['ε/τ']
+        d['Q?'] = config['Q?']
+        d['___α'] = config['α']
+        d['___γ'] = config['γ']
+        d['states'] = state_count(self._D)
+        self._robots = BatchRobot(d, self._K, rng)
+
+    def step(self):
+        """
+        Does one step of evolution in all worlds.
+
+        return  a tuple (epoch ended, array of the current total rewards), the
+                rewards being the totals of the ended epochs if they ended (all
+                the epochs end at the same step)
+        """
+        self._crun += 1
+        ended = self._crun >= self._runs
+        if ended:
+            # reset state
+            reward = self._rec.copy()
+            self._robots.end_epoch()
+            self._crun = 0
+            self._pos.fill(self._start)
+            self._state.fill(self._startstate)
+            self._rec.fill(0)
+
+        state = self._state
+        act = self._robots.step(state)
+        j = self._pos + act
+        self._pos = self._tnext.take(j)
+        newstate = self._tnextstate.take(j)
+        r = self._tnextreward.take(j)
+        self._rec += r
+        self._robots.receive_reward_and_state(state, act, newstate, r)
+        self._state = newstate
+        return (ended, reward if ended else self._rec)
+
+    def _move(self, x, y, o, act):
+        """
+        Returns the positions and orientations reached after the actions
+        (columns).
+        """
+        forward = act == FORWARD - TURN_RIGHT
+        vertical = forward & (o % 2 == 1)
+        horizontal = forward & (o % 2 == 0)
+        nx = numpy.clip(x - numpy.where(horizontal, o - 3, 0), 0, self._N - 1)
+        ny = numpy.clip(y + numpy.where(vertical, o - 2, 0), 0, self._M - 1)
+        if self._walls is not None:
+            # cannot enter an obstacle
+            blocked = self._walls[nx, ny]
+            nx[blocked] = x[blocked]
+            ny[blocked] = y[blocked]
+        left = act == TURN_LEFT - TURN_RIGHT
+        right = act == TURN_RIGHT - TURN_RIGHT
+        no = numpy.where(left, 1 + o % ROBOT_W,
+                numpy.where(right, 1 + (o - 2) % ROBOT_W, o))
+        return (nx, ny, no)
+
+    def get_robots(self):
+        """
+        Returns the robots.
+        """
+        return self._robots
+
+def train(config, K, epochs=0, steps=0, seed=None):
+    """
+    Trains K robots on the same world, for a number of epochs or steps,
+    whichever comes first (0 meaning no limit for that counter).
+
+    return  list of K lists, the rewards of each ended epoch for each robot
+    """
+    w = BatchWorld(config, K, seed)
+    rewards = [[] for k in range(K)]
+    target = epochs if epochs else -1
+    limit = steps if steps else -1
+    done = ended = 0
+    while done != limit and ended != target:
+        end, r = w.step()
+        if end:
+            for l, x in zip(rewards, r.tolist()):
+                l.append(x)
+            ended += 1
+        done += 1
+    return rewards
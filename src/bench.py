@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Benchmarks of the learning loop: micro benchmarks of the functions called
+# on each step and macro benchmarks of entire epochs, for several world sizes
+# and learning settings. Results can be saved as JSON and compared with a
+# baseline saved earlier, flagging the benchmarks which got slower.
+#
+
+from __future__ import print_function
+
+import fnmatch
+import functools
+import getopt
+import json
+import platform
+import sys
+import time
+import timeit
+
+from . import headless
+from . import robot
+from . import world
+from .compat import xrange
+
+OPTIONS = 'o:b:t:r:k:q'
+LONG_OPTIONS = ['output=', 'baseline=', 'threshold=', 'repeat=', 'select=',
+        'quick']
+
+# The world used by the micro benchmarks (same as test/2/2.txt).
+MICRO_WORLD = {'N' : 24, 'M' : 32, 'D' : 6, 'xs' : 14, 'ys' : 16, 'd1' : 2,
+        'd2' : 5}
+
+# The matrix of the macro benchmarks.
+GRIDS = [(8, 8), (24, 32), (64, 64)]
+DS = [3, 6]
+LEARNING = [('q', True), ('sarsa', False)]
+SELECTION = [('greedy', True, .1), ('softmax', False, 1.)]
+
+# Calls done by a micro benchmark and epochs done by a macro benchmark.
+CALLS = 20000
+EPOCHS = 100
+# Epochs done before measuring, so that the robot knows some states.
+WARMUP = 20
+
+# Default relative slowdown flagged as a regression.
+THRESHOLD = .1
+
+SEED = 1
+
+def world_config(w, settings=None):
+    """
+    Builds the configuration of a simulation on a world given as a
+    dictionary (like MICRO_WORLD), without a world file.
+    """
+    d = dict(headless.DEFAULTS)
+    d.update(w)
+    d['seed'] = SEED
+    if settings:
+        d.update(settings)
+    return d
+
+def grid_world(N, M, D):
+    """
+    Returns a world of size N x M, with the sensors limited to D, the robot
+    starting in the middle.
+    """
+    return {'N' : N, 'M' : M, 'D' : D, 'xs' : N // 2, 'ys' : M // 2,
+            'd1' : 1, 'd2' : D // 2 + 1}
+
+def measure(f, number, repeat):
+    """
+    Calls f number times, repeat times, and returns the best rate, in calls
+    per second.
+    """
+    best = min(timeit.repeat(f, number=number, repeat=repeat))
+    return number / best if best > 0 else float('inf')
+
+def micro_benchmarks(scale):
+    """
+    Returns the micro benchmarks: list of (name, function, number of calls).
+    """
+    w = world.World(world_config(MICRO_WORLD))
+    for i in xrange(WARMUP * w.get_config()['runs']):
+        w.step()
+    r = w.get_robot()
+    s = w._get_sensors()
+    row = r.get_table().row(w._get_state())
+    buf, i = r.get_table().locate(w._get_state())
+    pairs = list(zip(row, robot.ACTIONS))
+    softmax = robot.Softmax(1.)
+    calls = max(1, int(CALLS * scale))
+    return [
+            ('micro/world.step', w.step, calls),
+            ('micro/world._get_state', w._get_state, calls),
+            ('micro/world._get_reward', functools.partial(w._get_reward, s),
+                calls),
+            ('micro/robot.gibbs_choice',
+                functools.partial(robot.gibbs_choice, pairs, 1.), calls),
+            ('micro/robot.Softmax.choose',
+                functools.partial(softmax.choose, row, .5), calls),
+            ('micro/robot._choose_action',
+                functools.partial(r._choose_action, buf, i), calls),
+            ]
+
+def run_epochs(config, epochs):
+    """
+    Returns a function training a new robot for a number of epochs.
+    """
+    def f():
+        headless.Trainer(config).run(epochs)
+    return f
+
+def macro_benchmarks(scale):
+    """
+    Returns the macro benchmarks: list of (name, function, number of calls).
+    A call trains a new robot for a number of epochs, the rate is given in
+    steps per second.
+    """
+    epochs = max(1, int(EPOCHS * scale))
+    l = []
+    for N, M in GRIDS:
+        for D in DS:
+            for lname, q in LEARNING:
+                for sname, greedy, v in SELECTION:
+                    c = world_config(grid_world(N, M, D),
+                            {'Q?' : q, 'greedy?' : greedy, 'ε/τ' : v})
+                    name = 'macro/{0}x{1}/D{2}/{3}/{4}'.format(N, M, D,
+                            lname, sname)
+                    l.append((name, run_epochs(c, epochs),
+                        epochs * c['runs']))
+    return l
+
+def run_benchmarks(select, repeat, scale):
+    """
+    Runs the benchmarks whose names match one of the patterns in select.
+
+    return  dictionary name -> rate (calls or steps per second)
+    """
+    results = {}
+    for name, f, n in micro_benchmarks(scale) + macro_benchmarks(scale):
+        if select and not [p for p in select if fnmatch.fnmatch(name, p)]:
+            continue
+        if name.startswith('macro/'):
+            # a call does n steps
+            rate = measure(f, 1, repeat) * n
+        else:
+            rate = measure(f, n, repeat)
+        results[name] = rate
+        print('{0:<40} {1:>14.0f}/s'.format(name, rate))
+        sys.stdout.flush()
+    return results
+
+def compare(results, baseline, threshold):
+    """
+    Compares the results with a baseline, printing the relative change of
+    each rate.
+
+    return  the names of the benchmarks slower by more than threshold
+    """
+    slower = []
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        change = results[name] / baseline[name] - 1
+        flag = ''
+        if change < -threshold:
+            flag = '  REGRESSION'
+            slower.append(name)
+        print('{0:<40} {1:>14.0f} {2:>14.0f} {3:>+7.1%}{4}'.format(name,
+                baseline[name], results[name], change, flag))
+    return slower
+
+def main(args):
+    """
+    Runs the benchmarks.
+
+    args    command line arguments, after the `bench` command
+    return  True if everything is ok, False otherwise. Exits with status 1 if
+            a regression is found.
+    """
+    try:
+        opts, rest = getopt.gnu_getopt(args, OPTIONS, LONG_OPTIONS)
+    except getopt.GetoptError:
+        return False
+    if rest:
+        return False
+
+    output, baseline, threshold, repeat, select, scale = (None, None,
+            THRESHOLD, 3, [], 1.)
+    try:
+        for o, v in opts:
+            if o in ['-o', '--output']:
+                output = v
+            elif o in ['-b', '--baseline']:
+                baseline = v
+            elif o in ['-t', '--threshold']:
+                threshold = float(v)
+            elif o in ['-r', '--repeat']:
+                repeat = int(v)
+            elif o in ['-k', '--select']:
+                select.append(v)
+            elif o in ['-q', '--quick']:
+                scale = .1
+    except ValueError:
+        return False
+    if repeat <= 0 or threshold < 0:
+        return False
+
+    base = None
+    if baseline:
+        try:
+            with open(baseline) as f:
+                base = json.load(f)['results']
+        except (IOError, ValueError, KeyError):
+            return False
+
+    results = run_benchmarks(select, repeat, scale)
+    if output:
+        with open(output, 'w') as f:
+            json.dump({
+                'time' : time.strftime('%Y-%m-%d %H:%M:%S'),
+                'python' : platform.python_version(),
+                'machine' : platform.platform(),
+                'scale' : scale,
+                'repeat' : repeat,
+                'results' : results,
+                }, f, indent=1, sort_keys=True)
+    if base:
+        print()
+        print('{0:<40} {1:>14} {2:>14} {3:>7}'.format('benchmark',
+                'baseline', 'current', 'change'))
+        slower = compare(results, base, threshold)
+        if slower:
+            print('{0} benchmark(s) slower by more than {1:.0%}'.format(
+                    len(slower), threshold))
+            sys.exit(1)
+    return True
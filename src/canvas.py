@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# A very small raster canvas which can be saved as a PNG image, used to plot
+# without gtk or gnuplot.
+#
+
+import struct
+import zlib
+from .compat import xrange
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+GRAY = (160, 160, 160)
+LIGHT_GRAY = (225, 225, 225)
+
+def _chunk(kind, data):
+    """
+    Returns a PNG chunk.
+    """
+    crc = zlib.crc32(kind + data) & 0xffffffff
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', crc)
+
+class Canvas(object):
+    """
+    An RGB image, initially white. (0, 0) is the top left corner.
+    """
+
+    def __init__(self, width, height):
+        """
+        Builds the canvas.
+        """
+        self._w = width
+        self._h = height
+        self._pixels = bytearray(b'\xff' * (3 * width * height))
+
+    def point(self, x, y, color):
+        """
+        Colors a pixel. Points outside the canvas are ignored.
+        """
+        if 0 <= x < self._w and 0 <= y < self._h:
+            i = 3 * (y * self._w + x)
+            self._pixels[i:i + 3] = bytearray(color)
+
+    def line(self, x0, y0, x1, y1, color):
+        """
+        Draws a line (Bresenham).
+        """
+        dx, dy = abs(x1 - x0), -abs(y1 - y0)
+        sx = 1 if x0 < x1 else -1
+        sy = 1 if y0 < y1 else -1
+        err = dx + dy
+        while True:
+            self.point(x0, y0, color)
+            if x0 == x1 and y0 == y1:
+                return
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x0 += sx
+            if e2 <= dx:
+                err += dx
+                y0 += sy
+
+    def polyline(self, points, color):
+        """
+        Draws lines between consecutive points.
+        """
+        for i in xrange(1, len(points)):
+            self.line(points[i - 1][0], points[i - 1][1],
+                    points[i][0], points[i][1], color)
+
+    def rectangle(self, x0, y0, x1, y1, color):
+        """
+        Draws the border of a rectangle.
+        """
+        self.polyline([(x0, y0), (x1, y0), (x1, y1), (x0, y1), (x0, y0)], color)
+
+    def save(self, fName):
+        """
+        Saves the canvas as a PNG image.
+        """
+        stride = 3 * self._w
+        raw = bytearray()
+        for y in xrange(self._h):
+            # filter type 0 (none) for each scanline
+            raw.append(0)
+            raw += self._pixels[y * stride:(y + 1) * stride]
+        header = struct.pack('>IIBBBBB', self._w, self._h, 8, 2, 0, 0, 0)
+        with open(fName, 'wb') as f:
+            f.write(b'\x89PNG\r\n\x1a\n')
+            f.write(_chunk(b'IHDR', header))
+            f.write(_chunk(b'IDAT', zlib.compress(bytes(raw), 9)))
+            f.write(_chunk(b'IEND', b''))
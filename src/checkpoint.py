@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Checkpoints of a simulation: everything needed to continue it later exactly
+# as if it was never stopped.
+#
+# The file starts with a header:
+#   magic       4 bytes, MAGIC
+#   version     2 bytes
+#   flags       2 bytes, DENSE if the robot keeps its utilities in an array
+#   length      4 bytes, length of the description
+#   description JSON, padded with spaces such that the tables start at a
+#               multiple of 8: the configuration, the position of the robot
+#               and the counters of the epoch (see World.get_position), the
+#               action chosen in advance by SARSA, the state of the random
+#               stream, the eligibility traces, the replay buffer and the
+#               model of the planner (if any), the number of rows of the
+#               table and any other values given by the caller (the
+#               counters of the trainer, usually)
+# followed by the Q-table. If DENSE is set:
+#   utilities   3 doubles for each possible state
+#   seen        1 byte for each possible state, non-zero if the state was seen
+# otherwise:
+#   states      8 bytes for each state seen, its code (see encode_state)
+#   utilities   3 doubles for each state seen
+# All numbers are little endian. The tables are read through mmap, no
+# unpickling is involved.
+#
+
+import array
+import json
+import mmap
+import os
+import struct
+import sys
+
+from . import world
+from .globaldefs import *
+from .compat import array_frombytes, str_keys, xrange
+
+MAGIC = b'QLCP'
+VERSION = 1
+DENSE = 1
+
+HEADER = struct.Struct('<4sHHI')
+
+# Epochs between two checkpoints, by default.
+EVERY = 100
+
+# Type code of the arrays of 8 byte integers.
+INT64 = 'l' if array.array('l').itemsize == 8 else 'q'
+
+def _le(a):
+    """
+    Converts an array between the native and little endian byte order, in
+    place.
+    """
+    if sys.byteorder != 'little':
+        a.byteswap()
+    return a
+
+def save(fName, world, extra=None):
+    """
+    Saves a checkpoint of a world and of its robot.
+
+    The checkpoint is first written to another file which then replaces
+    fName, so a previous checkpoint is never left half written if the process
+    is killed meanwhile.
+
+    fName   the file to write to
+    world   the world to save
+    extra   dictionary of other values to save, returned by get_extra
+    """
+    robot = world.get_robot()
+    table = robot.get_table()
+    D = world.get_config()['D']
+    rng = world.get_rng().get_state()
+    desc = {
+            'config' : world.get_config(),
+            'position' : world.get_position(),
+            'pending' : robot.get_pending_action(),
+            'rng' : [rng[0], rng[1], list(rng[2])],
+            'extra' : extra or {},
+            }
+    dense = hasattr(table, 'get_buffers')
+    if robot.get_traces() is not None:
+        desc['traces'] = [[s if dense else encode_state(s, D), a, v]
+                for s, a, v in robot.get_traces().get_items()]
+    replay = robot.get_replay_state()
+    if replay is not None:
+        desc['replay'] = replay
+    if robot.get_planner() is not None:
+        encode = (lambda s: s) if dense else (lambda s: encode_state(s, D))
+        desc['planning'] = robot.get_planner().get_state(encode)
+    if dense:
+        flags = DENSE
+        q, seen = table.get_buffers()
+        desc['count'] = len(seen)
+    else:
+        flags = 0
+        states = table.states()
+        desc['count'] = len(states)
+
+    d = json.dumps(desc, sort_keys=True).encode('ascii')
+    d += b' ' * (-(HEADER.size + len(d)) % 8)
+
+    tmp = fName + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, flags, len(d)))
+        f.write(d)
+        if flags & DENSE:
+            _le(q).tofile(f)
+            _le(q)
+            f.write(seen)
+        else:
+            codes = array.array(INT64)
+            rows = array.array('d')
+            for s in states:
+                codes.append(encode_state(s, D))
+                rows.extend(table.row(s))
+            _le(codes).tofile(f)
+            _le(rows).tofile(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(tmp, fName)
+
+class Checkpoint(object):
+    """
+    Reads a checkpoint. The tables are only read when restoring a world.
+
+    Simple workflow:
+        __init__ -> get_config -> [build the world] -> restore -> close
+    """
+
+    def __init__(self, fName):
+        """
+        Opens the file.
+
+        Raises ValueError if the file is not a checkpoint.
+        """
+        with open(fName, 'rb') as f:
+            h = f.read(HEADER.size)
+            if len(h) != HEADER.size:
+                raise ValueError('{0} is not a checkpoint'.format(fName))
+            magic, version, self._flags, length = HEADER.unpack(h)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError('{0} is not a checkpoint'.format(fName))
+            self._desc = json.loads(f.read(length).decode('ascii'))
+            self._offset = HEADER.size + length
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get_config(self):
+        """
+        Returns the configuration of the saved world.
+        """
+        return str_keys(self._desc['config'])
+
+    def get_extra(self):
+        """
+        Returns the other values given when saving.
+        """
+        return str_keys(self._desc['extra'])
+
+    def is_dense(self):
+        """
+        Returns True if the saved table is an array with a row for each
+        possible state.
+        """
+        return bool(self._flags & DENSE)
+
+    def _read(self, typecode, offset, count):
+        """
+        Reads an array of count numbers from the mapped file.
+        """
+        a = array.array(typecode)
+        array_frombytes(a, self._mm[offset:offset + count * a.itemsize])
+        return _le(a)
+
+    def restore(self, world):
+        """
+        Restores the saved state in a world built from get_config.
+        """
+        robot = world.get_robot()
+        table = robot.get_table()
+        count = self._desc['count']
+        if self.is_dense() != hasattr(table, 'get_buffers'):
+            raise ValueError('the checkpoint has a different kind of table')
+        if self.is_dense():
+            q = self._read('d', self._offset, 3 * count)
+            start = self._offset + 24 * count
+            table.set_buffers(q, bytearray(self._mm[start:start + count]))
+        else:
+            D = world.get_config()['D']
+            codes = self._read(INT64, self._offset, count)
+            rows = self._read('d', self._offset + 8 * count, 3 * count)
+            for i in xrange(count):
+                table.set_row(decode_state(codes[i], D), rows[3 * i:3 * i + 3])
+        if robot.get_traces() is not None:
+            items = self._desc.get('traces', [])
+            if not self.is_dense():
+                D = world.get_config()['D']
+                items = [(decode_state(s, D), a, v) for s, a, v in items]
+            robot.get_traces().set_items(items)
+        if 'replay' in self._desc:
+            robot.set_replay_state(self._desc['replay'])
+        if robot.get_planner() is not None and 'planning' in self._desc:
+            if self.is_dense():
+                decode = lambda s: s
+            else:
+                D = world.get_config()['D']
+                decode = lambda s: decode_state(s, D)
+            robot.get_planner().set_state(self._desc['planning'], decode)
+        world.set_position(str_keys(self._desc['position']))
+        robot.set_pending_action(self._desc['pending'])
+        seed, state, block = self._desc['rng']
+        state = (state[0], tuple(state[1]), state[2])
+        world.get_rng().set_state((seed, state, block))
+
+    def as_array(self):
+        """
+        Returns the utilities of a dense table as a numpy array of shape
+        (states, 3), sharing the memory of the file (no copy is done, only
+        the pages which are used are read). Needs numpy.
+        """
+        import numpy
+        if not self.is_dense():
+            raise ValueError('the checkpoint has no dense table')
+        count = self._desc['count']
+        a = numpy.frombuffer(self._mm, '<f8', 3 * count, self._offset)
+        return a.reshape((count, 3))
+
+    def close(self):
+        """
+        Closes the file.
+        """
+        if self._mm:
+            self._mm.close()
+            self._mm = None
+
+def load(fName):
+    """
+    Builds a world from a checkpoint.
+
+    return  (world, values given as extra when saving)
+    """
+    cp = Checkpoint(fName)
+    try:
+        w = world.World(cp.get_config())
+        cp.restore(w)
+        return (w, cp.get_extra())
+    finally:
+        cp.close()
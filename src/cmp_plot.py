@@ -3,31 +3,336 @@
 # (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
 #
 
-import cPickle
+from __future__ import print_function
 
-def main(files):
+import collections
+import getopt
+import math
+import sys
+
+from . import canvas
+from . import rewardlog
+from .compat import xrange
+
+OPTIONS = 's:p:q:w:r:'
+LONG_OPTIONS = ['summary=', 'png=', 'quantiles=', 'window=', 'rows=']
+
+# How many values are read at once, from all the runs.
+BUDGET = 1 << 16
+
+# Size of the PNG plot and of its margins.
+WIDTH = 800
+HEIGHT = 500
+MARGIN = 20
+
+# Below this many runs, each run is plotted instead of the aggregates.
+MAX_LINES = 8
+COLORS = [(200, 0, 0), (0, 150, 0), (0, 0, 200), (200, 150, 0),
+        (150, 0, 150), (0, 150, 150), (100, 100, 100), (0, 0, 0)]
+MEAN_COLOR = (0, 0, 160)
+BAND_COLOR = (190, 205, 240)
+AVG_COLOR = (200, 0, 0)
+
+class PickledRun(object):
+    """
+    A run saved as a pickle by older versions. It has to be loaded entirely,
+    but it is read as a RewardLog.
+    """
+
+    def __init__(self, fName):
+        """
+        Loads the run.
+        """
+        self._rewards = rewardlog.load(fName)
+
+    def __len__(self):
+        """
+        Returns the number of epochs.
+        """
+        return len(self._rewards)
+
+    def rewards(self, start=0, stop=None):
+        """
+        Returns the rewards of the epochs in [start, stop).
+        """
+        return self._rewards[start:stop]
+
+    def close(self):
+        """
+        Nothing to do.
+        """
+        pass
+
+def open_run(fName):
+    """
+    Opens a run, saved in either format.
+    """
+    if rewardlog.is_reward_log(fName):
+        return rewardlog.RewardLog(fName)
+    return PickledRun(fName)
+
+def read_chunks(runs, length):
+    """
+    Reads the first length epochs of all runs, in chunks of epochs such that
+    at most BUDGET values are in memory at once.
+
+    return  generator of (first epoch, list of the rewards of each run)
+    """
+    step = max(1, BUDGET // len(runs))
+    for start in xrange(0, length, step):
+        stop = min(length, start + step)
+        yield (start, [r.rewards(start, stop) for r in runs])
+
+def quantile(values, q):
+    """
+    Returns the q quantile of a sorted list, interpolating linearly.
+    """
+    pos = q * (len(values) - 1)
+    i = int(pos)
+    if i + 1 >= len(values):
+        return values[-1]
+    return values[i] + (pos - i) * (values[i + 1] - values[i])
+
+class Aggregator(object):
+    """
+    Receives the rewards of all runs at each epoch and computes per epoch
+    statistics: mean, standard deviation, quantiles and the moving average of
+    the mean. To keep the output bounded, consecutive epochs are grouped in
+    rows and the statistics of a row are the means of those of its epochs.
+    """
+
+    def __init__(self, length, quantiles, window, rows, keep_runs):
+        """
+        Builds the aggregator.
+
+        length      number of epochs
+        quantiles   list of quantiles to compute
+        window      width of the moving average
+        rows        maximum number of rows in the result
+        keep_runs   also keep the (grouped) rewards of each run
+        """
+        self._quantiles = quantiles
+        self._window = collections.deque(maxlen=window)
+        self._group = max(1, -(-length // rows))
+        self._keep_runs = keep_runs
+        self._sums = None
+        self._count = 0
+        self._epoch = 0
+        self._rows = []
+        self._runs = []
+
+    def add(self, values):
+        """
+        Adds the rewards of all runs at the next epoch.
+        """
+        n = len(values)
+        mean = sum(values) / float(n)
+        std = math.sqrt(sum((v - mean) ** 2 for v in values) / n)
+        s = sorted(values)
+        self._window.append(mean)
+        avg = sum(self._window) / len(self._window)
+        stats = [mean, std] + [quantile(s, q) for q in self._quantiles] + [avg]
+        if self._keep_runs:
+            stats += values
+        if self._sums is None:
+            self._sums = stats
+        else:
+            self._sums = [a + b for a, b in zip(self._sums, stats)]
+        self._count += 1
+        self._epoch += 1
+        if self._count == self._group:
+            self._flush()
+
+    def _flush(self):
+        """
+        Ends the current row.
+        """
+        if not self._count:
+            return
+        row = [x / self._count for x in self._sums]
+        k = 3 + len(self._quantiles)
+        self._rows.append((self._epoch - self._count, row[:k]))
+        if self._keep_runs:
+            self._runs.append(row[k:])
+        self._sums = None
+        self._count = 0
+
+    def get_rows(self):
+        """
+        Returns the rows: (first epoch, [mean, std, quantiles..., average]).
+        """
+        self._flush()
+        return self._rows
+
+    def get_runs(self):
+        """
+        Returns the grouped rewards of each run, for each row.
+        """
+        self._flush()
+        return self._runs
+
+def write_summary(fName, rows, quantiles, window):
+    """
+    Writes the summary table, in a format usable by gnuplot. Use '-' as the
+    name of the file to write it to stdout.
+    """
+    header = ['epoch', 'mean', 'std']
+    header += ['q{0:g}'.format(100 * q) for q in quantiles]
+    header.append('avg{0}'.format(window))
+    f = sys.stdout if fName == '-' else open(fName, 'w')
+    f.write('# ' + ' '.join(header) + '\n')
+    for epoch, row in rows:
+        f.write('{0} {1}\n'.format(epoch,
+            ' '.join('{0:g}'.format(x) for x in row)))
+    if f is not sys.stdout:
+        f.close()
+
+def plot_png(fName, rows, runs, quantiles):
+    """
+    Plots the rows (and each run, if given) on a PNG image: the band between
+    the first and the last quantile, the mean and its moving average.
+    """
+    lines = []
+    if runs:
+        for k in xrange(len(runs[0])):
+            lines.append(([r[k] for r in runs], COLORS[k % len(COLORS)]))
+    else:
+        lines.append(([r[1][0] for r in rows], MEAN_COLOR))
+        lines.append(([r[1][-1] for r in rows], AVG_COLOR))
+    band = None
+    if quantiles and not runs:
+        band = ([r[1][2] for r in rows], [r[1][1 + len(quantiles)] for r in rows])
+
+    values = [0]
+    for l, color in lines:
+        values += l
+    if band:
+        values += band[0] + band[1]
+    lo, hi = min(values), max(values)
+    if hi == lo:
+        hi = lo + 1
+
+    n = len(rows)
+    if not n:
+        # nothing to plot, only the frame
+        lines, band = [], None
+    w, h = WIDTH - 2 * MARGIN, HEIGHT - 2 * MARGIN
+    px = lambda i: MARGIN + (i * (w - 1)) // max(1, n - 1)
+    py = lambda v: MARGIN + int((hi - v) * (h - 1) / (hi - lo))
+
+    c = canvas.Canvas(WIDTH, HEIGHT)
+    c.line(MARGIN, py(0), MARGIN + w - 1, py(0), canvas.LIGHT_GRAY)
+    if band:
+        # fill each column, interpolating between rows
+        for x in xrange(w):
+            t = x * (n - 1) / float(max(1, w - 1))
+            i = min(int(t), max(0, n - 2))
+            f = t - i
+            j = min(i + 1, n - 1)
+            b0 = band[0][i] + f * (band[0][j] - band[0][i])
+            b1 = band[1][i] + f * (band[1][j] - band[1][i])
+            c.line(MARGIN + x, py(b0), MARGIN + x, py(b1), BAND_COLOR)
+    for l, color in lines:
+        c.polyline([(px(i), py(v)) for i, v in enumerate(l)], color)
+    c.rectangle(MARGIN - 1, MARGIN - 1, MARGIN + w, MARGIN + h, canvas.GRAY)
+    c.save(fName)
+
+def print_table(runs, length):
+    """
+    Prints the rewards of all runs, one epoch per line.
+    """
+    for start, chunk in read_chunks(runs, length):
+        for i in xrange(len(chunk[0])):
+            print(start + i, *[l[i] for l in chunk])
+
+def convert(files):
+    """
+    Converts runs saved as pickles (by older versions) to reward logs.
+
+    files   list of [src, dst] file names
+    return  True if everything is ok, False otherwise
+    """
+    if len(files) != 2:
+        return False
+    try:
+        rewardlog.convert(files[0], files[1])
+    except Exception:
+        return False
+    return True
+
+def main(args):
     """
     Compares runs from the passed list of files.
 
-    Basically, it just prints everything to be piped to a gnuplot command.
+    Without options, it just prints everything to be piped to a gnuplot
+    command. Otherwise, computes statistics across runs for each epoch and
+    saves them (grouping epochs to get at most the given number of rows)
+    and/or plots them.
+
+    Runs are read in chunks, the memory used doesn't depend on the number or
+    on the length of the runs (except for runs saved as pickles).
 
     return True if everything is ok, False otherwise
     """
-    _lists_ = []
-    for fname in files:
-        try:
-            with open(fname) as f:
-                _lists_.append(cPickle.load(f))
-        except:
-            return False
-
-    minl = min(map(lambda l:len(l), _lists_))
-
-    for i in range(minl):
-        print i, 
-        for l in _lists_:
-            print l[i],
-        print
-    return True
+    try:
+        opts, files = getopt.gnu_getopt(args, OPTIONS, LONG_OPTIONS)
+    except getopt.GetoptError:
+        return False
+    if not files:
+        return False
 
+    summary, png = None, None
+    quantiles, window, rows = [.1, .5, .9], 10, 1000
+    try:
+        for o, v in opts:
+            if o in ['-s', '--summary']:
+                summary = v
+            elif o in ['-p', '--png']:
+                png = v
+            elif o in ['-q', '--quantiles']:
+                quantiles = sorted(float(x) for x in v.split(',') if x)
+            elif o in ['-w', '--window']:
+                window = int(v)
+            elif o in ['-r', '--rows']:
+                rows = int(v)
+    except ValueError:
+        return False
+    if window <= 0 or rows <= 0 or [q for q in quantiles if not 0 <= q <= 1]:
+        return False
 
+    runs = []
+    try:
+        for fname in files:
+            runs.append(open_run(fname))
+    except Exception:
+        return False
+    # a run without epochs would leave nothing to compare in the others
+    nonempty = []
+    for fname, r in zip(files, runs):
+        if len(r):
+            nonempty.append(r)
+        else:
+            print('Skipping {0}: no epochs'.format(fname), file=sys.stderr)
+            r.close()
+    runs = nonempty
+    if not runs:
+        print('No epochs to compare')
+        return True
+
+    minl = min(map(len, runs))
+    if not (summary or png):
+        print_table(runs, minl)
+    else:
+        agg = Aggregator(minl, quantiles, window, rows, len(runs) <= MAX_LINES)
+        for start, chunk in read_chunks(runs, minl):
+            for i in xrange(len(chunk[0])):
+                agg.add([l[i] for l in chunk])
+        if summary:
+            write_summary(summary, agg.get_rows(), quantiles, window)
+        if png:
+            r = agg.get_runs() if len(runs) <= MAX_LINES else None
+            plot_png(png, agg.get_rows(), r, quantiles)
+
+    for r in runs:
+        r.close()
+    return True
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# The few differences between Python 2 and Python 3 which matter to the core
+# (everything but the GUI, which needs pygtk and so Python 2). The core runs
+# on both.
+#
+
+import importlib
+import sys
+
+PY3 = sys.version_info[0] >= 3
+
+if PY3:
+    import pickle
+    xrange = range
+else:
+    import cPickle as pickle
+    xrange = xrange
+
+def array_frombytes(a, data):
+    """
+    Appends the numbers packed in a string of bytes to an array.
+    """
+    if PY3:
+        a.frombytes(data)
+    else:
+        a.fromstring(data)
+
+def str_keys(d):
+    """
+    Returns the dictionary with all keys as native strings (utf-8 encoded
+    on Python 2), as they are in the configuration built by the GUI or by
+    build_config. Needed for dictionaries read from JSON.
+    """
+    return dict((k if isinstance(k, str) else k.encode('utf-8'), v)
+            for k, v in d.items())
+
+def load_pickle(f):
+    """
+    Loads a pickle, possibly written by Python 2, from a file opened in
+    binary mode.
+    """
+    if PY3:
+        return pickle.load(f, encoding='latin1')
+    return pickle.load(f)
+
+def has_numpy():
+    """
+    Returns True if numpy can be imported (the solver, and so the warm start,
+    and the batch mode need it).
+    """
+    try:
+        importlib.import_module('numpy')
+    except ImportError:
+        return False
+    return True
@@ -5,6 +5,8 @@
 
 import gtk
 
+from . import worldfile
+
 class Config(object):
     """
     Holds the definition for the configuration dialog showed before starting
@@ -88,8 +90,8 @@ class Config(object):
     def _build_learning_gui(self, _checkHBox):
         """
         Builds the learning method selection GUI. Either Q-learning or SARSA
-        is used. Also, it has to offer a way to select the two learning
-        parameters (α and γ).
+        is used. Also, it has to offer a way to select the learning
+        parameters (α, γ and λ, λ = 0 meaning no eligibility traces).
 
         _checkHBox    HBox holding the widgets built by this function
         """
@@ -105,6 +107,7 @@ class Config(object):
 
         self._aCounter = self._build_counter('α value:', 0.1, 1, _lmVBox)
         self._gCounter = self._build_counter('γ value:', 0.1, 1, _lmVBox)
+        self._lCounter = self._build_counter('λ value:', 0, 1, _lmVBox)
 
     def _build_counter(self, text, minv, maxv, parent, incr=.05, digits=2, enabled=True):
         """
@@ -181,32 +184,7 @@ class Config(object):
 
         return  True if everything is ok
         """
-        if not fName:
-            return False
-
-        try:
-            with open(fName) as f:
-                d = f.readline()
-                p = d.split()
-                if len(p) != 2:
-                    return False
-                self._configDict['N'] = int(p[0])
-                self._configDict['M'] = int(p[1])
-                d = f.readline()
-                self._configDict['D'] = int(d)
-                d = f.readline()
-                p = d.split()
-                if len(p) != 2:
-                    return False
-                self._configDict['xs'] = int(p[0])
-                self._configDict['ys'] = int(p[1])
-                d = f.readline()
-                self._configDict['d1'] = int(d)
-                d = f.readline()
-                self._configDict['d2'] = int(d)
-        except Exception as e:
-            return False
-        return True
+        return worldfile.read_world(fName, self._configDict)
 
     def _complete_config(self):
         """
@@ -220,6 +198,7 @@ class Config(object):
         self._configDict['Q?'] = self._ql.get_active()
         self._configDict['α'] = self._aCounter.get_value()
         self._configDict['γ'] = self._gCounter.get_value()
+        self._configDict['λ'] = self._lCounter.get_value()
         self._configDict['runs'] = self._rCounter.get_value()
 
     def __on_greedy(self, widget, data=None):
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Detecting when the learning has converged, to stop training early.
+#
+# Nothing here is called unless convergence is tracked: attaching replaces
+# the update method of a Q-table by a wrapper, on the instance only.
+#
+
+import collections
+
+from . import qtable
+
+# Default number of epochs in the sliding window.
+WINDOW = 100
+
+# Default number of greedy policy changes allowed per epoch, on average over
+# the window. With a constant α and exploration, states seen through the
+# sensors only (so different positions may look the same) keep changing
+# their greedy actions from time to time, so this can't be 0.
+POLICY_TOL = .5
+
+# Default largest change of a utility allowed in the window. For the same
+# reasons, the largest change doesn't go to 0, so it is not checked unless a
+# tolerance is given.
+DELTA_TOL = None
+
+class Convergence(object):
+    """
+    Tracks, for each epoch, the number of changes of the greedy policy (a
+    state getting a different greedy action, or a new state being seen) and
+    the largest change of a utility. The learning has converged when, over
+    the last epochs of a sliding window, the policy changed rarely enough and
+    no utility changed by more than a tolerance.
+
+    Simple workflow:
+        __init__ -> attach -> [end_epoch -> converged]*
+    """
+
+    def __init__(self, window=WINDOW, policy_tol=POLICY_TOL,
+            delta_tol=DELTA_TOL):
+        """
+        Builds the tracker.
+
+        window      number of epochs looked at
+        policy_tol  greedy policy changes allowed per epoch, on average
+        delta_tol   largest change of a utility allowed in the window (None
+                    to not check it)
+        """
+        self._policy_tol = policy_tol
+        self._delta_tol = delta_tol
+        # (policy changes, largest delta) for each of the last epochs
+        self._window = collections.deque(maxlen=window)
+        self._table = None
+        self._states = 0
+        self._changes = 0
+        self._delta = 0.0
+
+    def attach(self, table):
+        """
+        Starts tracking the updates of a Q-table.
+        """
+        self._table = table
+        self._states = len(table)
+        update = table.update
+        locate = table.locate
+        best = qtable.best_column
+        def tracked(state, a, delta):
+            old = best(*locate(state)) if state in table else None
+            update(state, a, delta)
+            if old is not None and best(*locate(state)) != old:
+                self._changes += 1
+            if abs(delta) > self._delta:
+                self._delta = abs(delta)
+        table.update = tracked
+
+    def end_epoch(self):
+        """
+        Records the changes of the epoch which just ended.
+
+        return  True if the learning has converged
+        """
+        states = len(self._table)
+        self._window.append((self._changes + states - self._states,
+            self._delta))
+        self._states = states
+        self._changes = 0
+        self._delta = 0.0
+        return self.converged()
+
+    def converged(self):
+        """
+        Returns True if the learning has converged: the window is full, the
+        greedy policy changed at most policy_tol times per epoch (on average)
+        and no utility changed by more than delta_tol in it.
+        """
+        w = self._window
+        if len(w) < w.maxlen:
+            return False
+        if sum(c for c, d in w) > self._policy_tol * len(w):
+            return False
+        if self._delta_tol is None:
+            return True
+        return max(d for c, d in w) <= self._delta_tol
+
+    def get_state(self):
+        """
+        Returns the state of the tracker, as a dictionary of lists, to be
+        given to set_state later.
+        """
+        return {'window' : [list(x) for x in self._window],
+                'states' : self._states, 'changes' : self._changes,
+                'delta' : self._delta}
+
+    def set_state(self, d):
+        """
+        Restores the state returned by get_state.
+        """
+        self._window.clear()
+        self._window.extend(tuple(x) for x in d['window'])
+        self._changes = d['changes']
+        self._delta = d['delta']
+        self._states = d['states']
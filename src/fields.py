@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Distances from each cell of a world with obstacles to the nearest obstacle
+# (or border) in each direction, computed once so that getting the sensor
+# values of a position is a lookup.
+#
+# Cells are indexed by x * M + y, as in the precomputed tables of World. The
+# fields are kept in a single array with 4 values for each cell, in the order
+# N, E, S, W (the sensor values when facing north), each clipped to D.
+#
+
+import array
+from .compat import xrange
+
+def typecode(D):
+    """
+    Returns the type code of the array holding distances up to D.
+    """
+    return 'B' if D < 256 else 'H'
+
+def _scan(prev, walls, D):
+    """
+    One step of a directional scan: the distances of a line of cells given
+    those of the previous line and the obstacles on the previous line.
+    """
+    return [0 if w else (p + 1 if p < D else D) for p, w in zip(prev, walls)]
+
+def distance_fields(walls, N, M, D):
+    """
+    Computes the distances to the nearest obstacle in each direction.
+
+    A distance is the number of free cells between a cell and the nearest
+    obstacle or border, clipped to D. Without obstacles, these are the same
+    distances as World computes from the borders.
+
+    Each direction is a scan over the lines perpendicular to it, a whole line
+    being done at once: the distance of a cell is 0 if the next cell in that
+    direction is an obstacle (or outside the grid) and one more than the
+    distance of the next cell otherwise.
+
+    walls   bytearray of N * M flags, non-zero for obstacles
+    return  array of 4 * N * M distances
+    """
+    tc = typecode(D)
+    f = array.array(tc, [0]) * (4 * N * M)
+    stride = 4 * M
+
+    # north (y decreasing) and south (y increasing): lines of constant y,
+    # walls[y::M] is the line y; the distances on the first line of a scan
+    # are 0
+    prev = [0] * N
+    for y in xrange(1, M):
+        prev = _scan(prev, walls[y - 1::M], D)
+        f[4 * y::stride] = array.array(tc, prev)
+    prev = [0] * N
+    for y in xrange(M - 2, -1, -1):
+        prev = _scan(prev, walls[y + 1::M], D)
+        f[4 * y + 2::stride] = array.array(tc, prev)
+
+    # east (x increasing) and west (x decreasing): lines of constant x,
+    # walls[x * M:(x + 1) * M] is the line x
+    prev = [0] * M
+    for x in xrange(N - 2, -1, -1):
+        prev = _scan(prev, walls[(x + 1) * M:(x + 2) * M], D)
+        f[x * stride + 1:(x + 1) * stride:4] = array.array(tc, prev)
+    prev = [0] * M
+    for x in xrange(1, N):
+        prev = _scan(prev, walls[(x - 1) * M:x * M], D)
+        f[x * stride + 3:(x + 1) * stride:4] = array.array(tc, prev)
+    return f
@@ -6,11 +6,23 @@
 #
 # It is safe to do from globaldefs import *
 
+from .compat import xrange
+
 TITLE = "Robot in a Grid"
 
 N = 12
 M = 8
 
+# Size (in pixels) of an image of a cell.
+CELL = 64
+
+# Frames per second shown while the simulation plays.
+FPS = 25
+# Speed of the simulation: decimal logarithm of the steps per second, the
+# maximum meaning as fast as possible.
+DEFAULT_SPEED = 1.6
+MAX_SPEED = 5
+
 IMG_FOLDER = 'res/'
 VOID_FILE = IMG_FOLDER + "void.png"
 EMPTY_FILE = IMG_FOLDER + "empty.png"
@@ -32,6 +44,10 @@ FORWARD = 42
 TURN_LEFT = 43
 TURN_RIGHT = 41
 
+# All actions, in the order of the columns of an array backed Q-table (the
+# column of action a is a - TURN_RIGHT).
+ACTIONS = (TURN_RIGHT, FORWARD, TURN_LEFT)
+
 FRONT = 0
 RIGHT = 1
 BACK = 2
@@ -39,9 +55,30 @@ LEFT = 3
 
 IMAGES = {}
 
-def build_sep_points(maxN, maxM):
+
+def state_count(D):
     """
-    Builds the spliting points for a multi-screen world.
+    Returns the number of possible states when the sensors are limited to D.
     """
-    return (xrange(-1, maxN, N), xrange(-1, maxM, M))
+    return (D + 1) ** 4
 
+def encode_state(state, D):
+    """
+    Encodes a state (the tuple of the four sensor values) as an integer in
+    [0, state_count(D)).
+    """
+    code = 0
+    for s in state:
+        code = code * (D + 1) + s
+    return code
+
+def decode_state(code, D):
+    """
+    Inverse of encode_state.
+    """
+    state = []
+    for i in xrange(4):
+        code, s = divmod(code, D + 1)
+        state.append(s)
+    state.reverse()
+    return tuple(state)
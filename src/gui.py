@@ -6,11 +6,15 @@
 import gtk
 import glib
 
-import config
-import world
-import plot
+from . import checkpoint
+from . import config
+from . import world
+from . import plot
+from . import simulation
+from . import telemetry
+from . import view
 
-from globaldefs import *
+from .globaldefs import *
 
 def initImages():
     """
@@ -57,16 +61,14 @@ class MainWindow(gtk.Window):
         self.show()
         self.show_all()
 
-    def _paint_world(self):
+    def _paint_world(self, snapshot=None):
         """
         Paint the world known at this moment of time.
+
+        snapshot    state of the world sampled from the simulation thread
         """
         if self._world:
-            self._world.fill(self._iworld)
-
-        for i in xrange(N):
-            for j in xrange(M):
-                self._imgs[i][j].set_from_pixbuf(IMAGES[self._iworld[i][j]])
+            self._view.show_world(self._world, snapshot)
 
     def _build_world(self):
         """
@@ -75,21 +77,15 @@ class MainWindow(gtk.Window):
         """
         # Is the simulation in Play mode?
         self._running = False
-        # Inhibit the last signal sent (used to disable a last callback after
-        # Pause was clicked).
-        self._inhibit = False
-        # The world
+        # The timer refreshing the display while in Play mode.
+        self._timer = None
+        # The world and the thread simulating it
         self._world = None
-        self._iworld = []
-        self._imgs = []
-        for i in xrange(N):
-            l = []
-            limg = []
-            for j in xrange(M):
-                l.append(VOID)
-                limg.append(gtk.Image())
-            self._iworld.append(l)
-            self._imgs.append(limg)
+        self._sim = None
+        # The view of the world
+        self._view = view.WorldView()
+        # Timers and counters, if enabled from the environment
+        self._telemetry = telemetry.from_env()
 
     def _build_gui(self):
         """
@@ -104,22 +100,20 @@ class MainWindow(gtk.Window):
         self._plot_window = plot.Plot()
         self._plot_window.set_title(TITLE)
         self._plot_window.set_icon_from_file(ROBOT_FILE)
+        if self._telemetry:
+            self._telemetry.wrap(self._view, 'show_world', 'gui.show_world')
+            self._telemetry.wrap(self._plot_window, 'receive_sample',
+                    'gui.receive_sample')
 
     def _build_drawing_area(self, _vbox):
         """
-        Builds the drawing area: a table containing images for representing
-        the maze.
+        Builds the drawing area: a single canvas on which the images
+        representing the maze are drawn.
 
         _vbox   parent containing the drawng area
         """
         _h = gtk.HBox()
-        t = gtk.Table(N, M)
-        for i in xrange(N):
-            for j in xrange(M):
-                t.attach(self._imgs[i][j], i, i+1, j, j+1)
-        t.set_row_spacings(0)
-        t.set_col_spacings(0)
-        _h.pack_start(t, False, False, 10)
+        _h.pack_start(self._view, False, False, 10)
         _vbox.pack_start(_h, False, False, 5)
 
     def _build_toolbar(self):
@@ -138,11 +132,18 @@ class MainWindow(gtk.Window):
                 "Starts a new simulation", self.__on_new_game)
         _toolbar.insert(_btnNew, -1)
 
+        _btnResume = self._build_toolbar_button(gtk.STOCK_OPEN, "Resume",
+                "Continues a simulation saved in a checkpoint",
+                self.__on_resume)
+        _toolbar.insert(_btnResume, -1)
+
         _toolbar.insert(gtk.SeparatorToolItem(), -1)
         self._build_simulation_buttons(_toolbar)
         _toolbar.insert(gtk.SeparatorToolItem(), -1)
         self._build_simulation_informations(_toolbar)
         _toolbar.insert(gtk.SeparatorToolItem(), -1)
+        self._build_speed_scale(_toolbar)
+        _toolbar.insert(gtk.SeparatorToolItem(), -1)
 
         _btnAbout = self._build_toolbar_button(gtk.STOCK_ABOUT, "About",
                 "About this program", self.__on_about)
@@ -174,6 +175,11 @@ class MainWindow(gtk.Window):
                 "Save", "Save plot of simulation", self.__on_save)
         _toolbar.insert(self._btnSavePlot, -1)
 
+        self._btnCheckpoint = self._build_toolbar_button(gtk.STOCK_SAVE_AS,
+                "Checkpoint", "Save the simulation now and periodically",
+                self.__on_checkpoint)
+        _toolbar.insert(self._btnCheckpoint, -1)
+
     def _build_simulation_informations(self, _toolbar):
         """
         Builds the labels containing informations about the current epoch
@@ -186,6 +192,98 @@ class MainWindow(gtk.Window):
         self._lblRew, ti = self._build_toolbar_label('Total reward: ', '0')
         _toolbar.insert(ti, -1)
 
+    def _build_speed_scale(self, _toolbar):
+        """
+        Builds the slider used to set the speed of the simulation. Its value
+        is the decimal logarithm of the number of steps per second, except
+        for the maximum value which means as fast as possible.
+
+        _toolbar    The toolbar where to place the slider.
+        """
+        ti = gtk.ToolItem()
+        b = gtk.HBox()
+        l = gtk.Label('Speed: ')
+        b.pack_start(l, False, False, 5)
+        adj = gtk.Adjustment(DEFAULT_SPEED, 0, MAX_SPEED, .1, 1)
+        self._speed = gtk.HScale(adj)
+        self._speed.set_size_request(120, -1)
+        self._speed.set_tooltip_text('Steps per second')
+        self._speed.connect('format-value', self.__on_format_speed)
+        self._speed.connect('value-changed', self.__on_speed)
+        b.pack_start(self._speed, True, True, 5)
+        ti.add(b)
+        _toolbar.insert(ti, -1)
+
+    def _get_speed(self):
+        """
+        Returns the speed selected by the user, in steps per second (None
+        for as fast as possible).
+        """
+        v = self._speed.get_value()
+        if v >= MAX_SPEED:
+            return None
+        return 10 ** v
+
+    def _stop_simulation(self):
+        """
+        Stops the simulation thread and the timer refreshing the display.
+        """
+        if self._timer:
+            glib.source_remove(self._timer)
+            self._timer = None
+        if self._sim:
+            self._sim.stop()
+            if self._sim.has_checkpoint():
+                self._sim.save_checkpoint()
+            self._sim = None
+
+    def _start_simulation(self, w, epochs=0, steps=0):
+        """
+        Starts simulating a new world, paused.
+
+        w       the world
+        epochs  epochs already done (when continuing from a checkpoint)
+        steps   steps already done (when continuing from a checkpoint)
+        """
+        self._stop_simulation()
+        self._world = w
+        if self._telemetry:
+            self._telemetry.attach_world(w)
+        self._sim = simulation.Simulation(w, epochs, steps)
+        self._sim.set_speed(self._get_speed())
+        self._sim.start()
+        self._plot_window.reset(w.get_config())
+        self._view.clear()
+        self._paint_world()
+
+    def _pause(self):
+        """
+        Pauses the simulation, if it is playing.
+        """
+        if self._running:
+            self._running = False
+            self._switch_play_button_type()
+            glib.source_remove(self._timer)
+            self._timer = None
+            self._sim.pause()
+
+    def _choose_file(self, title, action):
+        """
+        Asks the user for a file name.
+
+        title   title of the dialog
+        action  gtk.FILE_CHOOSER_ACTION_SAVE or gtk.FILE_CHOOSER_ACTION_OPEN
+        return  the file name or None if the user cancelled
+        """
+        btn = (gtk.STOCK_OK, gtk.RESPONSE_NONE,
+                gtk.STOCK_CANCEL, gtk.RESPONSE_REJECT)
+        d = gtk.FileChooserDialog(title, self, action, btn)
+        fName = None
+        if d.run() == gtk.RESPONSE_NONE:
+            fName = d.get_filename()
+        d.destroy()
+        return fName
+
     def _build_toolbar_button(self, img_stock, label, tooltip, callback):
         """
         Adds a new button to a toolbar.
@@ -233,6 +331,7 @@ class MainWindow(gtk.Window):
             label = 'Play'
             img_stock = gtk.STOCK_MEDIA_PLAY
         self._btnSavePlot.set_sensitive(label == 'Play')
+        self._btnCheckpoint.set_sensitive(label == 'Play')
         self._btnPlayPause.get_icon_widget().set_from_stock(img_stock,
                 gtk.ICON_SIZE_LARGE_TOOLBAR)
         self._btnPlayPause.set_label(label)
@@ -247,64 +346,77 @@ class MainWindow(gtk.Window):
         self._btnPlayPause.set_sensitive(state)
         self._btnShowPlot.set_sensitive(state)
         self._btnSavePlot.set_sensitive(state)
+        self._btnCheckpoint.set_sensitive(state)
 
     def __on_exit(self, widget, data=None):
         """
         Called when destroying the main window. Leave the gtk threads (and
         finish application).
         """
+        self._stop_simulation()
+        if self._telemetry:
+            self._telemetry.close()
         gtk.main_quit()
 
     def __on_new_game(self, widget, data=None):
         """
         Called when the user issues a request for a new game.
         """
-        if self._running:
-            self._running = False
-            self._inhibit = True
-            self._switch_play_button_type()
+        self._pause()
         cfg = config.Config(self, TITLE)
         cfg.display()
         r = cfg.get_settings()
         cfg.destroy()
         self._switch_playstep_buttons(r != None)
         if r:
-            self._world = world.World(r)
-            self._plot_window.reset()
-            self._paint_world()
-
-    def __step(self):
-        """
-        Callback function used to generate one more step from the simulation.
-
-        This is called exactly once by Step button's callback and as long as
-        it is needed as a timer callback set from the Play button's callback.
-        Because user might have pressed Pause before running this function, it
-        has to check if the simulation is still running and return the valid
-        response.
-
-        Since the simulation never ends, the only time we return False is when
-        the Pause button is pressed or a new simulation is started.
+            self._start_simulation(world.World(r))
+
+    def __on_resume(self, widget, data=None):
+        """
+        Called when the user wants to continue a simulation from a
+        checkpoint. The simulation keeps saving to the same file.
+        """
+        self._pause()
+        fName = self._choose_file('Select checkpoint:',
+                gtk.FILE_CHOOSER_ACTION_OPEN)
+        if not fName:
+            return
+        try:
+            w, extra = checkpoint.load(fName)
+        except (IOError, ValueError, KeyError):
+            md = gtk.MessageDialog(self, gtk.DIALOG_DESTROY_WITH_PARENT,
+                    gtk.MESSAGE_ERROR, gtk.BUTTONS_CLOSE, "Invalid file!")
+            md.run()
+            md.destroy()
+            return
+        self._start_simulation(w, extra['epochs'], extra['steps'])
+        self._sim.set_checkpoint(fName)
+        self._switch_playstep_buttons(True)
+
+    def __refresh(self):
+        """
+        Displays the latest state of the simulation: the world, the plot and
+        the informations about the current epoch.
+
+        This is called after each step done with the Step button and as a
+        timer callback, FPS times a second, while the simulation plays. The
+        simulation itself runs in another thread, at its own speed.
 
         return True if this functions should be called at a later time.
         """
-        if self._inhibit:
-            self._inhibit = False
-            # do nothing, stop callbacks
-            return False
-
-        ret = self._world.step()
-        self._plot_window.receive_reward(*ret)
+        epochs, snapshot = self._sim.sample()
+        self._plot_window.receive_sample(epochs, snapshot[3], snapshot[4])
         self._lblStep.set_text('{0}'.format(self._plot_window.get_step()))
         self._lblRew.set_text('{0}'.format(self._plot_window.get_rew()))
-        self._paint_world()
-        return self._running
+        self._paint_world(snapshot)
+        return True
 
     def __on_step(self, widget, data=None):
         """
         Called when the user clicks the Step button.
         """
-        self.__step()
+        self._sim.step()
+        self.__refresh()
 
     def __on_play(self, widget, data=None):
         """
@@ -314,12 +426,30 @@ class MainWindow(gtk.Window):
         self._switch_play_button_type()
         if self._running:
             self._btnStep.set_sensitive(False)
-            glib.timeout_add(25, self.__step)
-            self.__step()
+            self._sim.play()
+            self._timer = glib.timeout_add(1000 // FPS, self.__refresh)
         else:
-            self._inhibit = True
+            glib.source_remove(self._timer)
+            self._timer = None
+            self._sim.pause()
+            self.__refresh()
             self._btnStep.set_sensitive(True)
 
+    def __on_speed(self, widget, data=None):
+        """
+        Called when the user changes the speed of the simulation.
+        """
+        if self._sim:
+            self._sim.set_speed(self._get_speed())
+
+    def __on_format_speed(self, widget, value):
+        """
+        Called to get the text shown for a value of the speed slider.
+        """
+        if value >= MAX_SPEED:
+            return 'max'
+        return '{0:.0f}'.format(10 ** value)
+
     def __on_plot(self, widget, data=None):
         """
         Called when the user switches the status of the plot window.
@@ -332,6 +462,17 @@ class MainWindow(gtk.Window):
         """
         self._plot_window.save_data()
 
+    def __on_checkpoint(self, widget, data=None):
+        """
+        Called when the user wants to save the simulation. It is saved now,
+        every checkpoint.EVERY epochs and when it is stopped.
+        """
+        fName = self._choose_file('Select filename to save to:',
+                gtk.FILE_CHOOSER_ACTION_SAVE)
+        if fName:
+            self._sim.set_checkpoint(fName)
+            self._sim.save_checkpoint()
+
     def __on_about(self, widget, data=None):
         """
         Called when the user issues a request for the About dialog.
@@ -359,9 +500,9 @@ def main():
     """
     Main function. Construct the windows and start all application threads.
     """
+    gtk.gdk.threads_init()
     initImages()
     w = MainWindow()
-    gtk.gdk.threads_init()
     gtk.gdk.threads_enter()
     gtk.main()
     gtk.gdk.threads_leave()
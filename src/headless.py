@@ -0,0 +1,438 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Training without the GUI. Nothing in here (or imported from here) should
+# depend on gtk, so that this can run on machines without a display.
+#
+
+from __future__ import print_function
+
+import getopt
+import os
+import shutil
+
+from . import checkpoint
+from . import convergence
+from . import planning
+from . import rewardlog
+from . import telemetry
+from . import world
+from . import worldfile
+from .compat import has_numpy, xrange
+
+# Default settings, same as the initial values from the configuration dialog.
+DEFAULTS = {
+        'greedy?' : True,
+        'ε/τ' : .1,
+        'Q?' : True,
+        'α' : .1,
+        'γ' : .1,
+        'λ' : 0,
+        'runs' : 100,
+        }
+
+OPTIONS = 'a:g:e:t:SL:r:dpWn:k:o:b:s:c:T:'
+LONG_OPTIONS = ['alpha=', 'gamma=', 'epsilon=', 'tau=', 'sarsa', 'lambda=',
+        'max-steps=', 'dense', 'precompute', 'warm-start', 'epochs=',
+        'steps=', 'output=', 'batch=', 'seed=', 'checkpoint=', 'every=',
+        'resume', 'telemetry=',
+        'telemetry-every=', 'replay=', 'minibatch=', 'replay-every=',
+        'plan=', 'plan-steps=', 'plan-threshold=', 'converge=',
+        'policy-tol=', 'delta-tol=', 'store=']
+
+def build_config(fName, settings=None):
+    """
+    Builds the configuration dictionary for a simulation, exactly as the
+    configuration dialog would do.
+
+    fName       name of the world description file
+    settings    dictionary overriding some of the DEFAULTS
+    return      the configuration dictionary or None if the file is invalid
+    """
+    d = dict(DEFAULTS)
+    if settings:
+        d.update(settings)
+    if not worldfile.read_world(fName, d):
+        return None
+    return d
+
+class Trainer(object):
+    """
+    Runs a simulation in a tight loop, recording the reward obtained in each
+    epoch.
+
+    If the configuration asks for it, the robot starts from the utilities
+    of the solution of the world (see solver) and the convergence of the
+    learning is tracked, a run stopping as soon as the learning has
+    converged.
+
+    Simple workflow:
+        __init__ -> [restore ->] run -> [run ->]* save
+    """
+
+    def __init__(self, config, log=None, ckpt=None, every=checkpoint.EVERY):
+        """
+        Builds the world (and the robot) for the simulation.
+
+        config      The configuration dictionary (see build_config).
+        log         If given, a RewardLogWriter to which the reward of each
+                    epoch is appended as soon as the epoch ends.
+        ckpt        If given, a checkpoint is saved in this file every
+                    `every` epochs and at the end of each run.
+        every       Epochs between two checkpoints.
+        """
+        self._config = config
+        self._world = world.World(config)
+        self._log = log
+        self._checkpoint = ckpt
+        self._every = every if ckpt else 0
+        self._rewards = []
+        self._epochs = 0
+        self._steps = 0
+        if config.get('warm?'):
+            # needs numpy, import only when really used
+            from . import solver
+            solver.warm_start(self._world)
+        self._convergence = None
+        self._converged = False
+        if config.get('converge'):
+            self._convergence = convergence.Convergence(config['converge'],
+                    config.get('policy tol', convergence.POLICY_TOL),
+                    config.get('delta tol', convergence.DELTA_TOL))
+            self._convergence.attach(self._world.get_robot().get_table())
+
+    def run(self, epochs=0, steps=0):
+        """
+        Runs the simulation for a number of epochs or steps, whichever comes
+        first. A value of 0 means no limit for that counter but at least one
+        of them should be given. Also stops when the learning converges, if
+        tracked.
+
+        epochs  number of epochs to run
+        steps   number of steps to run
+        return  the list of rewards for all epochs ended until now
+        """
+        step = self._world.step
+        rewards = self._rewards
+        log = self._log
+        every = self._every
+        conv = self._convergence
+        target = self._epochs + epochs if epochs else -1
+        limit = steps if steps else -1
+        done = 0
+        while done != limit and self._epochs != target and not self._converged:
+            end, r = step()
+            done += 1
+            if end:
+                rewards.append(r)
+                self._epochs += 1
+                if log:
+                    log.append(r, self._steps + done)
+                if conv and conv.end_epoch():
+                    self._converged = True
+                if every and self._epochs % every == 0:
+                    self._save_checkpoint(self._steps + done)
+        self._steps += done
+        if log:
+            log.flush()
+        if self._checkpoint:
+            self._save_checkpoint(self._steps)
+        return rewards
+
+    def _save_checkpoint(self, steps):
+        """
+        Saves a checkpoint, after making sure that the log has all the ended
+        epochs.
+
+        steps   number of steps done until now
+        """
+        if self._log:
+            self._log.flush()
+        extra = {'epochs' : self._epochs, 'steps' : steps}
+        if self._convergence:
+            extra['convergence'] = self._convergence.get_state()
+        checkpoint.save(self._checkpoint, self._world, extra)
+
+    def restore(self, cp):
+        """
+        Continues the simulation saved in a checkpoint. The trainer should be
+        built with the configuration of the checkpoint.
+
+        cp      the Checkpoint
+        """
+        cp.restore(self._world)
+        extra = cp.get_extra()
+        self._epochs = extra['epochs']
+        self._steps = extra['steps']
+        if self._convergence and 'convergence' in extra:
+            self._convergence.set_state(extra['convergence'])
+            self._converged = self._convergence.converged()
+        if self._log:
+            self._log.truncate(self._epochs)
+
+    def get_rewards(self):
+        """
+        Returns the rewards of all the epochs ended by this trainer (not
+        those ended before the checkpoint it was restored from).
+        """
+        return self._rewards
+
+    def get_epochs(self):
+        """
+        Returns the number of epochs ended until now.
+        """
+        return self._epochs
+
+    def get_steps(self):
+        """
+        Returns the number of steps done until now.
+        """
+        return self._steps
+
+    def has_converged(self):
+        """
+        Returns True if the learning has converged (always False if the
+        convergence is not tracked).
+        """
+        return self._converged
+
+    def get_config(self):
+        """
+        Returns the configuration of the simulation.
+        """
+        return self._config
+
+    def get_world(self):
+        """
+        Returns the simulated world.
+        """
+        return self._world
+
+    def save(self, fName):
+        """
+        Saves the reward series as a reward log.
+
+        fName   the file to write to
+        """
+        rewardlog.save(self._rewards, fName, self._config)
+
+def parse_settings(opts):
+    """
+    Parses the learning options given on the command line.
+
+    opts    list of (option, value) pairs, as returned by getopt
+    return  the settings dictionary or None on invalid values
+    """
+    d = {}
+    try:
+        for o, v in opts:
+            if o in ['-a', '--alpha']:
+                d['α'] = float(v)
+            elif o in ['-g', '--gamma']:
+                d['γ'] = float(v)
+            elif o in ['-e', '--epsilon']:
+                d['greedy?'] = True
+                d['ε/τ'] = float(v)
+            elif o in ['-t', '--tau']:
+                d['greedy?'] = False
+                d['ε/τ'] = float(v)
+            elif o in ['-S', '--sarsa']:
+                d['Q?'] = False
+            elif o in ['-L', '--lambda']:
+                d['λ'] = float(v)
+                if not 0 <= d['λ'] <= 1:
+                    return None
+            elif o in ['-r', '--max-steps']:
+                d['runs'] = int(v)
+                if d['runs'] <= 0:
+                    return None
+            elif o in ['-d', '--dense']:
+                d['dense?'] = True
+            elif o in ['-p', '--precompute']:
+                d['tables?'] = True
+            elif o in ['-W', '--warm-start']:
+                d['warm?'] = True
+            elif o in ['-s', '--seed']:
+                d['seed'] = int(v)
+            elif o == '--replay':
+                d['replay'] = int(v)
+            elif o == '--minibatch':
+                d['minibatch'] = int(v)
+            elif o == '--replay-every':
+                d['replay every'] = int(v)
+            elif o == '--plan':
+                if v not in planning.MODES:
+                    return None
+                d['planning'] = v
+            elif o == '--plan-steps':
+                d['plan steps'] = int(v)
+            elif o == '--plan-threshold':
+                d['plan threshold'] = float(v)
+            elif o == '--converge':
+                d['converge'] = int(v)
+            elif o == '--policy-tol':
+                d['policy tol'] = float(v)
+            elif o == '--delta-tol':
+                d['delta tol'] = float(v)
+    except ValueError:
+        return None
+    for k in ['replay', 'minibatch', 'replay every', 'plan steps', 'converge']:
+        if d.get(k, 1) <= 0:
+            return None
+    if d.get('policy tol', 0) < 0 or d.get('delta tol', 0) < 0:
+        return None
+    if d.get('warm?') and not 0 <= d.get('γ', DEFAULTS['γ']) < 1:
+        # the solution of the world needs γ < 1, see solver
+        return None
+    return d
+
+def main(args):
+    """
+    Trains a robot on a world file without displaying anything.
+
+    args    command line arguments, after the `run` command
+    return  True if everything is ok, False otherwise
+    """
+    try:
+        opts, files = getopt.gnu_getopt(args, OPTIONS, LONG_OPTIONS)
+    except getopt.GetoptError:
+        return False
+    if len(files) != 1:
+        return False
+
+    epochs, steps, output, K = 0, 0, None, 0
+    ckpt, every, resume = None, checkpoint.EVERY, False
+    tel, interval = None, telemetry.INTERVAL
+    store_dir = None
+    try:
+        for o, v in opts:
+            if o in ['-n', '--epochs']:
+                epochs = int(v)
+            elif o in ['-k', '--steps']:
+                steps = int(v)
+            elif o in ['-o', '--output']:
+                output = v
+            elif o in ['-b', '--batch']:
+                K = int(v)
+            elif o in ['-c', '--checkpoint']:
+                ckpt = v
+            elif o == '--every':
+                every = int(v)
+            elif o == '--resume':
+                resume = True
+            elif o in ['-T', '--telemetry']:
+                tel = v
+            elif o == '--telemetry-every':
+                interval = float(v)
+            elif o == '--store':
+                store_dir = v
+    except ValueError:
+        return False
+    if epochs < 0 or steps < 0 or not (epochs or steps) or K < 0:
+        return False
+    if every <= 0 or (resume and not ckpt) or (K and (ckpt or tel)):
+        return False
+    if store_dir and (K or (resume and not output)):
+        # batch runs are not stored and a resumed run without an output file
+        # has no complete log to store
+        return False
+
+    settings = parse_settings(opts)
+    if settings is None:
+        return False
+    cp = None
+    if resume and os.path.exists(ckpt):
+        try:
+            cp = checkpoint.Checkpoint(ckpt)
+        except ValueError:
+            return False
+        config = cp.get_config()
+    else:
+        config = build_config(files[0], settings)
+    if not config:
+        return False
+
+    if K:
+        if [k for k in ['λ', 'replay', 'planning', 'converge', 'warm?']
+                if config.get(k)]:
+            # no eligibility traces, replay, planning, early stopping nor
+            # warm start in batch mode
+            return False
+        return run_batch(config, K, epochs, steps, output)
+    if config.get('warm?') and not has_numpy():
+        print('Warm start needs numpy')
+        return False
+    s, key, logfile = None, None, output
+    if store_dir:
+        from . import store
+        s = store.Store(store_dir)
+        key = store.run_key(config, epochs, steps)
+    if key:
+        fName = s.get(key)
+        if fName:
+            if cp:
+                cp.close()
+            if output:
+                shutil.copyfile(fName, output)
+            else:
+                store.print_rewards(fName)
+            return True
+        if not output:
+            logfile = s.tmp_name()
+    log = None
+    if logfile:
+        log = rewardlog.RewardLogWriter(logfile, config, steps=True,
+                resume=cp is not None)
+    t = Trainer(config, log, ckpt, every)
+    done = False
+    if cp:
+        t.restore(cp)
+        cp.close()
+        # the limits are for the entire run, not only for what is left
+        if epochs:
+            epochs -= t.get_epochs()
+            done = epochs <= 0
+        if steps:
+            steps -= t.get_steps()
+            done = done or steps <= 0
+    if tel:
+        tel = telemetry.Telemetry(tel, interval)
+        tel.attach_world(t.get_world())
+    if not done:
+        t.run(epochs, steps)
+    if tel:
+        tel.close()
+    if log:
+        log.close()
+    if key:
+        s.put(key, config, logfile)
+    if not output:
+        if key:
+            os.remove(logfile)
+        for r in t.get_rewards():
+            print(r)
+    return True
+
+def run_batch(config, K, epochs, steps, output):
+    """
+    Trains K robots at once, using the vectorized worlds. The rewards of
+    robot k are saved in output.k or, if there is no output file, printed on
+    the k-th column.
+
+    return  True if everything is ok, False otherwise
+    """
+    try:
+        # needs numpy, import only when really used
+        from . import batch
+    except ImportError:
+        print('Batch mode needs numpy')
+        return False
+    rewards = batch.train(config, K, epochs, steps, config.get('seed'))
+    if output:
+        for k in xrange(K):
+            rewardlog.save(rewards[k], '{0}.{1}'.format(output, k), config)
+    else:
+        for i in xrange(min(map(len, rewards))):
+            print(i, *[l[i] for l in rewards])
+    return True
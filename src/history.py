@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Bounded size summary of a series of rewards, used for plotting long runs.
+#
+
+import array
+from .compat import xrange
+
+class RewardHistory(object):
+    """
+    Keeps at most size buckets, each covering span consecutive epochs and
+    holding the min, the max and the last of their rewards. When all buckets
+    are used, neighbouring buckets are merged two by two and the span of a
+    bucket doubles. Thus, the memory used and the cost of drawing the history
+    don't depend on the number of epochs.
+    """
+
+    def __init__(self, size):
+        """
+        Builds an empty history.
+
+        size    maximum number of buckets (rounded up to an even number)
+        """
+        self._size = size + size % 2
+        self._min = array.array('d', [0.0]) * self._size
+        self._max = array.array('d', [0.0]) * self._size
+        self._last = array.array('d', [0.0]) * self._size
+        self._count = 0
+        self._span = 1
+        self._fill = 0
+        self._epochs = 0
+        self._lo = self._hi = None
+
+    def __len__(self):
+        """
+        Returns the number of buckets used.
+        """
+        return self._count
+
+    def add(self, r):
+        """
+        Adds the reward of a new epoch.
+
+        return  True if the range of the rewards changed
+        """
+        if self._fill == self._span or not self._count:
+            if self._count == self._size:
+                self._merge()
+            i = self._count
+            self._count += 1
+            self._min[i] = self._max[i] = r
+            self._fill = 0
+        else:
+            i = self._count - 1
+            if r < self._min[i]:
+                self._min[i] = r
+            if r > self._max[i]:
+                self._max[i] = r
+        self._last[i] = r
+        self._fill += 1
+        self._epochs += 1
+
+        if self._lo is None:
+            self._lo = self._hi = r
+            return True
+        if r < self._lo:
+            self._lo = r
+            return True
+        if r > self._hi:
+            self._hi = r
+            return True
+        return False
+
+    def _merge(self):
+        """
+        Merges each two neighbouring buckets. Called only when all buckets
+        are used (and full).
+        """
+        mn, mx, last = self._min, self._max, self._last
+        for i in xrange(self._size // 2):
+            mn[i] = min(mn[2 * i], mn[2 * i + 1])
+            mx[i] = max(mx[2 * i], mx[2 * i + 1])
+            last[i] = last[2 * i + 1]
+        self._count = self._size // 2
+        self._span *= 2
+        self._fill = self._span
+
+    def bucket(self, i):
+        """
+        Returns the (min, max, last) rewards of the i-th bucket.
+        """
+        return (self._min[i], self._max[i], self._last[i])
+
+    def get_range(self):
+        """
+        Returns the (min, max) of all rewards, (None, None) if there are none.
+        """
+        return (self._lo, self._hi)
+
+    def get_span(self):
+        """
+        Returns the number of epochs covered by a bucket.
+        """
+        return self._span
+
+    def get_epochs(self):
+        """
+        Returns the number of epochs added.
+        """
+        return self._epochs
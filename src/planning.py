@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Planning with a learned model of the world: Dyna-Q and prioritized
+# sweeping. After each real step, the robot does a few simulated backups,
+# using the transitions it remembers instead of moving in the world.
+#
+
+import heapq
+from .compat import xrange
+
+# Default number of simulated backups after each real step.
+BUDGET = 10
+
+# Prioritized sweeping ignores errors smaller than this.
+THRESHOLD = 1e-4
+
+# Names of the planning modes.
+DYNA = 'dyna'
+SWEEP = 'sweep'
+MODES = [DYNA, SWEEP]
+
+def backup(Q, s, a, n, r, alpha, gamma):
+    """
+    Updates the utility of taking action a from state s, which led to state n
+    with reward r, as Q-learning does.
+    """
+    q = Q.best(n) if n in Q else 0
+    Q.update(s, a, alpha * (r + gamma * q - Q.get(s, a)))
+
+class Model(object):
+    """
+    A tabular model of the world: the last transition (next state, reward)
+    observed for each (state, action) pair and, for each state, the pairs
+    known to lead to it. The world is deterministic, but states are only
+    what the sensors see, so a pair may lead to different states: only the
+    last one is remembered.
+    """
+
+    def __init__(self):
+        """
+        Builds an empty model.
+        """
+        # (state, action) -> (next state, reward)
+        self._next = {}
+        # pairs in the order they were first seen, for sampling
+        self._keys = []
+        # state -> list of (state, action) leading to it
+        self._preds = {}
+
+    def __len__(self):
+        """
+        Returns the number of (state, action) pairs seen.
+        """
+        return len(self._keys)
+
+    def observe(self, s, a, n, r):
+        """
+        Records a transition.
+        """
+        k = (s, a)
+        old = self._next.get(k)
+        if old is None:
+            self._keys.append(k)
+        elif old[0] != n:
+            self._preds[old[0]].remove(k)
+        if old is None or old[0] != n:
+            self._preds.setdefault(n, []).append(k)
+        self._next[k] = (n, r)
+
+    def get(self, s, a):
+        """
+        Returns the (next state, reward) observed after the (s, a) pair.
+        """
+        return self._next[(s, a)]
+
+    def predecessors(self, n):
+        """
+        Returns the list of (state, action) pairs leading to state n.
+        """
+        return self._preds.get(n, [])
+
+    def sample(self, rng):
+        """
+        Returns a (state, action, next state, reward) transition, picked
+        uniformly from the pairs seen, using the given RandomStream.
+        """
+        k = self._keys[rng.index(len(self._keys))]
+        return k + self._next[k]
+
+    def get_state(self, encode):
+        """
+        Returns the contents of the model, as lists, to be given to set_state
+        later.
+
+        encode  function turning a state into an integer
+        """
+        trans = [[encode(s), a, encode(self._next[(s, a)][0]),
+            self._next[(s, a)][1]] for s, a in self._keys]
+        preds = [[encode(n), [[encode(s), a] for s, a in l]]
+                for n, l in self._preds.items()]
+        return {'transitions' : trans, 'predecessors' : preds}
+
+    def set_state(self, d, decode):
+        """
+        Restores the contents returned by get_state.
+
+        decode  inverse of the encode function given to get_state
+        """
+        self._next = {}
+        self._keys = []
+        for s, a, n, r in d['transitions']:
+            k = (decode(s), a)
+            self._keys.append(k)
+            self._next[k] = (decode(n), r)
+        self._preds = dict((decode(n), [(decode(s), a) for s, a in l])
+                for n, l in d['predecessors'])
+
+class Dyna(object):
+    """
+    Dyna-Q: after each real step, backups of transitions picked uniformly
+    from the model.
+    """
+
+    def __init__(self, budget=BUDGET):
+        """
+        Builds the planner.
+
+        budget  number of simulated backups after each real step
+        """
+        self._model = Model()
+        self._budget = budget
+
+    def observe(self, Q, s, a, n, r, alpha, gamma):
+        """
+        Records a real transition (already learned from).
+        """
+        self._model.observe(s, a, n, r)
+
+    def plan(self, Q, alpha, gamma, rng):
+        """
+        Does the simulated backups.
+        """
+        model = self._model
+        for i in xrange(self._budget):
+            s, a, n, r = model.sample(rng)
+            backup(Q, s, a, n, r, alpha, gamma)
+
+    def get_state(self, encode):
+        """
+        Returns the state of the planner, see Model.get_state.
+        """
+        return {'model' : self._model.get_state(encode)}
+
+    def set_state(self, d, decode):
+        """
+        Restores the state returned by get_state.
+        """
+        self._model.set_state(d['model'], decode)
+
+class Sweeping(object):
+    """
+    Prioritized sweeping: the pairs are backed up in the order of their
+    errors, kept in a priority queue. After backing up a pair, the errors of
+    the pairs leading to its state are computed again, so that changes
+    propagate backwards. Only the highest priority of a pair is valid, the
+    older entries of the queue are skipped when they come up.
+    """
+
+    def __init__(self, budget=BUDGET, threshold=THRESHOLD):
+        """
+        Builds the planner.
+
+        budget      number of simulated backups after each real step
+        threshold   errors smaller than this are not queued
+        """
+        self._model = Model()
+        self._budget = budget
+        self._threshold = threshold
+        # heap of (-priority, order, state, action)
+        self._queue = []
+        # (state, action) -> priority in the queue
+        self._priority = {}
+        # insertion counter, ties are broken in FIFO order
+        self._order = 0
+
+    def _push(self, s, a, p):
+        """
+        Queues a pair with priority p, unless it is below the threshold or
+        already queued with a higher priority.
+        """
+        if p <= self._threshold or p <= self._priority.get((s, a), 0):
+            return
+        self._priority[(s, a)] = p
+        heapq.heappush(self._queue, (-p, self._order, s, a))
+        self._order += 1
+
+    def _pop(self):
+        """
+        Returns the pair with the highest priority (None if none is queued).
+        """
+        queue = self._queue
+        while queue:
+            p, o, s, a = heapq.heappop(queue)
+            if self._priority.get((s, a)) == -p:
+                del self._priority[(s, a)]
+                return (s, a)
+        return None
+
+    def _error(self, Q, s, a, n, r, gamma):
+        """
+        Returns the absolute error of the (s, a) pair.
+        """
+        q = Q.best(n) if n in Q else 0
+        return abs(r + gamma * q - Q.get(s, a))
+
+    def observe(self, Q, s, a, n, r, alpha, gamma):
+        """
+        Records a real transition (already learned from) and queues it.
+        """
+        self._model.observe(s, a, n, r)
+        self._push(s, a, self._error(Q, s, a, n, r, gamma))
+
+    def plan(self, Q, alpha, gamma, rng):
+        """
+        Does the simulated backups, stopping early if the queue is empty.
+        """
+        model = self._model
+        for i in xrange(self._budget):
+            k = self._pop()
+            if k is None:
+                return
+            s, a = k
+            n, r = model.get(s, a)
+            backup(Q, s, a, n, r, alpha, gamma)
+            for ps, pa in model.predecessors(s):
+                pn, pr = model.get(ps, pa)
+                self._push(ps, pa, self._error(Q, ps, pa, pn, pr, gamma))
+
+    def get_state(self, encode):
+        """
+        Returns the state of the planner, see Model.get_state.
+        """
+        return {'model' : self._model.get_state(encode),
+                'queue' : [[p, o, encode(s), a] for p, o, s, a in self._queue],
+                'priority' : [[encode(s), a, p]
+                    for (s, a), p in self._priority.items()],
+                'order' : self._order}
+
+    def set_state(self, d, decode):
+        """
+        Restores the state returned by get_state.
+        """
+        self._model.set_state(d['model'], decode)
+        self._queue = [(p, o, decode(s), a) for p, o, s, a in d['queue']]
+        self._priority = dict(((decode(s), a), p)
+                for s, a, p in d['priority'])
+        self._order = d['order']
+
+def new_planner(mode, budget=BUDGET, threshold=THRESHOLD):
+    """
+    Returns a planner for the given mode (one of MODES).
+    """
+    if mode == DYNA:
+        return Dyna(budget)
+    return Sweeping(budget, threshold)
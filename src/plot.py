@@ -8,8 +8,12 @@ PLOTSIZE = 400
 PAD = 10
 R = 4
 
+import array
 import gtk
-import cPickle
+
+from . import history
+from . import rewardlog
+from .compat import xrange
 
 class Plot(gtk.Window):
     """
@@ -42,14 +46,37 @@ class Plot(gtk.Window):
     def receive_reward(self, end_of_epoch, reward):
         """
         Receives an reward and a flag indicating the an epoch was ended.
+
+        The plot is redrawn only when an epoch ends or when the current reward
+        gets outside of the plotted range.
         """
         self._step += 1
-        self._rewards[self._rcount] = reward
+        self._current = reward
         if end_of_epoch:
             self._step = 0
-            self._rcount += 1
-            self._rewards.append(0)
-        self._do_plot()
+            self._current = 0
+            self._rewards.append(reward)
+            self._history.add(reward)
+            self._do_plot()
+        elif reward < self._shown[0] or reward > self._shown[1]:
+            self._do_plot()
+
+    def receive_sample(self, epochs, step, reward):
+        """
+        Receives the rewards of several ended epochs and the state of the
+        current one, sampled from a running simulation.
+
+        epochs  rewards of the epochs ended since the last sample
+        step    current step in the current epoch
+        reward  current total reward
+        """
+        self._step = step
+        self._current = reward
+        for r in epochs:
+            self._rewards.append(r)
+            self._history.add(r)
+        if epochs or reward < self._shown[0] or reward > self._shown[1]:
+            self._do_plot()
 
     def get_step(self):
         """
@@ -61,55 +88,80 @@ class Plot(gtk.Window):
         """
         Returns the current total reward.
         """
-        return self._rewards[self._rcount]
+        return self._current
 
     def _do_plot(self):
         """
-        Plots the rewards.
-        """
-        m = min([0, min(self._rewards)]) - PAD
-        M = max([0, max(self._rewards)]) + PAD
+        Plots the rewards. There is at most one point for each pixel column,
+        if there are more epochs than that each point stands for several
+        epochs and a vertical line shows their range.
+        """
+        lo, hi = self._history.get_range()
+        if lo is None:
+            lo = hi = 0
+        m = min(0, lo, self._current)
+        M = max(0, hi, self._current)
+        self._shown = (m, M)
+        m -= PAD
+        M += PAD
         dy = (PLOTSIZE + 0.0) / (m - M)
-        dx = (PLOTSIZE + 0.0) / (self._rcount + 2)
+        n = len(self._history)
+        dx = (PLOTSIZE + 0.0) / (n + 2)
         corners = []
-        for i in range(self._rcount + 1):
-            corners.append((int(dx * (i + 1)), int(dy * (self._rewards[i] - M))))
+        ranges = []
+        for i in xrange(n):
+            bmin, bmax, last = self._history.bucket(i)
+            x = int(dx * (i + 1))
+            corners.append((x, int(dy * (last - M))))
+            if bmin != bmax:
+                ranges.append((x, int(dy * (bmin - M)),
+                    x, int(dy * (bmax - M))))
+        corners.append((int(dx * (n + 1)), int(dy * (self._current - M))))
 
         gc = self.get_style().white_gc
         self._pixmap.draw_rectangle(gc, True, 0, 0, PLOTSIZE, PLOTSIZE)
 
         gc = self.get_style().black_gc
+        if ranges:
+            self._pixmap.draw_segments(gc, ranges)
         if len(corners) > 1:
             self._pixmap.draw_lines(gc, corners)
 
         gc.set_rgb_fg_color(gtk.gdk.Color(green=.8))
+        if dx < 2 * R:
+            # too many points, mark only the current one
+            corners = corners[-1:]
         for c in corners:
             self._pixmap.draw_arc(gc, True, c[0] - R, c[1] - R, 2 * R, 2 * R,
                     0, 360 * 64)
 
         gc.set_rgb_fg_color(gtk.gdk.Color(red=.8))
-        x = int(dx * (self._rcount + 1))
+        x = int(dx * (n + 1))
         y = int(dy * (0 - M))
         self._pixmap.draw_arc(gc, True, x - R, y - R, 2 * R, 2 * R, 0, 360 * 64)
 
         gc.set_rgb_fg_color(gtk.gdk.Color(red=0))
         self._canvas.queue_draw_area(0, 0, PLOTSIZE, PLOTSIZE)
 
-    def reset(self):
+    def reset(self, config=None):
         """
         Resets internal data between simulations.
+
+        config  configuration of the new simulation, saved with the data
         """
-        self._rewards = [0]
-        self._rcount = 0
+        self._config = config
+        # all rewards, kept only to be saved
+        self._rewards = array.array('l')
+        # what is plotted
+        self._history = history.RewardHistory(PLOTSIZE - 2)
+        self._current = 0
         self._step = 0
         self._do_plot()
 
     def save_data(self):
         """
-        Called when plotted data should be saved. Because we are sure that all
-        indices below self._rcount are static, we will save only those values.
-
-        To do this very quickly, use pickle
+        Called when plotted data should be saved. Only the rewards of the
+        ended epochs are saved, as a reward log.
         """
         btn = (gtk.STOCK_OK, gtk.RESPONSE_NONE,
                 gtk.STOCK_CANCEL, gtk.RESPONSE_REJECT)
@@ -117,8 +169,7 @@ class Plot(gtk.Window):
                 gtk.FILE_CHOOSER_ACTION_SAVE, btn)
         if d.run() == gtk.RESPONSE_NONE:
             filename = d.get_filename()
-            with open(filename, "w") as f:
-                cPickle.dump(self._rewards[:self._rcount], f)
+            rewardlog.save(self._rewards, filename, self._config)
         d.destroy()
 
     def _build_gui(self):
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# The tables holding the (state, action) utilities learned by the robot.
+# Both classes have the same interface, the robot doesn't care which one is
+# used. Each row of a table contains the utilities of the actions in the order
+# given by ACTIONS.
+#
+# The hot paths read the utilities in place, through locate and best, rather
+# than through row (which copies the row of a DenseQTable).
+#
+
+import array
+
+from .globaldefs import *
+from .compat import xrange
+
+def best_column(buf, i):
+    """
+    Returns the column of the largest of the 3 utilities buf[i:i + 3], read
+    in place. Ties are broken as max(zip(row, ACTIONS)) does: the last of the
+    maximal columns.
+    """
+    a, b, c = buf[i], buf[i + 1], buf[i + 2]
+    if c >= b:
+        return 2 if c >= a else 0
+    return 1 if b >= a else 0
+
+class DictQTable(object):
+    """
+    Q-table storing only the rows for the states seen until now, in a
+    dictionary. States can be any hashable value.
+    """
+
+    def __init__(self):
+        """
+        Builds an empty table.
+        """
+        self._rows = {}
+
+    def __len__(self):
+        """
+        Returns the number of states seen.
+        """
+        return len(self._rows)
+
+    def __contains__(self, state):
+        """
+        Returns True if state was added to the table.
+        """
+        return state in self._rows
+
+    def add(self, state):
+        """
+        Adds a new state to the table, with 0 utilities for all actions.
+        """
+        self._rows[state] = [0, 0, 0]
+
+    def row(self, state):
+        """
+        Returns the utilities of all actions taken from state.
+        """
+        return self._rows[state]
+
+    def locate(self, state):
+        """
+        Returns (buffer, offset): the utilities of the actions taken from
+        state are buffer[offset:offset + 3], to be read in place.
+        """
+        return (self._rows[state], 0)
+
+    def best(self, state):
+        """
+        Returns the largest utility of the actions taken from state.
+        """
+        return max(self._rows[state])
+
+    def get(self, state, a):
+        """
+        Returns the utility of taking action a from state.
+        """
+        return self._rows[state][a - TURN_RIGHT]
+
+    def update(self, state, a, delta):
+        """
+        Adds delta to the utility of taking action a from state.
+        """
+        self._rows[state][a - TURN_RIGHT] += delta
+
+    def set_row(self, state, values):
+        """
+        Sets the utilities of all actions taken from state, adding the state
+        if needed.
+        """
+        self._rows[state] = list(values)
+
+    def states(self):
+        """
+        Returns the list of states seen.
+        """
+        return list(self._rows.keys())
+
+class DenseQTable(object):
+    """
+    Q-table storing the rows for all possible states in a single array of
+    doubles. States are integers in [0, count), see encode_state.
+    """
+
+    def __init__(self, count):
+        """
+        Builds the table, allocating room for all states at once.
+
+        count   number of possible states
+        """
+        self._q = array.array('d', [0.0]) * (3 * count)
+        self._seen = bytearray(count)
+        self._len = 0
+
+    def __len__(self):
+        """
+        Returns the number of states seen.
+        """
+        return self._len
+
+    def __contains__(self, state):
+        """
+        Returns True if state was added to the table.
+        """
+        return self._seen[state] != 0
+
+    def add(self, state):
+        """
+        Marks state as seen. All its utilities are already 0.
+        """
+        if not self._seen[state]:
+            self._seen[state] = 1
+            self._len += 1
+
+    def row(self, state):
+        """
+        Returns a copy of the utilities of all actions taken from state.
+        """
+        i = 3 * state
+        return self._q[i:i + 3]
+
+    def locate(self, state):
+        """
+        Returns (buffer, offset): the utilities of the actions taken from
+        state are buffer[offset:offset + 3], to be read in place.
+        """
+        return (self._q, 3 * state)
+
+    def best(self, state):
+        """
+        Returns the largest utility of the actions taken from state.
+        """
+        q = self._q
+        i = 3 * state
+        return max(q[i], q[i + 1], q[i + 2])
+
+    def get(self, state, a):
+        """
+        Returns the utility of taking action a from state.
+        """
+        return self._q[3 * state + a - TURN_RIGHT]
+
+    def update(self, state, a, delta):
+        """
+        Adds delta to the utility of taking action a from state.
+        """
+        self._q[3 * state + a - TURN_RIGHT] += delta
+
+    def set_row(self, state, values):
+        """
+        Sets the utilities of all actions taken from state, adding the state
+        if needed.
+        """
+        self.add(state)
+        i = 3 * state
+        self._q[i:i + 3] = array.array('d', values)
+
+    def get_buffers(self):
+        """
+        Returns the array of utilities (3 doubles per state) and the seen
+        flags (1 byte per state), without copying them.
+        """
+        return (self._q, self._seen)
+
+    def set_buffers(self, q, seen):
+        """
+        Replaces the contents of the table. The arguments are used as they
+        are, they are not copied.
+
+        q       array('d') of the utilities, 3 for each state
+        seen    bytearray of flags, non-zero for the seen states
+        """
+        if len(q) != len(self._q) or len(seen) != len(self._seen):
+            raise ValueError('the table has a different size')
+        self._q = q
+        self._seen = seen
+        self._len = len(seen) - seen.count(b'\0')
+
+    def states(self):
+        """
+        Returns the list of states seen.
+        """
+        seen = self._seen
+        return [s for s in xrange(len(seen)) if seen[s]]
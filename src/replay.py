@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Experience replay: the transitions seen by the robot are kept in a ring
+# buffer and learned from again, in minibatches.
+#
+
+import array
+from .compat import xrange
+
+# Default capacity, minibatch size and steps between two minibatches.
+CAPACITY = 10000
+MINIBATCH = 32
+EVERY = 8
+
+class ReplayBuffer(object):
+    """
+    A fixed capacity ring buffer of transitions (state, action, next state,
+    reward, next action), kept in arrays allocated once. States are integers
+    (see encode_state), the next action is 0 if it is not known (it is only
+    used by SARSA). When full, the oldest transition is overwritten.
+    """
+
+    def __init__(self, capacity=CAPACITY):
+        """
+        Builds an empty buffer.
+        """
+        self._s = array.array('l', [0]) * capacity
+        self._a = array.array('b', [0]) * capacity
+        self._n = array.array('l', [0]) * capacity
+        self._r = array.array('d', [0]) * capacity
+        self._a2 = array.array('b', [0]) * capacity
+        self._capacity = capacity
+        # next position to write to
+        self._pos = 0
+        self._len = 0
+
+    def __len__(self):
+        """
+        Returns the number of transitions kept.
+        """
+        return self._len
+
+    def add(self, s, a, n, r, a2=0):
+        """
+        Adds a transition.
+        """
+        i = self._pos
+        self._s[i] = s
+        self._a[i] = a
+        self._n[i] = n
+        self._r[i] = r
+        self._a2[i] = a2
+        self._pos = (i + 1) % self._capacity
+        if self._len < self._capacity:
+            self._len += 1
+
+    def sample(self, k, rng):
+        """
+        Returns k transitions picked uniformly (with replacement).
+
+        k       number of transitions
+        rng     the RandomStream to take the random numbers from
+        return  list of (state, action, next state, reward, next action)
+        """
+        n = self._len
+        s, a, ns, r, a2 = self._s, self._a, self._n, self._r, self._a2
+        l = []
+        for j in xrange(k):
+            i = rng.index(n)
+            l.append((s[i], a[i], ns[i], r[i], a2[i]))
+        return l
+
+    def get_state(self):
+        """
+        Returns the contents of the buffer, as a dictionary of lists, to be
+        given to set_state later.
+        """
+        n = self._len
+        return {'pos' : self._pos, 'len' : n, 's' : self._s[:n].tolist(),
+                'a' : self._a[:n].tolist(), 'n' : self._n[:n].tolist(),
+                'r' : self._r[:n].tolist(), 'a2' : self._a2[:n].tolist()}
+
+    def set_state(self, d):
+        """
+        Restores the contents returned by get_state.
+        """
+        n = d['len']
+        self._s[:n] = array.array('l', d['s'])
+        self._a[:n] = array.array('b', d['a'])
+        self._n[:n] = array.array('l', d['n'])
+        self._r[:n] = array.array('d', d['r'])
+        self._a2[:n] = array.array('b', d['a2'])
+        self._pos = d['pos']
+        self._len = n
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Binary files holding the rewards of each epoch of a run.
+#
+# The file starts with a header:
+#   magic       4 bytes, MAGIC
+#   version     2 bytes
+#   flags       2 bytes, HAS_STEPS if each record has the step count too
+#   length      4 bytes, length of the configuration
+#   config      the configuration of the run, as JSON, padded with spaces
+#               such that the records start at a multiple of 8
+# followed by one fixed width record per epoch:
+#   reward      8 bytes, double
+#   steps       8 bytes, number of steps done when the epoch ended (only if
+#               HAS_STEPS is set)
+# All numbers are little endian. Because the records have a fixed width, the
+# file can be appended to while training and read partially or through mmap.
+#
+
+import json
+import mmap
+import os
+import struct
+
+from .compat import load_pickle
+
+MAGIC = b'QLRL'
+VERSION = 1
+HAS_STEPS = 1
+
+HEADER = struct.Struct('<4sHHI')
+REWARD = struct.Struct('<d')
+REWARD_STEPS = struct.Struct('<dq')
+
+def _pack_header(config, flags):
+    """
+    Returns the header of a file, as a string.
+    """
+    cfg = json.dumps(config or {}, sort_keys=True).encode('ascii')
+    size = HEADER.size + len(cfg)
+    cfg += b' ' * (-size % 8)
+    return HEADER.pack(MAGIC, VERSION, flags, len(cfg)) + cfg
+
+def _read_header(f):
+    """
+    Reads the header of a file.
+
+    return  (flags, config, offset of the first record) or None if this is not
+            a reward log
+    """
+    h = f.read(HEADER.size)
+    if len(h) != HEADER.size:
+        return None
+    magic, version, flags, length = HEADER.unpack(h)
+    if magic != MAGIC or version != VERSION:
+        return None
+    cfg = f.read(length)
+    if len(cfg) != length:
+        return None
+    return (flags, json.loads(cfg.decode('ascii')), HEADER.size + length)
+
+def is_reward_log(fName):
+    """
+    Returns True if fName is a reward log.
+    """
+    try:
+        with open(fName, 'rb') as f:
+            return _read_header(f) is not None
+    except (IOError, ValueError):
+        return False
+
+class RewardLogWriter(object):
+    """
+    Writes a reward log, one epoch at a time.
+
+    Simple workflow:
+        __init__ -> append* -> close
+    """
+
+    def __init__(self, fName, config=None, steps=False, resume=False):
+        """
+        Creates the file (or opens it to add more epochs).
+
+        fName   name of the file
+        config  configuration of the run, saved in the header
+        steps   True to save the step count of each epoch too
+        resume  if True and the file exists, add to it (the header is kept,
+                an incomplete last record is dropped)
+        """
+        self._record = REWARD_STEPS if steps else REWARD
+        if resume and os.path.exists(fName):
+            self._f = open(fName, 'r+b')
+            h = _read_header(self._f)
+            if h is None or bool(h[0] & HAS_STEPS) != bool(steps):
+                self._f.close()
+                raise ValueError('{0} is not a compatible log'.format(fName))
+            self._offset = h[2]
+            self._f.seek(0, os.SEEK_END)
+            size = self._f.tell() - self._offset
+            self.truncate(size // self._record.size)
+        else:
+            self._f = open(fName, 'wb')
+            header = _pack_header(config, HAS_STEPS if steps else 0)
+            self._f.write(header)
+            self._offset = len(header)
+
+    def append(self, reward, steps=0):
+        """
+        Adds the reward of a new epoch.
+
+        reward  the total reward of the epoch
+        steps   the number of steps done when the epoch ended
+        """
+        if self._record is REWARD:
+            self._f.write(REWARD.pack(reward))
+        else:
+            self._f.write(REWARD_STEPS.pack(reward, steps))
+
+    def truncate(self, epochs):
+        """
+        Keeps only the records of the first epochs (for example, to continue
+        a run from a checkpoint saved before the last epochs were logged).
+        Further records are appended after them.
+        """
+        self._f.flush()
+        self._f.seek(0, os.SEEK_END)
+        size = self._f.tell()
+        count = (size - self._offset) // self._record.size
+        end = self._offset + min(epochs, count) * self._record.size
+        if end != size:
+            # also drops an incomplete last record
+            self._f.truncate(end)
+        self._f.seek(0, os.SEEK_END)
+
+    def flush(self):
+        """
+        Makes sure everything appended is in the file.
+        """
+        self._f.flush()
+
+    def close(self):
+        """
+        Closes the file.
+        """
+        self._f.close()
+
+class RewardLog(object):
+    """
+    Reads a reward log, through mmap. Only the records which are asked for
+    are unpacked.
+    """
+
+    def __init__(self, fName):
+        """
+        Opens the file.
+
+        Raises ValueError if the file is not a reward log.
+        """
+        with open(fName, 'rb') as f:
+            h = _read_header(f)
+            if h is None:
+                raise ValueError('{0} is not a reward log'.format(fName))
+            flags, self._config, self._offset = h
+            self._steps = bool(flags & HAS_STEPS)
+            self._record = REWARD_STEPS if self._steps else REWARD
+            size = os.fstat(f.fileno()).st_size - self._offset
+            self._len = size // self._record.size
+            if self._len:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._mm = None
+
+    def __len__(self):
+        """
+        Returns the number of epochs.
+        """
+        return self._len
+
+    def get_config(self):
+        """
+        Returns the configuration of the run.
+        """
+        return self._config
+
+    def has_steps(self):
+        """
+        Returns True if the step count of each epoch is known.
+        """
+        return self._steps
+
+    def rewards(self, start=0, stop=None):
+        """
+        Returns the rewards of the epochs in [start, stop).
+        """
+        return self._read(start, stop, 0)
+
+    def steps(self, start=0, stop=None):
+        """
+        Returns the step counts of the epochs in [start, stop).
+        """
+        if not self._steps:
+            raise ValueError('the log has no step counts')
+        return self._read(start, stop, 1)
+
+    def _read(self, start, stop, column):
+        """
+        Returns a column of the records in [start, stop).
+        """
+        start, stop, _ = slice(start, stop).indices(self._len)
+        if start >= stop:
+            return []
+        fmt = '<' + self._record.format[1:] * (stop - start)
+        values = struct.unpack_from(fmt, self._mm,
+                self._offset + start * self._record.size)
+        if self._steps:
+            return list(values[column::2])
+        return list(values)
+
+    def as_array(self):
+        """
+        Returns the rewards as a numpy array sharing the memory of the file
+        (no copy is done). Needs numpy.
+        """
+        import numpy
+        if not self._len:
+            return numpy.zeros(0)
+        if self._steps:
+            dtype = numpy.dtype([('reward', '<f8'), ('steps', '<i8')])
+            a = numpy.frombuffer(self._mm, dtype, self._len, self._offset)
+            return a['reward']
+        return numpy.frombuffer(self._mm, '<f8', self._len, self._offset)
+
+    def close(self):
+        """
+        Closes the file.
+        """
+        if self._mm:
+            self._mm.close()
+            self._mm = None
+
+def save(rewards, fName, config=None):
+    """
+    Saves a list of rewards as a reward log.
+    """
+    w = RewardLogWriter(fName, config)
+    for r in rewards:
+        w.append(r)
+    w.close()
+
+def load(fName):
+    """
+    Loads the list of rewards from a file, either a reward log or a pickled
+    list (as saved by older versions).
+    """
+    if is_reward_log(fName):
+        log = RewardLog(fName)
+        rewards = log.rewards()
+        log.close()
+        return rewards
+    with open(fName, 'rb') as f:
+        return load_pickle(f)
+
+def convert(src, dst):
+    """
+    Converts a pickled list of rewards to a reward log.
+    """
+    with open(src, 'rb') as f:
+        save(load_pickle(f), dst)
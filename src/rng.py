@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Seedable streams of random numbers, used by the robot. Each simulation has
+# its own stream, so that a run can be repeated exactly given its seed.
+#
+
+import hashlib
+import random
+from .compat import xrange
+
+# How many numbers are generated at once.
+BLOCK = 4096
+
+def derive_seed(seed, index):
+    """
+    Derives the seed of the index-th independent stream from a base seed
+    (for example, the seed of each job of a sweep). The result fits in 32
+    bits, so it can be used with numpy too.
+    """
+    h = hashlib.sha1('{0}:{1}'.format(seed, index).encode('ascii'))
+    h = h.hexdigest()
+    return int(h[:8], 16)
+
+class RandomStream(object):
+    """
+    A stream of uniform numbers in [0, 1), generated in blocks of BLOCK
+    values to amortize the cost of calling the generator.
+    """
+
+    def __init__(self, seed=None):
+        """
+        Builds the stream.
+
+        seed    the seed, None to seed from the system's entropy
+        """
+        self._seed = seed
+        self._random = random.Random(seed)
+        self._block = []
+        self._i = 0
+
+    def get_seed(self):
+        """
+        Returns the seed of this stream.
+        """
+        return self._seed
+
+    def uniform(self):
+        """
+        Returns the next number of the stream.
+        """
+        if self._i == len(self._block):
+            r = self._random.random
+            self._block = [r() for i in xrange(BLOCK)]
+            self._i = 0
+        u = self._block[self._i]
+        self._i += 1
+        return u
+
+    def uniforms(self, k):
+        """
+        Returns the next k numbers of the stream, taken from the block at
+        once (the same numbers as k calls of uniform).
+        """
+        out = []
+        while k:
+            if self._i == len(self._block):
+                r = self._random.random
+                self._block = [r() for i in xrange(BLOCK)]
+                self._i = 0
+            j = min(len(self._block), self._i + k)
+            out.extend(self._block[self._i:j])
+            k -= j - self._i
+            self._i = j
+        return out
+
+    def index(self, n):
+        """
+        Returns a random integer in [0, n), from the next number of the stream.
+        """
+        return int(self.uniform() * n)
+
+    def spawn(self, k):
+        """
+        Returns k new streams, independent of this one and of each other. If
+        this stream has a seed, the new ones are seeded by derive_seed.
+        """
+        if self._seed is None:
+            return [RandomStream() for i in xrange(k)]
+        return [RandomStream(derive_seed(self._seed, i)) for i in xrange(k)]
+
+    def get_state(self):
+        """
+        Returns the state of the stream, to be given to set_state later.
+        """
+        return (self._seed, self._random.getstate(), self._block[self._i:])
+
+    def set_state(self, state):
+        """
+        Restores a state returned by get_state.
+        """
+        self._seed, s, self._block = state
+        self._random.setstate(s)
+        self._block = list(self._block)
+        self._i = 0
@@ -6,28 +6,118 @@
 import random
 import math
 
-from globaldefs import *
+from . import planning
+from . import qtable
+from . import replay
+from . import rng
+from . import traces
+from .globaldefs import *
 
-def get_cdf(l):
+class Softmax(object):
     """
-    Computes the cdf of a pmf, described as [(prob, elem)].
-    """
-    s = 0
-    nl = []
-    for p in l:
-        s += p[0]
-        nl.append((s, p[1]))
-    return nl
-
-def roulette_value(pairs, select):
-    """
-    Returns a value from a list of [(cdf, value)] as given by select.
+    Softmax (Gibbs) selection between a fixed number of elements: element i
+    is selected with probability exp(v_i/τ)/sum(exp(v_j/τ)).
+
+    The max value is subtracted before exponentiating (log-sum-exp), so
+    there is no overflow for large values or small τ and the sum is never
+    0. No list is built on a selection, the weights go in a buffer
+    allocated once and the values are read in place (a row of a Q-table is
+    found at an offset of its buffer, see locate).
     """
-    for p in pairs:
-        select -= p[0]
-        if select < 0:
-            return p[1]
-    return pairs[-1][1]
+
+    def __init__(self, tau, n=len(ACTIONS)):
+        """
+        Builds the selector.
+
+        tau     the temperature τ
+        n       number of elements to select from
+        """
+        self._tau = tau
+        self._w = [0.0] * n
+        # buffer for the values of choose_pairs
+        self._v = [0.0] * n
+
+    def get_tau(self):
+        """
+        Returns the temperature τ.
+        """
+        return self._tau
+
+    def __len__(self):
+        """
+        Returns the number of elements selected from.
+        """
+        return len(self._w)
+
+    def choose(self, values, u, offset=0):
+        """
+        Selects an element.
+
+        values  the values of the n elements, from values[offset]
+        u       uniform random number in [0, 1)
+        offset  index of the value of the first element
+        return  index of the selected element
+        """
+        w = self._w
+        n = len(w)
+        m = values[offset]
+        i = 1
+        while i < n:
+            if values[offset + i] > m:
+                m = values[offset + i]
+            i += 1
+        total = 0.0
+        i = 0
+        while i < n:
+            e = math.exp((values[offset + i] - m) / self._tau)
+            w[i] = e
+            total += e
+            i += 1
+        # roulette: find the first element with cdf above u * total
+        u *= total
+        i = 0
+        while i < n - 1:
+            u -= w[i]
+            if u < 0:
+                return i
+            i += 1
+        return n - 1
+
+    def choose_pairs(self, pairs, u):
+        """
+        Selects an element from a list of n (value, element) pairs.
+
+        return  the selected element
+        """
+        v = self._v
+        i = 0
+        for p in pairs:
+            v[i] = p[0]
+            i += 1
+        return pairs[self.choose(v, u)][1]
+
+    def choose_batch(self, values, offsets, stream):
+        """
+        Selects an element for each of several rows of values, all in the
+        same buffer (a Q-table, see locate), with the random numbers drawn
+        from the stream in a single block.
+
+        values  buffer of the values
+        offsets offset of each row in the buffer
+        stream  the RandomStream
+        return  list of indices of the selected elements
+        """
+        choose = self.choose
+        out = stream.uniforms(len(offsets))
+        k = 0
+        for i in offsets:
+            out[k] = choose(values, out[k], i)
+            k += 1
+        return out
+
+# Selector reused by gibbs_choice, as long as τ and the number of elements
+# don't change.
+_gibbs = Softmax(1.0)
 
 def gibbs_choice(pairs, tau):
     """
@@ -37,18 +127,10 @@ def gibbs_choice(pairs, tau):
     More exactly, selects element (p, x) (thus returning x) with probability
     exp(p/τ)/sum(exp(p_i/τ)), where τ = tau
     """
-    # divide each p by τ
-    divs = map(lambda x: (math.exp(x[0]/tau), x[1]), pairs)
-    # get the entire sum
-    psum = sum(map(lambda x: x[0], divs))
-    # get the probabilities (pmf)
-    pmf = map(lambda x: (x[0]/psum, x[1]), divs)
-    # get the cdf
-    cdf = get_cdf(pmf)
-    # get a random variable in [0, 1) used to select from the cdf (roulette)
-    roulette = random.uniform(0, 1)
-    # return the selected value
-    return roulette_value(cdf, roulette)
+    global _gibbs
+    if _gibbs.get_tau() != tau or len(_gibbs) != len(pairs):
+        _gibbs = Softmax(tau, len(pairs))
+    return _gibbs.choose_pairs(pairs, random.uniform(0, 1))
 
 class Robot(object):
     """
@@ -62,20 +144,84 @@ class Robot(object):
         """
         Construct a new robot, passing several configurations to him.
 
-        config  The user configurations which affect the robot.
+        config  The user configurations which affect the robot. If it
+                contains the number of possible states, the utilities are
+                kept in an array instead of a dictionary. If it contains a
+                random stream, all random decisions are taken from it. If
+                λ is not 0, eligibility traces are used: Watkins's Q(λ) or
+                SARSA(λ). If it contains a replay capacity, the transitions
+                are also learned from again, in minibatches (the states are
+                encoded, so D is needed too when they are tuples). If it
+                contains a planning mode, a model of the world is learned
+                and used for simulated backups after each real step.
         """
         self._greedy = config['greedy?']
         self._eps_or_tau = config['___ε/τ']
         self._Q_or_SARSA = config['Q?']
         self._alpha = config['___α']
         self._gamma = config['___γ']
+        if not self._greedy:
+            self._softmax = Softmax(self._eps_or_tau)
+        self._rng = config.get('rng') or rng.RandomStream()
 
-        # state, action utility dictionary
-        self._Q = {}
+        # state, action utility table
+        if config.get('states'):
+            self._Q = qtable.DenseQTable(config['states'])
+        else:
+            self._Q = qtable.DictQTable()
 
         # decided upon action (when using SARSA)
         self.__a__ = None
 
+        # eligibility traces, if used
+        self._lambda = config.get('___λ', 0)
+        self._traces = None
+        if self._lambda:
+            self._traces = traces.Traces(self._gamma * self._lambda)
+            self.step = self._step_with_traces
+            self.receive_reward_and_state = self._receive_with_traces
+
+        # experience replay, if used
+        self._replay = None
+        if config.get('replay'):
+            self._replay = replay.ReplayBuffer(config['replay'])
+            self._minibatch = config.get('minibatch', replay.MINIBATCH)
+            self._replay_every = config.get('replay every', replay.EVERY)
+            self._until_replay = self._replay_every
+            self._D = None if config.get('states') else config['D']
+            # learn online as before, then store the transition
+            self._learn = self.receive_reward_and_state
+            self.receive_reward_and_state = self._receive_with_replay
+
+        # planning with a model of the world, if used
+        self._planner = None
+        if config.get('planning'):
+            self._planner = planning.new_planner(config['planning'],
+                    config.get('plan steps', planning.BUDGET),
+                    config.get('plan threshold', planning.THRESHOLD))
+            self._experience = self.receive_reward_and_state
+            self.receive_reward_and_state = self._receive_with_planning
+
+    def get_table(self):
+        """
+        Returns the table of (state, action) utilities.
+        """
+        return self._Q
+
+    def get_pending_action(self):
+        """
+        Returns the action already chosen for the next step (when using SARSA)
+        or None.
+        """
+        return self.__a__
+
+    def set_pending_action(self, a):
+        """
+        Sets the action chosen for the next step, as returned by
+        get_pending_action.
+        """
+        self.__a__ = a
+
     def step(self, state):
         """
         Does a single step (takes an action).
@@ -84,13 +230,146 @@ class Robot(object):
         return  Action
         """
         # Chose action from state
-        if self._Q.has_key(state):
-            a = self._choose_action(self._Q[state])
+        Q = self._Q
+        if state in Q:
+            buf, i = Q.locate(state)
+            a = self._choose_action(buf, i)
         else:
-            self._Q[state] = {FORWARD:0, TURN_LEFT:0, TURN_RIGHT:0}
-            a = random.choice(self._Q[state].keys())
+            self._Q.add(state)
+            a = ACTIONS[self._rng.index(len(ACTIONS))]
         return a
 
+    def end_epoch(self):
+        """
+        Called when an epoch ends, before the robot is moved back to the
+        start position. Drops the eligibility traces, if any.
+        """
+        if self._traces:
+            self._traces.clear()
+
+    def get_traces(self):
+        """
+        Returns the eligibility traces (None if they are not used).
+        """
+        return self._traces
+
+    def _step_with_traces(self, state):
+        """
+        Same as step, used for Q(λ) and SARSA(λ). With Q(λ), the traces are
+        dropped when the action taken is not a greedy one (Watkins).
+        """
+        Q = self._Q
+        if state in Q:
+            buf, i = Q.locate(state)
+            a = self._choose_action(buf, i)
+            if self._Q_or_SARSA and buf[i + a - TURN_RIGHT] < Q.best(state):
+                self._traces.clear()
+        else:
+            self._Q.add(state)
+            a = ACTIONS[self._rng.index(len(ACTIONS))]
+        return a
+
+    def _receive_with_traces(self, olds, a, news, r):
+        """
+        Same as receive_reward_and_state, used for Q(λ) and SARSA(λ): the
+        error of the one step backup updates all the (state, action) pairs
+        visited recently, in proportion to their traces.
+        """
+        Q = self._Q
+        if news not in Q:
+            q = 0
+        elif self._Q_or_SARSA:
+            q = Q.best(news)
+        else:
+            buf, i = Q.locate(news)
+            q = Q.get(news, self._choose_action(buf, i, True))
+        self._traces.visit(olds, a)
+        self._traces.update(Q,
+                self._alpha * (r + self._gamma * q - Q.get(olds, a)))
+
+    def get_replay_state(self):
+        """
+        Returns the contents of the replay buffer and the steps until the
+        next minibatch, as a dictionary (None if replay is not used).
+        """
+        if self._replay is None:
+            return None
+        d = self._replay.get_state()
+        d['until'] = self._until_replay
+        return d
+
+    def set_replay_state(self, d):
+        """
+        Restores the state returned by get_replay_state.
+        """
+        self._replay.set_state(d)
+        self._until_replay = d['until']
+
+    def _receive_with_replay(self, olds, a, news, r):
+        """
+        Same as receive_reward_and_state, used with experience replay: after
+        learning from the transition, it is stored and, every few steps, a
+        minibatch of stored transitions is learned from.
+        """
+        self._learn(olds, a, news, r)
+        if self._D is not None:
+            olds = encode_state(olds, self._D)
+            news = encode_state(news, self._D)
+        self._replay.add(olds, a, news, r, self.__a__ or 0)
+        self._until_replay -= 1
+        if not self._until_replay:
+            self._until_replay = self._replay_every
+            if len(self._replay) >= self._minibatch:
+                self._replay_minibatch()
+
+    def _replay_minibatch(self):
+        """
+        Learns from a minibatch of stored transitions, in one pass: all the
+        errors are computed from the utilities before the minibatch, those
+        of the same (state, action) pair are added up and each utility is
+        then updated once. So a pair sampled several times gets all its
+        updates, as in a batched gradient step.
+        """
+        Q = self._Q
+        D = self._D
+        alpha, gamma = self._alpha, self._gamma
+        deltas = {}
+        for s, a, n, r, a2 in self._replay.sample(self._minibatch, self._rng):
+            if D is not None:
+                s = decode_state(s, D)
+                n = decode_state(n, D)
+            if n not in Q:
+                q = 0
+            elif self._Q_or_SARSA:
+                q = Q.best(n)
+            elif a2:
+                q = Q.get(n, a2)
+            else:
+                q = 0
+            k = (s, a)
+            delta = alpha * (r + gamma * q - Q.get(s, a))
+            deltas[k] = deltas.get(k, 0) + delta
+        for k, d in deltas.items():
+            Q.update(k[0], k[1], d)
+
+    def get_planner(self):
+        """
+        Returns the planner (None if planning is not used).
+        """
+        return self._planner
+
+    def _receive_with_planning(self, olds, a, news, r):
+        """
+        Same as receive_reward_and_state, used when planning: after learning
+        from the transition, it is recorded in the model and the planner does
+        its simulated backups. Backups are those of Q-learning, even when the
+        robot uses SARSA.
+        """
+        self._experience(olds, a, news, r)
+        self._planner.observe(self._Q, olds, a, news, r,
+                self._alpha, self._gamma)
+        self._planner.plan(self._Q, self._alpha, self._gamma, self._rng)
+
     def receive_reward_and_state(self, olds, a, news, r):
         """
         Receive a reward after taking an action from olds state, reaching news
@@ -101,44 +380,43 @@ class Robot(object):
         news    New state
         r       Reward given
         """
-        if not self._Q.has_key(news):
+        Q = self._Q
+        if news not in Q:
             q = 0
         elif self._Q_or_SARSA:
             # Q learning
-            d = self._Q[news]
-            q = max(zip(d.values(), d.keys()))[0]
+            q = Q.best(news)
         else:
             # SARSA
-            q = self._Q[news][self._choose_action(self._Q[news], True)]
-        qa = self._Q[olds][a]
-        self._Q[olds][a] += self._alpha * (r + self._gamma * q - qa)
+            buf, i = Q.locate(news)
+            q = Q.get(news, self._choose_action(buf, i, True))
+        qa = Q.get(olds, a)
+        Q.update(olds, a, self._alpha * (r + self._gamma * q - qa))
 
-    def _choose_action(self, actions, future=False):
+    def _choose_action(self, buf, i, future=False):
         """
-        Choose an action from the list of actions and their rewards (a
-        dictionary to be more exact).
+        Choose an action from the action utilities, read in place.
 
-        actions Dictionary containing each possible action and its value.
+        buf     Buffer holding the utilities of each action, in the order
+                given by ACTIONS, from buf[i] (see locate).
+        i       Offset of the utilities in buf.
         future  True if using SARSA and this call is only prospective (in
                 which case, the same action should be returned on the next
                 call, which will have future=False).
         """
-        a = actions.keys()[0]
         if self._greedy:
             # ε-greedy selection
-            tmp = random.uniform(0, 1)
+            tmp = self._rng.uniform()
             if tmp > self._eps_or_tau:
-                a = max(zip(actions.values(), actions.keys()))[1]
+                a = ACTIONS[qtable.best_column(buf, i)]
             else:
-                a = random.choice(actions.keys())
+                a = ACTIONS[self._rng.index(len(ACTIONS))]
         else:
             # softmax selection
-            pairs = zip(actions.values(), actions.keys())
-            a = gibbs_choice(pairs, self._eps_or_tau)
+            a = ACTIONS[self._softmax.choose(buf, self._rng.uniform(), i)]
         if future:
             self.__a__ = a
         elif self.__a__:
             a = self.__a__ #take the generated action
             self.__a__ = None
         return a
-
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Searching the grid of settings on a budget, by successive halving: all the
+# combinations are trained for a few epochs, only the best of them are
+# trained further, and so on until the last few are trained for the full
+# number of epochs. Hyperband runs several such brackets, from many
+# combinations with few epochs to a few combinations with many epochs, in
+# case the best settings are slow starters.
+#
+# A promoted combination continues from its checkpoint instead of starting
+# again. The runs are repeatable (each combination has its own seed, see
+# sweep) and a combination is only scored on the epochs of its rung, so a
+# search which was interrupted can be started again with the same command:
+# the runs continue from their checkpoints and the same combinations are
+# promoted.
+#
+
+from __future__ import print_function
+
+import getopt
+import json
+import multiprocessing
+import os
+import random
+
+from . import checkpoint
+from . import headless
+from . import rewardlog
+from . import sweep
+from .compat import has_numpy
+
+OPTIONS = 'a:g:e:t:l:L:r:dpWn:N:o:j:s:'
+LONG_OPTIONS = ['alpha=', 'gamma=', 'epsilon=', 'tau=', 'learning=', 'lambda=',
+        'max-steps=', 'dense', 'precompute', 'warm-start', 'epochs=',
+        'max-epochs=', 'output=', 'jobs=', 'seed=', 'eta=', 'hyperband',
+        'converge=', 'policy-tol=', 'delta-tol=']
+
+# Default fraction (1 / ETA) of the combinations promoted from a rung.
+ETA = 3
+
+def score(rewards):
+    """
+    Returns the score of a run: the mean reward of its last epochs (None if
+    it has no epochs).
+    """
+    if not rewards:
+        return None
+    last = rewards[-sweep.FINAL:]
+    return sum(last) / float(len(last))
+
+def max_bracket(first, last, eta):
+    """
+    Returns the largest number of promotions possible when the first rung
+    has `first` epochs and each rung has eta times more, up to `last`.
+    """
+    s = 0
+    while first * eta ** (s + 1) <= last:
+        s += 1
+    return s
+
+def rungs(first, last, s, eta):
+    """
+    Returns the epochs of the s + 1 rungs of a bracket, the last one being
+    the full number of epochs.
+    """
+    return [first * eta ** i for i in range(s)] + [last]
+
+def brackets(configs, first, last, eta, hyperband, seed):
+    """
+    Returns the brackets to run.
+
+    configs     list of jobs, see sweep.build_jobs
+    first       epochs of the first rung (of the largest bracket)
+    last        epochs of the last rung
+    hyperband   True for all the brackets of Hyperband, False for a single
+                successive halving on all the combinations
+    seed        seed used to pick the combinations of each bracket
+    return      list of (combinations, list of epochs of each rung)
+    """
+    smax = max_bracket(first, last, eta)
+    if not hyperband:
+        return [(configs, rungs(first, last, smax, eta))]
+    pick = random.Random(seed)
+    result = []
+    for s in range(smax, -1, -1):
+        # as many combinations as the budget of the bracket allows
+        n = -(-(smax + 1) * eta ** s // (s + 1))
+        chosen = configs
+        if n < len(configs):
+            picked = sorted(pick.sample(range(len(configs)), n))
+            chosen = [configs[k] for k in picked]
+        result.append((chosen, rungs(max(first, last // eta ** s), last, s,
+            eta)))
+    return result
+
+def same_config(a, b):
+    """
+    Returns True if two configurations are the same, as saved in the
+    checkpoints.
+    """
+    return json.dumps(a, sort_keys=True) == json.dumps(b, sort_keys=True)
+
+def advance(job):
+    """
+    Trains a combination up to a number of epochs, in a worker process,
+    continuing from its checkpoint if it has one for the same
+    configuration.
+
+    job     tuple (name, file, settings, epochs, output, checkpoint)
+    return  tuple (name, seed, epochs, score, epochs trained now), with
+            epochs None if the world file is invalid
+    """
+    name, fName, settings, epochs, output, ckpt = job
+    config = headless.build_config(fName, settings)
+    if not config:
+        return (name, settings['seed'], None, None, 0)
+    cp = None
+    if os.path.exists(ckpt):
+        cp = checkpoint.Checkpoint(ckpt)
+        if same_config(cp.get_config(), config):
+            config = cp.get_config()
+        else:
+            # left by a search with another seed or other settings
+            cp.close()
+            cp = None
+    log = rewardlog.RewardLogWriter(output, config, steps=True,
+            resume=cp is not None)
+    t = headless.Trainer(config, log, ckpt)
+    if cp:
+        t.restore(cp)
+        cp.close()
+    done = t.get_epochs()
+    if done < epochs and not t.has_converged():
+        t.run(epochs - done)
+    log.close()
+    log = rewardlog.RewardLog(output)
+    # only the epochs of the rung, the run may have gone further before
+    rewards = log.rewards(0, epochs)
+    log.close()
+    return (name, settings['seed'], len(rewards), score(rewards),
+            max(0, t.get_epochs() - done))
+
+def run_bracket(pool, configs, budgets, eta, outdir):
+    """
+    Runs a bracket of successive halving.
+
+    configs     list of jobs, see sweep.build_jobs
+    budgets     list of epochs of each rung
+    return      tuple (results of the last rung, best first; number of
+                epochs trained)
+    """
+    by_name = dict((c[0], c) for c in configs)
+    alive = [c[0] for c in configs]
+    trained = 0
+    for i, epochs in enumerate(budgets):
+        todo = []
+        for name in alive:
+            name, fName, settings = by_name[name][:3]
+            base = os.path.join(outdir, name)
+            todo.append((name, fName, settings, epochs, base + '.rl',
+                base + '.cp'))
+        results = [r for r in pool.imap_unordered(advance, todo)
+                if r[2] is not None]
+        trained += sum(r[4] for r in results)
+        results.sort(key=lambda r: (r[3] is None, -(r[3] or 0), r[0]))
+        print('  rung {0}: {1} combination(s), {2} epochs'.format(i,
+            len(todo), epochs))
+        if i + 1 < len(budgets):
+            alive = [r[0] for r in results[:max(1, len(results) // eta)]]
+    return (results, trained)
+
+def print_results(results, w):
+    """
+    Prints the results of the last rung of a bracket.
+    """
+    for name, s, epochs, final, ran in results:
+        print('  {0:<{w}} {1:>10} {2:>8} {3:>10}'.format(name, s, epochs,
+            '-' if final is None else '{0:.2f}'.format(final), w=w))
+
+def main(args):
+    """
+    Searches the grid of settings by successive halving or Hyperband.
+
+    args    command line arguments, after the `search` command
+    return  True if everything is ok, False otherwise
+    """
+    try:
+        opts, files = getopt.gnu_getopt(args, OPTIONS, LONG_OPTIONS)
+    except getopt.GetoptError:
+        return False
+    if not files:
+        return False
+
+    grids = sweep.parse_grid(opts)
+    if grids is None:
+        return False
+    grid, common = grids
+    first, last, outdir = 0, 0, '.'
+    jobs, eta, hyperband = multiprocessing.cpu_count(), ETA, False
+    # always have a seed, so that any run can be repeated
+    seed = random.SystemRandom().getrandbits(32)
+    try:
+        for o, v in opts:
+            if o in ['-n', '--epochs']:
+                first = int(v)
+            elif o in ['-N', '--max-epochs']:
+                last = int(v)
+            elif o in ['-o', '--output']:
+                outdir = v
+            elif o in ['-j', '--jobs']:
+                jobs = int(v)
+            elif o in ['-s', '--seed']:
+                seed = int(v)
+            elif o == '--eta':
+                eta = int(v)
+            elif o == '--hyperband':
+                hyperband = True
+    except ValueError:
+        return False
+    if not 0 < first <= last or jobs <= 0 or eta < 2:
+        return False
+    if common.get('warm?') and not has_numpy():
+        print('Warm start needs numpy')
+        return False
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+
+    configs = sweep.build_jobs(files, grid, common, last, 0, outdir, seed)
+    w = max([len('run')] + [len(c[0]) for c in configs])
+    pool = multiprocessing.Pool(jobs)
+    best, trained = [], 0
+    try:
+        print('base seed: {0}'.format(seed))
+        for i, (chosen, budgets) in enumerate(brackets(configs, first, last,
+                eta, hyperband, seed)):
+            print('bracket {0}:'.format(i))
+            results, t = run_bracket(pool, chosen, budgets, eta, outdir)
+            trained += t
+            print_results(results, w)
+            best += [r for r in results if r[3] is not None]
+        pool.close()
+    except BaseException:
+        # interrupted or a worker failed, don't wait for the other jobs
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    best.sort(key=lambda r: (r[3] is None, -(r[3] or 0), r[0]))
+    if best:
+        print('best: {0} (seed {1}, final {2:.2f})'.format(best[0][0],
+            best[0][1], best[0][3]))
+    total = len(configs) * last
+    print('epochs trained: {0}, {1:.1f}% of the full grid ({2})'.format(
+        trained, 100.0 * trained / total, total))
+    return True
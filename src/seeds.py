@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Running the same settings with as many seeds as needed: seeds are added,
+# in rounds run in parallel, until the confidence intervals of the chosen
+# metrics are narrow enough (or a maximum number of seeds is reached).
+#
+# The decision doesn't depend on the number of parallel jobs: the seeds are
+# always looked at in the same order and the result uses the fewest seeds
+# for which the intervals are narrow enough, even if a round did more.
+#
+
+from __future__ import print_function
+
+import getopt
+import math
+import multiprocessing
+import os
+import random
+
+from . import headless
+from . import rewardlog
+from . import rng
+from . import store
+from .compat import has_numpy, xrange
+
+OPTIONS = 'a:g:e:t:SL:r:dpWn:k:o:j:s:m:'
+LONG_OPTIONS = ['alpha=', 'gamma=', 'epsilon=', 'tau=', 'sarsa', 'lambda=',
+        'max-steps=', 'dense', 'precompute', 'warm-start', 'epochs=',
+        'steps=', 'output=', 'jobs=', 'seed=', 'metric=', 'threshold=',
+        'window=', 'confidence=', 'min-seeds=', 'max-seeds=', 'store=',
+        'replay=', 'minibatch=', 'replay-every=', 'plan=', 'plan-steps=',
+        'plan-threshold=', 'converge=', 'policy-tol=', 'delta-tol=']
+
+# Names of the metrics.
+FINAL = 'final'
+REACH = 'reach'
+METRICS = [FINAL, REACH]
+
+# How many of the last epochs are averaged to get the final reward of a run,
+# also the default width of the moving average compared with the threshold.
+LAST = 10
+
+# Default confidence level of the intervals.
+CONFIDENCE = .95
+
+# Default limits of the number of seeds.
+MIN_SEEDS = 5
+MAX_SEEDS = 100
+
+# Intervals used to integrate the density of Student's t distribution.
+INTERVALS = 1000
+
+def final_reward(rewards):
+    """
+    Returns the mean reward of the last epochs of a run (None if the run has
+    no epochs).
+    """
+    if not rewards:
+        return None
+    last = rewards[-LAST:]
+    return sum(last) / float(len(last))
+
+def reach_epoch(rewards, threshold, window=LAST):
+    """
+    Returns the first epoch (counted from 1) at which the mean reward of the
+    last window epochs is at least threshold, None if it never is.
+    """
+    total = 0
+    for i, r in enumerate(rewards):
+        total += r
+        if i >= window:
+            total -= rewards[i - window]
+        if i + 1 >= window and total >= threshold * window:
+            return i + 1
+    return None
+
+def t_cdf(x, df):
+    """
+    Returns the cumulative distribution function of Student's t
+    distribution with df degrees of freedom, for x >= 0.
+    """
+    c = math.exp(math.lgamma((df + 1) / 2.0) - math.lgamma(df / 2.0)) / \
+            math.sqrt(df * math.pi)
+    f = lambda u: c * (1 + u * u / df) ** (-(df + 1) / 2.0)
+    # Simpson's rule from 0 to x
+    h = x / INTERVALS
+    s = f(0) + f(x)
+    for i in xrange(1, INTERVALS):
+        s += (4 if i % 2 else 2) * f(i * h)
+    return .5 + s * h / 3
+
+def t_quantile(p, df):
+    """
+    Returns the p quantile of Student's t distribution with df degrees of
+    freedom, for p >= .5.
+    """
+    lo, hi = 0.0, 1.0
+    while t_cdf(hi, df) < p:
+        lo, hi = hi, 2 * hi
+    for i in xrange(50):
+        mid = (lo + hi) / 2
+        if t_cdf(mid, df) < p:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+class Interval(object):
+    """
+    Computes confidence intervals of means, from Student's t distribution.
+    """
+
+    def __init__(self, confidence=CONFIDENCE):
+        """
+        Builds the calculator.
+
+        confidence  confidence level of the intervals
+        """
+        self._p = (1 + confidence) / 2
+        # degrees of freedom -> quantile
+        self._t = {}
+
+    def half_width(self, values):
+        """
+        Returns (mean, half width of the interval) of a list of values. The
+        half width is infinite for less than two values.
+        """
+        n = len(values)
+        mean = sum(values) / float(n)
+        if n < 2:
+            return (mean, float('inf'))
+        df = n - 1
+        if df not in self._t:
+            self._t[df] = t_quantile(self._p, df)
+        std = math.sqrt(sum((v - mean) ** 2 for v in values) / df)
+        return (mean, self._t[df] * std / math.sqrt(n))
+
+def metric_values(results, metric):
+    """
+    Returns the values of a metric for a list of results (see run_seed).
+    A run which never reaches the threshold counts with the number of epochs
+    it did (the epoch it would reach it is larger).
+    """
+    if metric == FINAL:
+        return [r[2] for r in results if r[2] is not None]
+    return [r[3] if r[3] is not None else r[1] for r in results]
+
+def narrow(results, targets, interval):
+    """
+    Returns True if the intervals of all the metrics are narrow enough.
+
+    targets     dictionary metric -> largest half width allowed
+    """
+    for m, width in targets.items():
+        values = metric_values(results, m)
+        if not values or interval.half_width(values)[1] > width:
+            return False
+    return True
+
+def run_seed(job):
+    """
+    Runs the settings with one seed, in a worker process.
+
+    job     tuple (index, config, epochs, steps, output, store_dir,
+            threshold, window)
+    return  tuple (index, epochs, final reward, reach epoch, cached)
+    """
+    index, config, epochs, steps, output, store_dir, threshold, window = job
+    s, key = None, None
+    if store_dir:
+        s = store.Store(store_dir)
+        key = store.run_key(config, epochs, steps)
+    fName = s.get(key) if key else None
+    cached = fName is not None
+    if cached:
+        rewards = store.read_rewards(fName)
+        if output:
+            s.fetch(key, output)
+    else:
+        logfile = output or (s.tmp_name() if key else None)
+        log = None
+        if logfile:
+            log = rewardlog.RewardLogWriter(logfile, config, steps=True)
+        rewards = headless.Trainer(config, log).run(epochs, steps)
+        if log:
+            log.close()
+        if key:
+            s.put(key, config, logfile)
+            if not output:
+                os.remove(logfile)
+    reach = None
+    if threshold is not None:
+        reach = reach_epoch(rewards, threshold, window)
+    return (index, len(rewards), final_reward(rewards), reach, cached)
+
+def print_report(results, targets, interval, seed, tight):
+    """
+    Prints the interval of each metric.
+    """
+    print('base seed: {0}'.format(seed))
+    print('seeds: {0} ({1})'.format(len(results), 'intervals narrow enough'
+        if tight else 'maximum reached, intervals too wide'))
+    cached = len([r for r in results if r[4]])
+    if cached:
+        print('{0} of {1} runs from the store'.format(cached, len(results)))
+    for m in METRICS:
+        if m not in targets:
+            continue
+        values = metric_values(results, m)
+        if not values:
+            print('{0}: no values'.format(m))
+            continue
+        mean, width = interval.half_width(values)
+        line = '{0}: {1:.2f} ± {2:.2f} (target ± {3:g}, {4} runs)'.format(m,
+                mean, width, targets[m], len(values))
+        if m == REACH:
+            line += ', {0} never reached it'.format(
+                    len([r for r in results if r[3] is None]))
+        print(line)
+
+def parse_metric(v):
+    """
+    Parses a NAME:HALF_WIDTH metric target.
+    """
+    name, _, width = v.partition(':')
+    if name not in METRICS:
+        raise ValueError(v)
+    width = float(width)
+    if width <= 0:
+        raise ValueError(v)
+    return (name, width)
+
+def main(args):
+    """
+    Runs the settings with more and more seeds, until the confidence
+    intervals of the metrics are narrow enough.
+
+    args    command line arguments, after the `seeds` command
+    return  True if everything is ok, False otherwise
+    """
+    try:
+        opts, files = getopt.gnu_getopt(args, OPTIONS, LONG_OPTIONS)
+    except getopt.GetoptError:
+        return False
+    if len(files) != 1:
+        return False
+
+    epochs, steps, outdir = 0, 0, None
+    jobs = multiprocessing.cpu_count()
+    targets, threshold, window = {}, None, LAST
+    confidence, min_seeds, max_seeds = CONFIDENCE, MIN_SEEDS, MAX_SEEDS
+    store_dir = None
+    try:
+        for o, v in opts:
+            if o in ['-n', '--epochs']:
+                epochs = int(v)
+            elif o in ['-k', '--steps']:
+                steps = int(v)
+            elif o in ['-o', '--output']:
+                outdir = v
+            elif o in ['-j', '--jobs']:
+                jobs = int(v)
+            elif o in ['-m', '--metric']:
+                name, width = parse_metric(v)
+                targets[name] = width
+            elif o == '--threshold':
+                threshold = float(v)
+            elif o == '--window':
+                window = int(v)
+            elif o == '--confidence':
+                confidence = float(v)
+            elif o == '--min-seeds':
+                min_seeds = int(v)
+            elif o == '--max-seeds':
+                max_seeds = int(v)
+            elif o == '--store':
+                store_dir = v
+    except ValueError:
+        return False
+    if epochs < 0 or steps < 0 or not (epochs or steps) or jobs <= 0:
+        return False
+    if not targets or (REACH in targets) != (threshold is not None):
+        return False
+    if window <= 0 or not 0 < confidence < 1:
+        return False
+    if not 2 <= min_seeds <= max_seeds:
+        return False
+
+    settings = headless.parse_settings(opts)
+    if settings is None:
+        return False
+    # always have a seed, so that any run can be repeated
+    seed = settings.pop('seed', None)
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(32)
+    config = headless.build_config(files[0], settings)
+    if not config:
+        return False
+    if config.get('warm?') and not has_numpy():
+        print('Warm start needs numpy')
+        return False
+    if outdir and not os.path.isdir(outdir):
+        os.makedirs(outdir)
+    if store_dir:
+        # made here, not by all the workers at once
+        store.Store(store_dir)
+
+    interval = Interval(confidence)
+    pool = multiprocessing.Pool(jobs)
+    results, used, tight = [], max_seeds, False
+    try:
+        while len(results) < max_seeds and not tight:
+            start = len(results)
+            count = max(jobs, min_seeds - start)
+            todo = []
+            for i in xrange(start, min(start + count, max_seeds)):
+                d = dict(config)
+                d['seed'] = rng.derive_seed(seed, i)
+                output = None
+                if outdir:
+                    output = os.path.join(outdir,
+                            'seed-{0}.rl'.format(d['seed']))
+                todo.append((i, d, epochs, steps, output, store_dir,
+                    threshold, window))
+            results += sorted(pool.imap_unordered(run_seed, todo))
+            # the fewest seeds for which the intervals are narrow enough
+            for n in xrange(max(start + 1, min_seeds), len(results) + 1):
+                if narrow(results[:n], targets, interval):
+                    used, tight = n, True
+                    break
+        pool.close()
+    except BaseException:
+        # interrupted or a worker failed, don't wait for the other jobs
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    print_report(results[:used], targets, interval, seed, tight)
+    return True
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Running a world in a background thread, independently of the GUI. The GUI
+# only samples the latest state of the simulation, at its own rate.
+#
+
+import collections
+import threading
+import time
+
+from . import checkpoint
+from .compat import xrange
+
+# Steps done in one go when the speed is not limited.
+CHUNK = 500
+
+# How long (in seconds) a chunk of steps should take when the speed is
+# limited.
+SLICE = 0.01
+
+class Simulation(threading.Thread):
+    """
+    Steps a world in a background thread, at a given speed.
+
+    Simple workflow:
+        __init__ -> start -> [play -> sample* -> pause -> step*]* -> stop
+
+    Nothing here touches the GUI. The thread publishes a snapshot of the
+    world (see World.get_snapshot) after each chunk of steps and queues the
+    rewards of the ended epochs, the GUI collects them with sample.
+
+    If a checkpoint file is set, the world is saved in it periodically, from
+    the thread, between two steps.
+    """
+
+    def __init__(self, world, epochs=0, steps=0):
+        """
+        Builds the simulation thread, initially paused.
+
+        world   the world to simulate
+        epochs  epochs already done (when continuing from a checkpoint)
+        steps   steps already done (when continuing from a checkpoint)
+        """
+        super(Simulation, self).__init__()
+        self.daemon = True
+        self._world = world
+        # held while stepping the world
+        self._lock = threading.Lock()
+        # set while playing
+        self._playing = threading.Event()
+        self._quit = False
+        # steps per second, None if not limited
+        self._speed = None
+        self._epochs = collections.deque()
+        self._snapshot = world.get_snapshot()
+        # counters saved in checkpoints
+        self._ended = epochs
+        self._steps = steps
+        self._checkpoint = None
+        self._every = 0
+
+    def run(self):
+        """
+        The body of the thread.
+        """
+        while True:
+            self._playing.wait()
+            if self._quit:
+                return
+            speed = self._speed
+            if speed:
+                n = max(1, int(speed * SLICE))
+            else:
+                n = CHUNK
+            start = time.time()
+            with self._lock:
+                if self._playing.is_set():
+                    self._do_steps(n)
+            if speed:
+                delay = n / float(speed) - (time.time() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                # let the GUI run
+                time.sleep(0)
+
+    def _do_steps(self, n):
+        """
+        Does n steps, with the lock held.
+        """
+        step = self._world.step
+        epochs = self._epochs
+        for i in xrange(n):
+            end, r = step()
+            if end:
+                epochs.append(r)
+                self._ended += 1
+                if self._every and self._ended % self._every == 0:
+                    self._save(self._steps + i + 1)
+        self._steps += n
+        self._snapshot = self._world.get_snapshot()
+
+    def _save(self, steps):
+        """
+        Saves a checkpoint, with the lock held.
+        """
+        checkpoint.save(self._checkpoint, self._world,
+                {'epochs' : self._ended, 'steps' : steps})
+
+    def set_speed(self, speed):
+        """
+        Sets the speed of the simulation, in steps per second (None or 0 for
+        as fast as possible).
+        """
+        self._speed = speed
+
+    def set_checkpoint(self, fName, every=checkpoint.EVERY):
+        """
+        Sets the file in which checkpoints are saved, every `every` epochs.
+        """
+        with self._lock:
+            self._checkpoint = fName
+            self._every = every
+
+    def has_checkpoint(self):
+        """
+        Returns True if a checkpoint file is set.
+        """
+        return self._checkpoint is not None
+
+    def save_checkpoint(self):
+        """
+        Saves a checkpoint now, in the file set by set_checkpoint.
+        """
+        with self._lock:
+            self._save(self._steps)
+
+    def play(self):
+        """
+        Starts stepping the world.
+        """
+        self._playing.set()
+
+    def pause(self):
+        """
+        Stops stepping the world. Returns after the current chunk of steps is
+        done.
+        """
+        self._playing.clear()
+        with self._lock:
+            pass
+
+    def step(self):
+        """
+        Does a single step. To be called only when paused.
+        """
+        with self._lock:
+            self._do_steps(1)
+
+    def stop(self):
+        """
+        Stops the thread. The simulation cannot be restarted.
+        """
+        self._quit = True
+        self._playing.set()
+
+    def sample(self):
+        """
+        Returns the rewards of the epochs ended since the last call and the
+        latest snapshot of the world.
+        """
+        epochs = []
+        while self._epochs:
+            epochs.append(self._epochs.popleft())
+        return (epochs, self._snapshot)
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Exact solution of a world, by dynamic programming over the positions and
+# orientations of the robot (the dynamics and the rewards are known and
+# deterministic). The optimal utilities are then projected onto the states
+# seen by the robot, to measure how far a run is from the optimum or to start
+# learning from them.
+#
+# Internally, actions are column indices (see ACTIONS), states are codes (see
+# encode_state).
+#
+
+from __future__ import print_function
+
+import getopt
+
+import numpy
+
+from . import headless
+from . import rewardlog
+from . import world
+from .globaldefs import *
+from .compat import xrange
+
+OPTIONS = 'g:r:'
+LONG_OPTIONS = ['gamma=', 'max-steps=']
+
+# Value iteration stops when no value changes by more than this.
+TOL = 1e-9
+
+# Or after this many iterations.
+MAX_ITER = 100000
+
+# How many of the last epochs are averaged to get the final regret of a run.
+FINAL = 10
+
+def build_model(w):
+    """
+    Builds the model of a world, as arrays.
+
+    w       the World
+    return  tuple (states, rewards, next, start): the state code and the
+            reward at each position, the positions reached after each action
+            (array of shape (positions, len(ACTIONS))) and the start position
+    """
+    states, rewards, nxt, start = w.get_model()
+    D = w.get_config()['D']
+    codes = numpy.array([encode_state(s, D) if isinstance(s, tuple) else s
+        for s in states])
+    nxt = numpy.array(nxt).reshape(-1, len(ACTIONS))
+    return (codes, numpy.array(rewards, dtype=float), nxt, start)
+
+def reachable(nxt, start):
+    """
+    Returns the mask of the positions which can be reached from the start
+    position (positions inside obstacles, for example, can't).
+    """
+    mask = numpy.zeros(len(nxt), dtype=bool)
+    mask[start] = True
+    frontier = numpy.array([start])
+    while len(frontier):
+        n = numpy.unique(nxt[frontier])
+        frontier = n[~mask[n]]
+        mask[frontier] = True
+    return mask
+
+def value_iteration(rewards, nxt, gamma, tol=TOL, max_iter=MAX_ITER):
+    """
+    Computes the optimal utilities of all (position, action) pairs for the
+    discounted reward, as learned by the robot.
+
+    gamma   discount factor, less than 1
+    return  tuple (array of shape (positions, len(ACTIONS)), iterations)
+
+    Raises ValueError if gamma is not less than 1 (the utilities would not
+    converge).
+    """
+    if not 0 <= gamma < 1:
+        raise ValueError('value iteration needs 0 <= γ < 1')
+    gain = rewards[nxt]
+    V = numpy.zeros(len(nxt))
+    for i in xrange(max_iter):
+        Q = gain + gamma * V[nxt]
+        nV = Q.max(1)
+        delta = numpy.abs(nV - V).max()
+        V = nV
+        if delta <= tol:
+            break
+    return (Q, i + 1)
+
+def epoch_values(rewards, nxt, steps):
+    """
+    Computes the largest total reward which can be obtained in a number of
+    steps, from each position.
+    """
+    gain = rewards[nxt]
+    V = numpy.zeros(len(nxt))
+    for i in xrange(steps):
+        V = (gain + V[nxt]).max(1)
+    return V
+
+def greedy(Q):
+    """
+    Returns the greedy action (column) of each row, ties broken as the robot
+    does (the last of the maximal actions).
+    """
+    k = Q.shape[1]
+    return k - 1 - Q[:, ::-1].argmax(1)
+
+def project(Q, codes, mask, count):
+    """
+    Projects the utilities of the positions onto the states: the utilities
+    of a state are the means of those of the positions where the robot sees
+    that state.
+
+    mask    the positions to use
+    count   number of possible states
+    return  tuple (array of shape (count, len(ACTIONS)), number of positions
+            of each state)
+    """
+    c = codes[mask]
+    n = numpy.bincount(c, minlength=count)
+    Qs = numpy.zeros((count, Q.shape[1]))
+    for j in xrange(Q.shape[1]):
+        Qs[:, j] = numpy.bincount(c, Q[mask, j], count)
+    seen = n > 0
+    Qs[seen] /= n[seen, None]
+    return (Qs, n)
+
+def aliased(Q, codes, mask, Qs):
+    """
+    Returns the number of states in which the best action isn't the same for
+    all of their positions (the robot can't act optimally there).
+    """
+    wrong = greedy(Q)[mask] != greedy(Qs)[codes[mask]]
+    return len(numpy.unique(codes[mask][wrong]))
+
+def policy_reward(Qs, codes, rewards, nxt, start, steps):
+    """
+    Returns the total reward obtained in a number of steps from the start
+    position when always taking the greedy action of the projected utilities.
+    """
+    policy = greedy(Qs)
+    p, total = start, 0
+    for i in xrange(steps):
+        p = nxt[p, policy[codes[p]]]
+        total += rewards[p]
+    return total
+
+class Solution(object):
+    """
+    The solution of a world: the optimal utilities of the positions, their
+    projection onto the states and the best rewards of an epoch.
+    """
+
+    def __init__(self, w):
+        """
+        Solves a world, with the discount factor and the steps of an epoch
+        from its configuration.
+
+        w       the World
+        """
+        config = w.get_config()
+        self._D = config['D']
+        self._runs = config['runs']
+        self._codes, self._rewards, self._nxt, self._start = build_model(w)
+        self._mask = reachable(self._nxt, self._start)
+        self._Q, self._iterations = value_iteration(self._rewards, self._nxt,
+                config['γ'])
+        self._Qs, self._count = project(self._Q, self._codes, self._mask,
+                state_count(self._D))
+        # the first epoch is one step shorter
+        V = epoch_values(self._rewards, self._nxt, self._runs - 1)
+        self._first = V[self._start]
+        gain = self._rewards[self._nxt]
+        self._best = (gain + V[self._nxt]).max(1)[self._start]
+
+    def get_state_utilities(self):
+        """
+        Returns the projected utilities and the number of positions of each
+        state (0 for the states never seen).
+        """
+        return (self._Qs, self._count)
+
+    def best_epoch_reward(self, first=False):
+        """
+        Returns the largest reward of an epoch (of the first one, which is a
+        step shorter, if first is True). Knowing only the sensor values, the
+        robot may not get it.
+        """
+        return self._first if first else self._best
+
+    def regret(self, rewards):
+        """
+        Returns the regret of each epoch of a run: how much less than the
+        best reward it got.
+        """
+        r = numpy.asarray(rewards, dtype=float)
+        regret = self._best - r
+        if len(r):
+            regret[0] = self._first - r[0]
+        return regret
+
+    def report(self):
+        """
+        Returns the report of the solution, as a list of lines.
+        """
+        Q, codes, mask = self._Q, self._codes, self._mask
+        Qs = self._Qs
+        return ['positions: {0} ({1} reachable)'.format(len(mask),
+                    mask.sum()),
+                'states: {0} ({1} aliased)'.format((self._count > 0).sum(),
+                    aliased(Q, codes, mask, Qs)),
+                'value iteration: {0} iterations'.format(self._iterations),
+                'optimal utility at start: {0:.4f}'.format(
+                    Q[self._start].max()),
+                'best epoch reward: {0:g} (first epoch: {1:g})'.format(
+                    self._best, self._first),
+                'greedy projected policy epoch reward: {0:g}'.format(
+                    policy_reward(Qs, codes, self._rewards, self._nxt,
+                        self._start, self._runs))]
+
+def warm_start(w):
+    """
+    Solves a world and sets the utilities of the robot's table to the
+    projected ones, for all the states which can be seen.
+    """
+    Qs, count = Solution(w).get_state_utilities()
+    table = w.get_robot().get_table()
+    dense = hasattr(table, 'get_buffers')
+    D = w.get_config()['D']
+    for code in numpy.flatnonzero(count).tolist():
+        state = code if dense else decode_state(code, D)
+        table.set_row(state, Qs[code].tolist())
+
+def main(args):
+    """
+    Solves a world and prints the report. If reward logs are given too,
+    prints the regret of each run: the mean over all the epochs and over the
+    last ones.
+
+    args    command line arguments, after the `solve` command
+    return  True if everything is ok, False otherwise
+    """
+    try:
+        opts, files = getopt.gnu_getopt(args, OPTIONS, LONG_OPTIONS)
+    except getopt.GetoptError:
+        return False
+    if not files:
+        return False
+
+    settings = {}
+    try:
+        for o, v in opts:
+            if o in ['-g', '--gamma']:
+                settings['γ'] = float(v)
+            elif o in ['-r', '--max-steps']:
+                settings['runs'] = int(v)
+    except ValueError:
+        return False
+    if not 0 <= settings.get('γ', 0) < 1 or settings.get('runs', 1) <= 0:
+        return False
+    config = headless.build_config(files[0], settings)
+    if not config:
+        return False
+
+    s = Solution(world.World(config))
+    for line in s.report():
+        print(line)
+    for fName in files[1:]:
+        try:
+            log = rewardlog.RewardLog(fName)
+        except Exception:
+            return False
+        r = s.regret(log.rewards())
+        log.close()
+        if len(r):
+            print('{0}: {1} epochs, mean regret {2:.2f}, last {3}: {4:.2f}'
+                    .format(fName, len(r), r.mean(), FINAL, r[-FINAL:].mean()))
+        else:
+            print('{0}: no epochs'.format(fName))
+    return True
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# A store of the results of runs, so that a run which was already done (same
+# world, same settings, same seed and same limits) is not done again.
+#
+# The store is a directory holding an SQLite index and the reward logs of the
+# runs. Each run is identified by its key: a hash of its normalized
+# configuration, which contains the world (including the contents of its
+# map, not the name of the file) but not the settings which only change the
+# speed of the simulation.
+#
+
+from __future__ import print_function
+
+import getopt
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+
+from . import convergence
+from . import planning
+from . import replay
+from . import rewardlog
+from . import worldfile
+from .compat import str_keys
+
+OPTIONS = 'la:z:'
+LONG_OPTIONS = ['list', 'max-age=', 'max-size=']
+
+# Version of the keys, to be changed when the results of a configuration
+# change (so that older results are not used anymore).
+VERSION = 1
+
+# Files and directories of a store.
+INDEX = 'index.sqlite'
+BLOBS = 'blobs'
+TMP = 'tmp'
+
+# Seconds to wait for another process writing to the index.
+TIMEOUT = 60.0
+
+# Settings which don't change the results of a run.
+IGNORED = ['dense?', 'tables?', 'map']
+
+# Settings which are real numbers, even if given as integers.
+FLOATS = ['α', 'γ', 'ε/τ', 'λ', 'plan threshold', 'policy tol', 'delta tol']
+
+# Optional features and the settings which matter only when they are used,
+# with their default values.
+FEATURES = {
+        'λ' : {},
+        'warm?' : {},
+        'replay' : {'minibatch' : replay.MINIBATCH,
+            'replay every' : replay.EVERY},
+        'planning' : {'plan steps' : planning.BUDGET,
+            'plan threshold' : planning.THRESHOLD},
+        'converge' : {'policy tol' : convergence.POLICY_TOL,
+            'delta tol' : convergence.DELTA_TOL},
+        }
+
+def map_hash(config):
+    """
+    Returns the hash of the map of a world (None if it has no map).
+    """
+    walls = worldfile.get_map(config)
+    if walls is None:
+        return None
+    return hashlib.sha1(bytes(walls)).hexdigest()
+
+def normalize(config, epochs, steps):
+    """
+    Returns the normalized configuration of a run: without the settings
+    which don't change its results, with the default values of the settings
+    of the features used and with the limits of the run.
+    """
+    d = dict(config)
+    for k in IGNORED:
+        d.pop(k, None)
+    for k, settings in FEATURES.items():
+        if d.get(k):
+            for s, v in settings.items():
+                if d.get(s) is None:
+                    d[s] = v
+        else:
+            d.pop(k, None)
+            for s in settings:
+                d.pop(s, None)
+    for k in FLOATS:
+        if d.get(k) is not None:
+            d[k] = float(d[k])
+    if config.get('map'):
+        d['map hash'] = map_hash(config)
+    d['epochs'] = epochs
+    d['steps'] = steps
+    d['version'] = VERSION
+    return d
+
+def run_key(config, epochs, steps):
+    """
+    Returns the key of a run, None if the run can't be stored (without a
+    seed, it can't be repeated).
+    """
+    if config.get('seed') is None:
+        return None
+    d = normalize(config, epochs, steps)
+    return hashlib.sha1(json.dumps(d, sort_keys=True).encode('ascii'))\
+            .hexdigest()
+
+class Store(object):
+    """
+    The store of results. Several processes can use the same store at once:
+    the index is only changed in transactions and a reward log is complete
+    by the time it is in the index.
+
+    Simple workflow:
+        __init__ -> [get | fetch | put | evict]*
+    """
+
+    def __init__(self, path):
+        """
+        Opens a store, creating it if needed.
+
+        path    the directory of the store
+        """
+        self._path = path
+        for d in [BLOBS, TMP]:
+            d = os.path.join(path, d)
+            if not os.path.isdir(d):
+                try:
+                    os.makedirs(d)
+                except OSError:
+                    # made by another process meanwhile
+                    if not os.path.isdir(d):
+                        raise
+        db = self._connect()
+        try:
+            with db:
+                db.execute('create table if not exists runs (key text '
+                        'primary key, config text, size integer, created '
+                        'real, used real)')
+        finally:
+            db.close()
+
+    def _connect(self):
+        """
+        Returns a connection to the index.
+        """
+        return sqlite3.connect(os.path.join(self._path, INDEX),
+                timeout=TIMEOUT)
+
+    def _blob(self, key):
+        """
+        Returns the name of the reward log of a run.
+        """
+        return os.path.join(self._path, BLOBS, key[:2], key + '.rl')
+
+    def tmp_name(self):
+        """
+        Returns the name of a new temporary file, in the store (to write a
+        log which will be put in the store).
+        """
+        return os.path.join(self._path, TMP, '{0}-{1}.rl'.format(os.getpid(),
+            hashlib.sha1(os.urandom(16)).hexdigest()[:8]))
+
+    def get(self, key):
+        """
+        Returns the name of the reward log of a run, None if the run is not
+        in the store.
+        """
+        db = self._connect()
+        try:
+            with db:
+                if not db.execute('select 1 from runs where key = ?',
+                        (key,)).fetchone():
+                    return None
+                fName = self._blob(key)
+                if not os.path.exists(fName):
+                    # removed by hand, forget about it
+                    db.execute('delete from runs where key = ?', (key,))
+                    return None
+                db.execute('update runs set used = ? where key = ?',
+                        (time.time(), key))
+                return fName
+        finally:
+            db.close()
+
+    def fetch(self, key, dst):
+        """
+        Copies the reward log of a run to dst.
+
+        return  True if the run was in the store, False otherwise
+        """
+        fName = self.get(key)
+        if fName is None:
+            return False
+        shutil.copyfile(fName, dst)
+        return True
+
+    def put(self, key, config, src):
+        """
+        Adds (or replaces) the reward log of a run.
+
+        key     the key of the run
+        config  the configuration of the run, kept for listing
+        src     the reward log, copied into the store
+        """
+        fName = self._blob(key)
+        d = os.path.dirname(fName)
+        if not os.path.isdir(d):
+            try:
+                os.makedirs(d)
+            except OSError:
+                if not os.path.isdir(d):
+                    raise
+        tmp = self.tmp_name()
+        shutil.copyfile(src, tmp)
+        os.rename(tmp, fName)
+        now = time.time()
+        db = self._connect()
+        try:
+            with db:
+                db.execute('insert or replace into runs values '
+                        '(?, ?, ?, ?, ?)', (key, json.dumps(config,
+                            sort_keys=True), os.path.getsize(fName), now, now))
+        finally:
+            db.close()
+
+    def entries(self):
+        """
+        Returns the list of (key, config, size, created, used) of the runs in
+        the store, most recently used first.
+        """
+        db = self._connect()
+        try:
+            rows = db.execute('select key, config, size, created, used from '
+                    'runs order by used desc').fetchall()
+        finally:
+            db.close()
+        return [(k, str_keys(json.loads(c)), s, t0, t1)
+                for k, c, s, t0, t1 in rows]
+
+    def evict(self, max_age=None, max_size=None):
+        """
+        Removes the runs not used for more than max_age seconds and then, the
+        least recently used first, runs until the logs take at most max_size
+        bytes.
+
+        return  the number of runs removed
+        """
+        removed = []
+        total = 0
+        now = time.time()
+        for key, config, size, created, used in self.entries():
+            if ((max_age is not None and now - used > max_age) or
+                    (max_size is not None and total + size > max_size)):
+                removed.append(key)
+            else:
+                total += size
+        db = self._connect()
+        try:
+            with db:
+                for key in removed:
+                    db.execute('delete from runs where key = ?', (key,))
+        finally:
+            db.close()
+        for key in removed:
+            try:
+                os.remove(self._blob(key))
+            except OSError:
+                pass
+        return len(removed)
+
+def describe(config):
+    """
+    Returns a short description of the configuration of a run.
+    """
+    return '{0}x{1}{2} {3} {4}{5} α={6} γ={7} seed={8}'.format(
+            config.get('N'), config.get('M'),
+            ' map' if config.get('map') else '',
+            'q' if config.get('Q?') else 'sarsa',
+            'eps' if config.get('greedy?') else 'tau', config.get('ε/τ'),
+            config.get('α'), config.get('γ'), config.get('seed'))
+
+def read_rewards(fName):
+    """
+    Returns the rewards of a reward log, as a run returns them (the logs
+    keep them as reals, even if they are integers).
+    """
+    log = rewardlog.RewardLog(fName)
+    rewards = [int(r) if r == int(r) else r for r in log.rewards()]
+    log.close()
+    return rewards
+
+def print_rewards(fName):
+    """
+    Prints the rewards of a reward log, one per line (as a run does).
+    """
+    for r in read_rewards(fName):
+        print(r)
+
+def main(args):
+    """
+    Lists the runs of a store and/or evicts old runs.
+
+    args    command line arguments, after the `store` command
+    return  True if everything is ok, False otherwise
+    """
+    try:
+        opts, files = getopt.gnu_getopt(args, OPTIONS, LONG_OPTIONS)
+    except getopt.GetoptError:
+        return False
+    if len(files) != 1 or not os.path.isdir(files[0]):
+        return False
+
+    listing, max_age, max_size = False, None, None
+    try:
+        for o, v in opts:
+            if o in ['-l', '--list']:
+                listing = True
+            elif o in ['-a', '--max-age']:
+                max_age = float(v) * 24 * 3600
+            elif o in ['-z', '--max-size']:
+                max_size = float(v) * 1024 * 1024
+    except ValueError:
+        return False
+
+    s = Store(files[0])
+    if max_age is not None or max_size is not None:
+        print('removed {0} run(s)'.format(s.evict(max_age, max_size)))
+    entries = s.entries()
+    if listing:
+        now = time.time()
+        for key, config, size, created, used in entries:
+            print('{0} {1:>9} {2:>6.1f}d {3}'.format(key[:12], size,
+                (now - used) / 86400, describe(config)))
+    print('{0} run(s), {1} bytes'.format(len(entries),
+        sum(e[2] for e in entries)))
+    return True
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Running a grid of simulations (all combinations of several settings) on all
+# available processors.
+#
+
+from __future__ import print_function
+
+import getopt
+import multiprocessing
+import os
+import random
+
+from . import headless
+from . import rewardlog
+from . import rng
+from . import store
+from .compat import has_numpy
+
+OPTIONS = 'a:g:e:t:l:L:r:dpWn:k:o:j:c:s:'
+LONG_OPTIONS = ['alpha=', 'gamma=', 'epsilon=', 'tau=', 'learning=', 'lambda=',
+        'max-steps=', 'dense', 'precompute', 'warm-start', 'epochs=',
+        'steps=', 'output=', 'jobs=', 'chunk=', 'seed=', 'converge=',
+        'policy-tol=', 'delta-tol=', 'store=']
+
+# How many of the last epochs are averaged to get the final reward of a run.
+FINAL = 10
+
+def build_jobs(files, grid, common, epochs, steps, outdir, seed,
+        store_dir=None):
+    """
+    Builds the list of jobs, one for each combination of settings.
+
+    files   list of world files
+    grid    dictionary with the lists of values for α, γ, λ, Q? and the list
+            of (greedy?, ε/τ) pairs for the action selection
+    common  settings common to all jobs
+    epochs  epochs to run for each job
+    steps   steps to run for each job
+    outdir  directory where each job saves its rewards
+    seed    base seed, the seed of each job is derived from it
+    store_dir   directory of the store of results (None to not use one)
+    return  list of (name, file, settings, epochs, steps, output, store_dir)
+            tuples
+    """
+    jobs = []
+    for fName in files:
+        world = os.path.splitext(os.path.basename(fName))[0]
+        for q in grid['Q?']:
+            for greedy, et in grid['selection']:
+                for alpha in grid['α']:
+                    for gamma in grid['γ']:
+                        for lam in grid['λ']:
+                            name = '{0}-{1}-{2}{3}-a{4}-g{5}'.format(world,
+                                    'q' if q else 'sarsa',
+                                    'eps' if greedy else 'tau', et, alpha,
+                                    gamma)
+                            if lam:
+                                name += '-l{0}'.format(lam)
+                            d = dict(common)
+                            d['Q?'] = q
+                            d['greedy?'] = greedy
+                            d['ε/τ'] = et
+                            d['α'] = alpha
+                            d['γ'] = gamma
+                            d['λ'] = lam
+                            d['seed'] = rng.derive_seed(seed, len(jobs))
+                            output = os.path.join(outdir, name + '.rl')
+                            jobs.append((name, fName, d, epochs, steps,
+                                output, store_dir))
+    return jobs
+
+def run_job(job):
+    """
+    Runs a single job, in a worker process. Saves the rewards and returns
+    the line for the summary table. If the run is in the store, its rewards
+    are copied from there instead.
+
+    job     tuple (name, file, settings, epochs, steps, output, store_dir)
+    return  tuple (name, seed, epochs, final reward, best reward, cached),
+            with epochs None if the world file is invalid
+    """
+    name, fName, settings, epochs, steps, output, store_dir = job
+    config = headless.build_config(fName, settings)
+    if not config:
+        return (name, settings['seed'], None, None, None, False)
+    s, key = None, None
+    if store_dir:
+        s = store.Store(store_dir)
+        key = store.run_key(config, epochs, steps)
+    cached = bool(key) and s.fetch(key, output)
+    if cached:
+        rewards = store.read_rewards(output)
+    else:
+        log = rewardlog.RewardLogWriter(output, config, steps=True)
+        rewards = headless.Trainer(config, log).run(epochs, steps)
+        log.close()
+        if key:
+            s.put(key, config, output)
+    if not rewards:
+        return (name, settings['seed'], 0, None, None, cached)
+    last = rewards[-FINAL:]
+    return (name, settings['seed'], len(rewards), sum(last) / float(len(last)),
+            max(rewards), cached)
+
+def print_summary(results, seed):
+    """
+    Prints the summary table, best final rewards first.
+    """
+    results = sorted(results, key=lambda r: (r[3] is None, -(r[3] or 0), r[0]))
+    w = max([len('run')] + [len(r[0]) for r in results])
+    print('base seed: {0}'.format(seed))
+    print('{0:<{w}} {1:>10} {2:>8} {3:>10} {4:>8}'.format('run', 'seed',
+            'epochs', 'final', 'best', w=w))
+    for name, s, epochs, final, best, cached in results:
+        if epochs is None:
+            print('{0:<{w}} {1:>10} invalid world file'.format(name, s, w=w))
+        elif final is None:
+            print('{0:<{w}} {1:>10} {2:>8} {3:>10} {4:>8}'.format(name, s,
+                    epochs, '-', '-', w=w))
+        else:
+            print('{0:<{w}} {1:>10} {2:>8} {3:>10.2f} {4:>8}'.format(name,
+                    s, epochs, final, best, w=w))
+    cached = len([r for r in results if r[5]])
+    if cached:
+        print('{0} of {1} runs from the store'.format(cached, len(results)))
+
+def parse_list(v, conv=float):
+    """
+    Parses a comma separated list of values.
+    """
+    return [conv(x) for x in v.split(',') if x]
+
+def parse_grid(opts):
+    """
+    Parses the options giving the grid of settings and the settings common
+    to all of its combinations.
+
+    opts    list of (option, value) pairs, as returned by getopt
+    return  tuple (grid, common) (see build_jobs) or None on invalid values
+    """
+    grid = {'α' : [headless.DEFAULTS['α']], 'γ' : [headless.DEFAULTS['γ']],
+            'λ' : [headless.DEFAULTS['λ']], 'Q?' : [True], 'selection' : []}
+    common = {}
+    try:
+        for o, v in opts:
+            if o in ['-a', '--alpha']:
+                grid['α'] = parse_list(v)
+            elif o in ['-g', '--gamma']:
+                grid['γ'] = parse_list(v)
+            elif o in ['-L', '--lambda']:
+                grid['λ'] = parse_list(v)
+                if [l for l in grid['λ'] if not 0 <= l <= 1]:
+                    return None
+            elif o in ['-e', '--epsilon']:
+                grid['selection'] += [(True, x) for x in parse_list(v)]
+            elif o in ['-t', '--tau']:
+                grid['selection'] += [(False, x) for x in parse_list(v)]
+            elif o in ['-l', '--learning']:
+                methods = parse_list(v, str.lower)
+                if set(methods) - set(['q', 'sarsa']):
+                    return None
+                grid['Q?'] = [m == 'q' for m in methods]
+            elif o in ['-r', '--max-steps']:
+                common['runs'] = int(v)
+                if common['runs'] <= 0:
+                    return None
+            elif o in ['-d', '--dense']:
+                common['dense?'] = True
+            elif o in ['-p', '--precompute']:
+                common['tables?'] = True
+            elif o in ['-W', '--warm-start']:
+                common['warm?'] = True
+            elif o == '--converge':
+                common['converge'] = int(v)
+            elif o == '--policy-tol':
+                common['policy tol'] = float(v)
+            elif o == '--delta-tol':
+                common['delta tol'] = float(v)
+    except ValueError:
+        return None
+    if common.get('converge', 1) <= 0 or common.get('policy tol', 0) < 0:
+        return None
+    if common.get('delta tol', 0) < 0:
+        return None
+    if common.get('warm?') and [g for g in grid['γ'] if not 0 <= g < 1]:
+        # the solution of the world needs γ < 1, see solver
+        return None
+    if not grid['selection']:
+        grid['selection'] = [(True, headless.DEFAULTS['ε/τ'])]
+    return (grid, common)
+
+def main(args):
+    """
+    Runs all combinations of the given settings, in parallel.
+
+    args    command line arguments, after the `sweep` command
+    return  True if everything is ok, False otherwise
+    """
+    try:
+        opts, files = getopt.gnu_getopt(args, OPTIONS, LONG_OPTIONS)
+    except getopt.GetoptError:
+        return False
+    if not files:
+        return False
+
+    grids = parse_grid(opts)
+    if grids is None:
+        return False
+    grid, common = grids
+    epochs, steps, outdir = 0, 0, '.'
+    jobs, chunk = multiprocessing.cpu_count(), 0
+    # always have a seed, so that any run can be repeated
+    seed = random.SystemRandom().getrandbits(32)
+    store_dir = None
+    try:
+        for o, v in opts:
+            if o in ['-n', '--epochs']:
+                epochs = int(v)
+            elif o in ['-k', '--steps']:
+                steps = int(v)
+            elif o in ['-o', '--output']:
+                outdir = v
+            elif o in ['-j', '--jobs']:
+                jobs = int(v)
+            elif o in ['-c', '--chunk']:
+                chunk = int(v)
+            elif o in ['-s', '--seed']:
+                seed = int(v)
+            elif o == '--store':
+                store_dir = v
+    except ValueError:
+        return False
+    if epochs < 0 or steps < 0 or not (epochs or steps) or jobs <= 0:
+        return False
+    if common.get('warm?') and not has_numpy():
+        print('Warm start needs numpy')
+        return False
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+
+    if store_dir:
+        # made here, not by all the workers at once
+        store.Store(store_dir)
+    todo = build_jobs(files, grid, common, epochs, steps, outdir, seed,
+            store_dir)
+    if chunk <= 0:
+        # a few chunks per worker, to balance the load
+        chunk = max(1, len(todo) // (4 * jobs))
+    pool = multiprocessing.Pool(jobs)
+    results = []
+    try:
+        for r in pool.imap_unordered(run_job, todo, chunk):
+            results.append(r)
+        pool.close()
+    except BaseException:
+        # interrupted or a worker failed, don't wait for the other jobs
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    print_summary(results, seed)
+    return True
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Timers and counters for the hot paths of a simulation.
+#
+# Nothing here is called unless telemetry is enabled: attaching replaces the
+# methods of interest of a world, of its robot (and of the GUI widgets) by
+# timed wrappers, on the instances only. A simulation without telemetry runs
+# exactly the same code as before.
+#
+
+import json
+import os
+import sys
+import timeit
+
+# Seconds between two reports, by default.
+INTERVAL = 1.0
+
+# Steps between two checks of the clock for the periodic report (minus one,
+# used as a mask).
+CHECK = 1023
+
+# Environment variable enabling telemetry for the GUI.
+ENV = 'QL_TELEMETRY'
+
+clock = timeit.default_timer
+
+class Telemetry(object):
+    """
+    Collects, for each instrumented phase, the number of calls and the time
+    spent in them, along with the number of steps and epochs and the size of
+    the Q-table. Reports are written periodically, while stepping, and when
+    closing.
+
+    Simple workflow:
+        __init__ -> attach_world [-> wrap*] -> [run the simulation] -> close
+
+    The times of the phases are inclusive: world.step contains the time of
+    robot.step which contains the time of robot._choose_action.
+    """
+
+    def __init__(self, out, interval=INTERVAL):
+        """
+        Builds the collector.
+
+        out         file where reports are written as JSON lines, or '-' to
+                    write human readable reports to stderr
+        interval    seconds between two reports
+        """
+        if out == '-':
+            self._f = sys.stderr
+            self._json = False
+        else:
+            self._f = open(out, 'w')
+            self._json = True
+        self._interval = interval
+        # phase -> [calls, seconds]
+        self._phases = {}
+        self._table = None
+        self._steps = 0
+        self._epochs = 0
+        self._start = self._last = clock()
+        self._last_steps = 0
+        self._last_states = 0
+
+    def wrap(self, obj, method, phase):
+        """
+        Replaces a method of an object (only for that instance) by a wrapper
+        which counts the calls and measures their time.
+
+        obj     the object
+        method  the name of the method
+        phase   the name of the phase in the reports
+        """
+        f = getattr(obj, method)
+        acc = self._phases.setdefault(phase, [0, 0.0])
+        def timed(*args):
+            t = clock()
+            r = f(*args)
+            acc[1] += clock() - t
+            acc[0] += 1
+            return r
+        setattr(obj, method, timed)
+
+    def attach_world(self, world):
+        """
+        Instruments a world and its robot. Should be called before stepping
+        the world. The steps, epochs and new states are counted from here.
+        """
+        robot = world.get_robot()
+        for m in ['_get_sensors', '_get_reward', '_move']:
+            self.wrap(world, m, 'world.' + m)
+        for m in ['step', '_choose_action', 'receive_reward_and_state',
+                '_replay_minibatch']:
+            self.wrap(robot, m, 'robot.' + m)
+        if robot.get_planner() is not None:
+            self.wrap(robot.get_planner(), 'plan', 'robot.plan')
+        self._table = robot.get_table()
+        self._last_states = len(self._table)
+
+        step = world.step
+        acc = self._phases.setdefault('world.step', [0, 0.0])
+        def counted():
+            t = clock()
+            end, r = step()
+            acc[1] += clock() - t
+            acc[0] += 1
+            self._steps += 1
+            if end:
+                self._epochs += 1
+            if not self._steps & CHECK and t - self._last >= self._interval:
+                self.report()
+            return (end, r)
+        world.step = counted
+
+    def report(self):
+        """
+        Writes a report with the values collected until now.
+        """
+        now = clock()
+        states = len(self._table) if self._table is not None else 0
+        dt = now - self._last
+        speed = (self._steps - self._last_steps) / dt if dt > 0 else 0.0
+        r = {
+                'time' : now - self._start,
+                'steps' : self._steps,
+                'epochs' : self._epochs,
+                'steps_per_sec' : speed,
+                'states' : states,
+                'new_states' : states - self._last_states,
+                'phases' : dict((p, {'calls' : c, 'seconds' : s})
+                    for p, (c, s) in self._phases.items()),
+                }
+        self._last = now
+        self._last_steps = self._steps
+        self._last_states = states
+        if self._json:
+            self._f.write(json.dumps(r, sort_keys=True) + '\n')
+        else:
+            self._f.write(format_report(r))
+        self._f.flush()
+
+    def close(self):
+        """
+        Writes the last report and closes the file.
+        """
+        self.report()
+        if self._f is not sys.stderr:
+            self._f.close()
+
+def format_report(r):
+    """
+    Returns a report (as written in the JSON lines) in a human readable form.
+    """
+    lines = ['{0:.1f}s: {1} steps ({2:.0f}/s), {3} epochs, '
+            '{4} states (+{5})'.format(r['time'], r['steps'],
+                r['steps_per_sec'], r['epochs'], r['states'], r['new_states'])]
+    for p in sorted(r['phases']):
+        c, s = r['phases'][p]['calls'], r['phases'][p]['seconds']
+        lines.append('  {0:<34} {1:>10} calls {2:>9.3f}s {3:>9.2f}µs/call'
+                .format(p, c, s, 1e6 * s / c if c else 0))
+    return '\n'.join(lines) + '\n'
+
+def from_env():
+    """
+    Returns a Telemetry writing to the file named by the ENV environment
+    variable, or None if it is not set.
+    """
+    out = os.environ.get(ENV)
+    if not out:
+        return None
+    return Telemetry(out)
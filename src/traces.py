@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Eligibility traces, for Q(λ) and SARSA(λ).
+#
+
+# Traces smaller than this are dropped.
+CUTOFF = 1e-3
+
+# Maximum number of traces kept.
+SIZE = 1000
+
+class Traces(object):
+    """
+    Sparse replacing traces: only the (state, action) pairs visited recently
+    are kept, in a dictionary. Each update decays all traces by γλ and drops
+    those below a cutoff, so there are at most log(cutoff) / log(γλ) of them
+    and an update costs time proportional to this number, not to the size of
+    the Q-table. The number of traces is also bounded by a fixed size (for
+    γλ close to 1), the smallest one being dropped first.
+    """
+
+    def __init__(self, decay, cutoff=CUTOFF, size=SIZE):
+        """
+        Builds an empty set of traces.
+
+        decay   γλ
+        cutoff  traces smaller than this are dropped
+        size    maximum number of traces
+        """
+        self._decay = decay
+        self._cutoff = cutoff
+        self._size = size
+        self._e = {}
+
+    def __len__(self):
+        """
+        Returns the number of traces kept.
+        """
+        return len(self._e)
+
+    def visit(self, state, a):
+        """
+        Sets the trace of taking action a from state to 1.
+        """
+        e = self._e
+        e[(state, a)] = 1.0
+        if len(e) > self._size:
+            # the smallest trace, ties broken by the pair itself
+            del e[min(e, key=lambda k: (e[k], k))]
+
+    def update(self, Q, delta):
+        """
+        Adds delta times its trace to each utility, then decays the traces.
+
+        Q       the Q-table
+        delta   the TD error times the learning rate
+        """
+        decay = self._decay
+        cutoff = self._cutoff
+        e = self._e
+        for k, v in list(e.items()):
+            Q.update(k[0], k[1], delta * v)
+            v *= decay
+            if v < cutoff:
+                del e[k]
+            else:
+                e[k] = v
+
+    def clear(self):
+        """
+        Drops all traces.
+        """
+        self._e.clear()
+
+    def get_items(self):
+        """
+        Returns the list of (state, action, trace) tuples.
+        """
+        return [(k[0], k[1], v) for k, v in self._e.items()]
+
+    def set_items(self, items):
+        """
+        Replaces the traces with the ones returned by get_items.
+        """
+        self._e = dict(((s, a), v) for s, a, v in items)
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+
+import gtk
+
+from .globaldefs import *
+
+class WorldView(gtk.DrawingArea):
+    """
+    Shows the part of the world containing the robot, as a grid of N x M
+    images drawn on an offscreen pixmap.
+
+    Only the cells which changed since the last frame are redrawn: the one
+    the robot left and the one it is in now. The entire grid is redrawn only
+    when the robot moves to another part of the world.
+    """
+
+    def __init__(self):
+        """
+        Builds the drawing area. Initially, everything is VOID.
+        """
+        super(WorldView, self).__init__()
+        self.set_size_request(N * CELL, M * CELL)
+        self.connect('configure_event', self.__on_configure)
+        self.connect('expose_event', self.__on_paint)
+        self._pixmap = None
+        # what should be drawn in each cell
+        self._cells = [[VOID] * M for i in xrange(N)]
+        # origin of the part of the world shown, None if nothing is shown
+        self._origin = None
+        # cell containing the robot, if any
+        self._robot = None
+
+    def show_world(self, world, snapshot=None):
+        """
+        Shows the world, with the robot at its current position or as in the
+        snapshot (see World.get_snapshot).
+        """
+        if not snapshot:
+            snapshot = world.get_snapshot()
+        x, y, o = snapshot[:3]
+        origin = world.get_origin(x, y)
+        if origin != self._origin:
+            self._origin = origin
+            world.fill(self._cells, snapshot)
+            self._robot = (x - origin[0], y - origin[1])
+            self._draw_all()
+            return
+
+        i, j = x - origin[0], y - origin[1]
+        if self._robot != (i, j):
+            oi, oj = self._robot
+            self._cells[oi][oj] = EMPTY
+            self._draw_cell(oi, oj)
+            self._robot = (i, j)
+        if self._cells[i][j] != o:
+            self._cells[i][j] = o
+            self._draw_cell(i, j)
+
+    def clear(self):
+        """
+        Shows nothing (all cells VOID).
+        """
+        self._cells = [[VOID] * M for i in xrange(N)]
+        self._origin = None
+        self._robot = None
+        self._draw_all()
+
+    def _draw_cell(self, i, j):
+        """
+        Draws the cell i, j on the pixmap and marks it for repainting.
+        """
+        if not self._pixmap:
+            return
+        gc = self.get_style().fg_gc[gtk.STATE_NORMAL]
+        self._pixmap.draw_pixbuf(gc, IMAGES[self._cells[i][j]], 0, 0,
+                i * CELL, j * CELL, CELL, CELL)
+        self.queue_draw_area(i * CELL, j * CELL, CELL, CELL)
+
+    def _draw_all(self):
+        """
+        Draws all cells on the pixmap and marks the entire area for repainting.
+        """
+        if not self._pixmap:
+            return
+        gc = self.get_style().fg_gc[gtk.STATE_NORMAL]
+        for i in xrange(N):
+            for j in xrange(M):
+                self._pixmap.draw_pixbuf(gc, IMAGES[self._cells[i][j]], 0, 0,
+                        i * CELL, j * CELL, CELL, CELL)
+        self.queue_draw_area(0, 0, N * CELL, M * CELL)
+
+    def __on_configure(self, widget, data=None):
+        """
+        Called when the drawing area gets its window. Builds the pixmap.
+        """
+        self._pixmap = gtk.gdk.Pixmap(widget.window, N * CELL, M * CELL)
+        self._draw_all()
+        return True
+
+    def __on_paint(self, widget, data=None):
+        """
+        Used to repaint a part of the drawing area, from the pixmap.
+        """
+        if not self._pixmap:
+            return False
+        x, y, w, h = data.area
+        widget.window.draw_drawable(widget.get_style().fg_gc[gtk.STATE_NORMAL],
+                self._pixmap, x, y, x, y, w, h)
+        return False
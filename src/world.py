@@ -3,8 +3,14 @@
 # (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
 #
 
-import robot
-from globaldefs import *
+from . import fields
+from . import planning
+from . import replay
+from . import robot
+from . import rng
+from . import worldfile
+from .globaldefs import *
+from .compat import xrange
 
 class World(object):
     """
@@ -26,8 +32,7 @@ class World(object):
 
         config  The user configuration dictionary.
         """
-        global NPOINTS, MPOINTS
-        NPOINTS, MPOINTS = build_sep_points(config['N'], config['M'])
+        self._config = config
         self._parse_internal_data(config)
         self._build_robot(config)
 
@@ -45,9 +50,24 @@ class World(object):
         self._d1 = config['d1']
         self._d2 = config['d2']
         self._runs = config['runs']
+        self._dense = config.get('dense?', False)
+        self._tables = config.get('tables?', False)
+        self._model = False
         self._crun = 0
         self._rec = 0
         self._p = 0
+        self._walls = worldfile.get_map(config)
+        if self._walls is not None:
+            self._build_fields()
+
+    def _build_fields(self):
+        """
+        Precomputes the distances to the obstacles. The sensor values are
+        then read from the distance fields.
+        """
+        self._fields = fields.distance_fields(self._walls, self._N, self._M,
+                self._D)
+        self._get_sensors = self._get_field_sensors
 
     def _build_robot(self, config):
         """
@@ -59,31 +79,155 @@ class World(object):
         d['Q?'] = config['Q?']
         d['___α'] = config['α']
         d['___γ'] = config['γ']
+        d['___λ'] = config.get('λ', 0)
+        if config.get('replay'):
+            d['replay'] = config['replay']
+            d['minibatch'] = config.get('minibatch', replay.MINIBATCH)
+            d['replay every'] = config.get('replay every', replay.EVERY)
+            d['D'] = self._D
+        if config.get('planning'):
+            d['planning'] = config['planning']
+            d['plan steps'] = config.get('plan steps', planning.BUDGET)
+            d['plan threshold'] = config.get('plan threshold',
+                    planning.THRESHOLD)
+        if self._dense:
+            d['states'] = state_count(self._D)
+        self._rng = d['rng'] = rng.RandomStream(config.get('seed'))
         self._robot = robot.Robot(d)
         self._ror = self._oror = ROBOT_S
+        if self._tables:
+            self._build_tables()
+            self._pos = self._index(self._xs, self._ys, self._oror)
+
+    def _index(self, x, y, o):
+        """
+        Returns the index of a position and orientation in the precomputed
+        tables.
+        """
+        return (x * self._M + y) * ROBOT_W + o - 1
+
+    def _build_tables(self):
+        """
+        Precomputes, for every position and orientation, the state, the reward
+        and the position and orientation reached after each action. Taking a
+        step is then only a matter of looking into these tables.
+        """
+        count = self._N * self._M * ROBOT_W
+        self._tstate = [None] * count
+        self._treward = [0] * count
+        self._tcoords = [None] * count
+        self._tnext = [0] * (len(ACTIONS) * count)
+        for x in xrange(self._N):
+            for y in xrange(self._M):
+                for o in xrange(ROBOT_N, ROBOT_W + 1):
+                    p = self._index(x, y, o)
+                    self._xr, self._yr, self._ror = x, y, o
+                    self._tstate[p] = self._get_state()
+                    self._treward[p] = self._get_reward(self._get_sensors())
+                    self._tcoords[p] = (x, y, o)
+                    for a in ACTIONS:
+                        self._xr, self._yr, self._ror = x, y, o
+                        self._move(a)
+                        self._tnext[len(ACTIONS) * p + a - TURN_RIGHT] = \
+                                self._index(self._xr, self._yr, self._ror)
+        self._xr, self._yr, self._ror = self._xs, self._ys, self._oror
+        self._model = True
+
+    def get_model(self):
+        """
+        Returns the model of the world, as precomputed for the tables (see
+        _build_tables), building it the first time. Positions are indexed by
+        (x * M + y) * 4 + orientation - 1.
+
+        return  tuple (states, rewards, next positions, start position): the
+                state and the reward at each position, the position reached
+                after each action (len(ACTIONS) values for each position, in
+                the order of ACTIONS) and the start position
+        """
+        if not self._model:
+            pos = (self._xr, self._yr, self._ror)
+            self._build_tables()
+            self._xr, self._yr, self._ror = pos
+        return (self._tstate, self._treward, self._tnext,
+                self._index(self._xs, self._ys, self._oror))
+
+    def get_config(self):
+        """
+        Returns the configuration this world was built from.
+        """
+        return self._config
+
+    def get_robot(self):
+        """
+        Returns the robot.
+        """
+        return self._robot
+
+    def get_position(self):
+        """
+        Returns everything needed to continue the simulation from the current
+        step, except for the robot: the position and orientation of the robot
+        and the counters of the current epoch, as a dictionary.
+        """
+        return {'x' : self._xr, 'y' : self._yr, 'o' : self._ror,
+                'crun' : self._crun, 'rec' : self._rec, 'p' : self._p}
+
+    def set_position(self, d):
+        """
+        Restores a position returned by get_position.
+        """
+        self._xr, self._yr, self._ror = d['x'], d['y'], d['o']
+        self._crun, self._rec, self._p = d['crun'], d['rec'], d['p']
+        if self._tables:
+            self._pos = self._index(self._xr, self._yr, self._ror)
+
+    def get_rng(self):
+        """
+        Returns the stream of random numbers used in this world.
+        """
+        return self._rng
+
+    def get_snapshot(self):
+        """
+        Returns what the GUI needs to show the current state of the world: a
+        tuple (x, y, orientation, step in epoch, current total reward).
+        """
+        return (self._xr, self._yr, self._ror, self._crun, self._rec)
 
-    def fill(self, iw):
+    def get_origin(self, x, y):
+        """
+        Returns the origin of the part of the world shown on the GUI when the
+        robot is at x, y. The world is split in N x M screens, the first one
+        starting at (-1, -1) to show the walls.
+        """
+        return ((x + 1) // N * N - 1, (y + 1) // M * M - 1)
+
+    def fill(self, iw, snapshot=None):
         """
         Fills the iw matrix with a part of the world, the part which will be
         shown on the GUI.
 
         That part will surely contain the robot within.
+
+        snapshot    if given, show the robot as in this snapshot (see
+                    get_snapshot) instead of its current position
         """
-        xs = max(filter(lambda x: x <= self._xr, NPOINTS))
-        ys = max(filter(lambda y: y <= self._yr, MPOINTS))
+        if snapshot:
+            xr, yr, ror = snapshot[:3]
+        else:
+            xr, yr, ror = self._xr, self._yr, self._ror
+        xs, ys = self.get_origin(xr, yr)
         for i in xrange(N):
             for j in xrange(M):
-                iw[i][j] = self._at(i + xs, j + ys)
-
-    def _at(self, x, y):
-        """
-        Returns what can be found at x, y
-        """
-        if x < 0 or x >= self._N or y < 0 or y >= self._M:
-            return VOID
-        if x == self._xr and y == self._yr:
-            return self._ror
-        return EMPTY
+                x, y = i + xs, j + ys
+                if x < 0 or x >= self._N or y < 0 or y >= self._M:
+                    iw[i][j] = VOID
+                elif self._walls and self._walls[x * self._M + y]:
+                    iw[i][j] = VOID
+                elif x == xr and y == yr:
+                    iw[i][j] = ror
+                else:
+                    iw[i][j] = EMPTY
 
     def step(self):
         """
@@ -97,16 +241,48 @@ class World(object):
         self._crun += 1
         if self._crun == self._runs:
             # reset state
+            self._robot.end_epoch()
             self._crun = 0
             self._xr, self._yr, self._ror = self._xs, self._ys, self._oror
             _reward = self._rec
             self._rec = 0
+            if self._tables:
+                self._pos = self._index(self._xs, self._ys, self._oror)
+
+        if self._tables:
+            p = self._pos
+            state = self._tstate[p]
+            act = self._robot.step(state)
+            p = self._pos = self._tnext[3 * p + act - TURN_RIGHT]
+            self._xr, self._yr, self._ror = self._tcoords[p]
+            newstate = self._tstate[p]
+            reward = self._treward[p]
+        else:
+            state = self._get_state()
+            act = self._robot.step(state)
+            self._p += 2 * self._p - 100
+            if act == FORWARD:
+                self._p = 0
+            self._move(act)
+            sensors = self._get_sensors()
+            newstate = sensors
+            if self._dense:
+                newstate = encode_state(sensors, self._D)
+            reward = self._get_reward(sensors)
+
+        self._rec += reward
+        self._robot.receive_reward_and_state(state, act, newstate, reward)
+        if self._crun:
+            return (False, self._rec)
+        return (True, _reward)
 
-        state = self._get_state()
-        act = self._robot.step(state)
-        self._p += 2 * self._p - 100
+    def _move(self, act):
+        """
+        Updates the position and orientation of the robot after taking an
+        action. The robot cannot leave the grid nor enter an obstacle.
+        """
         if act == FORWARD:
-            self._p = 0
+            x, y = self._xr, self._yr
             if self._ror % 2 == 1:
                 self._yr += self._ror - 2
                 if self._yr < 0:
@@ -119,22 +295,27 @@ class World(object):
                     self._xr = 0
                 if self._xr >= self._N:
                     self._xr = self._N - 1
+            if self._walls and self._walls[self._xr * self._M + self._yr]:
+                self._xr, self._yr = x, y
         elif act == TURN_LEFT:
             self._ror = 1 + self._ror % ROBOT_W
         elif act == TURN_RIGHT:
             self._ror = 1 + (self._ror - 2)% ROBOT_W
 
-        newstate = self._get_state()
-        reward = self._get_reward(newstate)
-        self._rec += reward
-        self._robot.receive_reward_and_state(state, act, newstate, reward)
-        if self._crun:
-            return (False, self._rec)
-        return (True, _reward)
-
     def _get_state(self):
         """
-        Returns the state for a specific position and orientation.
+        Returns the state for the current position and orientation: the
+        sensor values or, if the robot uses an array for its utilities, the
+        code of the sensor values.
+        """
+        state = self._get_sensors()
+        if self._dense:
+            return encode_state(state, self._D)
+        return state
+
+    def _get_sensors(self):
+        """
+        Returns the sensor values for the current position and orientation.
         """
         x, y, o = self._xr, self._yr, self._ror
         # assume that o = ROBOT_N (that is we are facing north)
@@ -148,9 +329,20 @@ class World(object):
         state = state[(o-1):] + state[:(o-1)]
         return tuple(state)
 
+    def _get_field_sensors(self):
+        """
+        Returns the sensor values for the current position and orientation,
+        from the precomputed distance fields (used instead of _get_sensors
+        when the world has obstacles).
+        """
+        i = 4 * (self._xr * self._M + self._yr)
+        o = self._ror - 1
+        s = self._fields[i:i + 4]
+        return tuple(s[o:] + s[:o])
+
     def _get_reward(self, state):
         """
-        Returns the reward for a given state.
+        Returns the reward for the given sensor values.
         """
         for i in state:
             if i < self._d1:
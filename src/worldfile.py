@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Reading of the world description files. Kept outside of config.py because
+# it is also needed when no GUI is available.
+#
+
+from .compat import xrange
+
+# Marks an obstacle in the map of a world.
+WALL = '#'
+
+# Marks a free cell in the map kept in the configuration.
+FREE = '.'
+
+# Lines before the map.
+HEADER_LINES = 5
+
+def read_world(fName, d):
+    """
+    Reads the user provided filename to obtain information about the
+    simulation. Completes the d dictionary with the world's description.
+
+    The file has the following format:
+        N M     size of the grid
+        D       maximum distance given by the sensors
+        xs ys   start position of the robot
+        d1      inner limit of the corridor
+        d2      outer limit of the corridor
+        [map]   optional: M lines of N characters, WALL for an obstacle,
+                anything else for a free cell (line y, column x is the cell
+                at x, y)
+
+    If there is a map, d['map'] is set to its rows, with FREE for each free
+    cell, so that the configuration describes the world even if the file
+    changes later (see get_map).
+
+    fName   name of the file to read
+    d       configuration dictionary to complete
+    return  True if everything is ok
+    """
+    if not fName:
+        return False
+
+    try:
+        with open(fName) as f:
+            l = f.readline()
+            p = l.split()
+            if len(p) != 2:
+                return False
+            d['N'] = int(p[0])
+            d['M'] = int(p[1])
+            l = f.readline()
+            d['D'] = int(l)
+            l = f.readline()
+            p = l.split()
+            if len(p) != 2:
+                return False
+            d['xs'] = int(p[0])
+            d['ys'] = int(p[1])
+            l = f.readline()
+            d['d1'] = int(l)
+            l = f.readline()
+            d['d2'] = int(l)
+            rows = [l.rstrip('\r\n') for l in f if l.strip()]
+    except Exception as e:
+        return False
+    if not (0 <= d['xs'] < d['N'] and 0 <= d['ys'] < d['M']):
+        # the start position must be in the grid
+        return False
+    if rows:
+        walls = parse_map(rows, d['N'], d['M'])
+        if walls is None or walls[d['xs'] * d['M'] + d['ys']]:
+            return False
+        d['map'] = [''.join(WALL if c == WALL else FREE for c in r)
+                for r in rows]
+    return True
+
+def parse_map(rows, N, M):
+    """
+    Parses the map of a world.
+
+    rows    the M lines of the map
+    return  bytearray of N * M flags (cell x, y at x * M + y), non-zero for
+            obstacles, or None if the map is invalid
+    """
+    if len(rows) != M or [r for r in rows if len(r) != N]:
+        return None
+    walls = bytearray(N * M)
+    for y, r in enumerate(rows):
+        walls[y::M] = bytearray(c == WALL for c in r)
+    return walls
+
+def get_map(config):
+    """
+    Returns the map of a configuration, as returned by parse_map, or None if
+    the world has no map. Configurations saved by older versions have the
+    name of the world file instead of the rows of the map, it is read then.
+
+    Raises ValueError if the map is invalid.
+    """
+    m = config.get('map')
+    if not m:
+        return None
+    if isinstance(m, list):
+        walls = parse_map(m, config['N'], config['M'])
+    else:
+        walls = read_map(m, config['N'], config['M'])
+    if walls is None:
+        raise ValueError('invalid map')
+    return walls
+
+def read_map(fName, N, M):
+    """
+    Reads the map of a world file (see read_world).
+
+    return  the map, as returned by parse_map, or None if it is invalid
+    """
+    try:
+        with open(fName) as f:
+            for i in xrange(HEADER_LINES):
+                f.readline()
+            rows = [l.rstrip('\r\n') for l in f if l.strip()]
+    except IOError:
+        return None
+    return parse_map(rows, N, M)
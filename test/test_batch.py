@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Tests for training many robots at once (needs numpy).
+#
+
+import unittest
+
+from src import headless
+from src.compat import has_numpy
+
+if has_numpy():
+    import numpy
+    from src import batch
+
+@unittest.skipUnless(has_numpy(), 'needs numpy')
+class ColumnsTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = numpy.random.RandomState(1)
+        # few values, to have many ties
+        self.qs = rng.randint(-2, 3, size=(500, 3)).astype(float)
+        self.u = rng.random_sample(500)
+
+    def test_row_max(self):
+        self.assertTrue((batch.row_max(self.qs) == self.qs.max(axis=1)).all())
+
+    def test_best_columns_last_on_ties(self):
+        best = 2 - self.qs[:, ::-1].argmax(axis=1)
+        self.assertTrue((batch.best_columns(self.qs) == best).all())
+
+    def test_softmax_choices(self):
+        z = numpy.exp((self.qs - self.qs.max(axis=1)[:, None]) / .7)
+        z = z.cumsum(axis=1)
+        expected = (z <= (self.u * z[:, -1])[:, None]).sum(axis=1)
+        got = batch.softmax_choices(self.qs, .7, self.u)
+        self.assertTrue((got == expected.clip(0, 2)).all())
+
+@unittest.skipUnless(has_numpy(), 'needs numpy')
+class TrainTest(unittest.TestCase):
+
+    def test_repeatable(self):
+        for settings in [{}, {'Q?' : False, 'greedy?' : False}]:
+            c = headless.build_config('test/3/3.txt', settings)
+            a = batch.train(c, 5, 3, 0, 7)
+            self.assertEqual(a, batch.train(c, 5, 3, 0, 7))
+            self.assertEqual([len(r) for r in a], [3] * 5)
+
+    def test_greedy_without_exploring(self):
+        # with ε = 0 only the new states get random actions
+        c = headless.build_config('test/1/1.txt', {'ε/τ' : 0.})
+        w = batch.BatchWorld(c, 50, 3)
+        robots = w._robots
+        robots._Q[:, :, 0] = 1.0
+        robots._seen[:] = True
+        for i in range(20):
+            self.assertTrue((robots.step(w._state) == 0).all())
+            robots.end_epoch()
+
+if __name__ == '__main__':
+    unittest.main()
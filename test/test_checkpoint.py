@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Tests for the checkpoints: what is restored and continuing a run from them.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from src import checkpoint
+from src import headless
+from src import rewardlog
+
+# Settings of the runs which are checkpointed and continued.
+RUNS = [
+        {},
+        {'Q?' : False, 'greedy?' : False, 'ε/τ' : 1.},
+        {'dense?' : True, 'tables?' : True},
+        {'Q?' : False, 'λ' : .8, 'γ' : .9},
+        {'λ' : .8, 'γ' : .9, 'dense?' : True},
+        {'replay' : 50, 'minibatch' : 8},
+        {'planning' : 'dyna', 'Q?' : False},
+        {'planning' : 'sweep', 'dense?' : True},
+        ]
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.fName = os.path.join(self.dir, 'ckpt')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def config(self, settings):
+        d = {'seed' : 5, 'runs' : 50}
+        d.update(settings)
+        return headless.build_config('test/3/3.txt', d)
+
+    def test_round_trip(self):
+        for settings in RUNS:
+            t = headless.Trainer(self.config(settings))
+            t.run(7, 20)
+            w = t.get_world()
+            checkpoint.save(self.fName, w, {'epochs' : 7})
+            v, extra = checkpoint.load(self.fName)
+            self.assertEqual(extra, {'epochs' : 7})
+            self.assertEqual(v.get_config(), w.get_config())
+            self.assertEqual(v.get_position(), w.get_position())
+            self.assertEqual(v.get_rng().get_state(), w.get_rng().get_state())
+            r, s = v.get_robot(), w.get_robot()
+            self.assertEqual(r.get_pending_action(), s.get_pending_action())
+            p, q = r.get_table(), s.get_table()
+            if settings.get('dense?'):
+                self.assertEqual(p.get_buffers(), q.get_buffers())
+            else:
+                self.assertEqual(sorted(p.states()), sorted(q.states()))
+                for state in q.states():
+                    self.assertEqual(p.row(state), q.row(state))
+
+    def test_not_a_checkpoint(self):
+        rewardlog.save([1, 2], self.fName)
+        self.assertRaises(ValueError, checkpoint.Checkpoint, self.fName)
+
+    def test_resume_same_rewards(self):
+        for settings in RUNS:
+            full = headless.Trainer(self.config(settings)).run(30)
+            t = headless.Trainer(self.config(settings), ckpt=self.fName)
+            first = list(t.run(12, 300))
+            # a new process, which only has the checkpoint
+            cp = checkpoint.Checkpoint(self.fName)
+            t = headless.Trainer(cp.get_config())
+            t.restore(cp)
+            cp.close()
+            self.assertEqual(t.get_epochs(), len(first))
+            rest = t.run(30 - len(first))
+            self.assertEqual(first + rest, full, settings)
+
+    def test_resume_command(self):
+        out = os.path.join(self.dir, 'full.qlrl')
+        part = os.path.join(self.dir, 'part.qlrl')
+        common = ['-s', '5', '-r', '50', '-S', 'test/3/3.txt']
+        self.assertTrue(headless.main(['-n', '30', '-o', out] + common))
+        resume = ['-o', part, '-c', self.fName, '--every', '4', '--resume']
+        # stopped after 10 epochs and a few steps of the next one
+        self.assertTrue(headless.main(['-k', '520'] + resume + common))
+        self.assertEqual(len(rewardlog.load(part)), 10)
+        self.assertTrue(headless.main(['-n', '30'] + resume + common))
+        a, b = rewardlog.RewardLog(out), rewardlog.RewardLog(part)
+        self.assertEqual(b.rewards(), a.rewards())
+        self.assertEqual(b.steps(), a.steps())
+        a.close()
+        b.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Tests for comparing and plotting runs. Run all the tests, from the top
+# directory, with:
+#
+#   python -m unittest discover -s test
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from src import cmp_plot
+from src import rewardlog
+
+class PlotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.empty = os.path.join(self.dir, 'empty.qlrl')
+        self.full = os.path.join(self.dir, 'r1.qlrl')
+        self.png = os.path.join(self.dir, 'out.png')
+        rewardlog.save([], self.empty)
+        rewardlog.save([1, -2, 3, 5], self.full)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_plot_no_rows(self):
+        cmp_plot.plot_png(self.png, [], None, [.1, .5, .9])
+        self.assertTrue(os.path.getsize(self.png) > 0)
+
+    def test_cmp_skips_empty_log(self):
+        self.assertTrue(cmp_plot.main(['-p', self.png, self.empty,
+            self.full]))
+        self.assertTrue(os.path.getsize(self.png) > 0)
+
+    def test_cmp_only_empty_logs(self):
+        self.assertTrue(cmp_plot.main(['-p', self.png, self.empty]))
+        self.assertFalse(os.path.exists(self.png))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Tests for training without the GUI.
+#
+
+import unittest
+
+from src import headless
+from src import sweep
+
+class SettingsTest(unittest.TestCase):
+
+    def test_warm_start_needs_gamma_below_1(self):
+        self.assertEqual(headless.parse_settings([('-W', ''),
+            ('-g', '1')]), None)
+        self.assertEqual(headless.parse_settings([('-W', ''),
+            ('-g', '1.5')]), None)
+        d = headless.parse_settings([('-W', ''), ('-g', '.9')])
+        self.assertTrue(d['warm?'])
+        self.assertTrue(headless.parse_settings([('-W', '')])['warm?'])
+        # without warm start, γ = 1 is allowed
+        self.assertEqual(headless.parse_settings([('-g', '1')])['γ'], 1)
+
+    def test_sweep_warm_start_needs_gamma_below_1(self):
+        self.assertEqual(sweep.parse_grid([('-W', ''), ('-g', '.5,1')]),
+                None)
+        self.assertTrue(sweep.parse_grid([('-W', ''), ('-g', '.5,.9')]))
+
+    def test_sweep_max_steps_positive(self):
+        self.assertEqual(sweep.parse_grid([('-r', '0')]), None)
+        self.assertEqual(sweep.parse_grid([('-r', '-5')]), None)
+        self.assertEqual(sweep.parse_grid([('-r', '50')])[1]['runs'], 50)
+        self.assertFalse(sweep.main(['-r', '0', '-n', '2', 'test/1/1.txt']))
+
+if __name__ == '__main__':
+    unittest.main()
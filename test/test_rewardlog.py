@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Tests for the reward logs.
+#
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from src import rewardlog
+from src.compat import str_keys
+
+class RewardLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.fName = os.path.join(self.dir, 'r.qlrl')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_save_load(self):
+        config = {'N' : 4, 'α' : .5, 'map' : ['.#', '..']}
+        rewards = [1, -2.5, 300, 0]
+        rewardlog.save(rewards, self.fName, config)
+        self.assertTrue(rewardlog.is_reward_log(self.fName))
+        self.assertEqual(rewardlog.load(self.fName), rewards)
+        log = rewardlog.RewardLog(self.fName)
+        self.assertEqual(len(log), 4)
+        self.assertFalse(log.has_steps())
+        self.assertEqual(str_keys(log.get_config()), config)
+        self.assertEqual(log.rewards(1, 3), [-2.5, 300])
+        log.close()
+
+    def test_empty(self):
+        rewardlog.save([], self.fName)
+        self.assertEqual(rewardlog.load(self.fName), [])
+        log = rewardlog.RewardLog(self.fName)
+        self.assertEqual((len(log), log.get_config()), (0, {}))
+        log.close()
+
+    def test_steps(self):
+        w = rewardlog.RewardLogWriter(self.fName, steps=True)
+        for r, s in [(5, 100), (-7, 200), (2, 300)]:
+            w.append(r, s)
+        w.close()
+        log = rewardlog.RewardLog(self.fName)
+        self.assertTrue(log.has_steps())
+        self.assertEqual(log.rewards(), [5, -7, 2])
+        self.assertEqual(log.steps(), [100, 200, 300])
+        log.close()
+
+    def test_resume(self):
+        w = rewardlog.RewardLogWriter(self.fName, {'N' : 4}, steps=True)
+        for r in range(3):
+            w.append(r, 10 * r)
+        w.close()
+        # half a record, as left by a killed process
+        with open(self.fName, 'ab') as f:
+            f.write(b'\0' * 5)
+        w = rewardlog.RewardLogWriter(self.fName, steps=True, resume=True)
+        w.append(3, 30)
+        w.close()
+        log = rewardlog.RewardLog(self.fName)
+        self.assertEqual(log.get_config(), {'N' : 4})
+        self.assertEqual(log.rewards(), [0, 1, 2, 3])
+        self.assertEqual(log.steps(), [0, 10, 20, 30])
+        log.close()
+
+    def test_resume_incompatible(self):
+        rewardlog.save([1, 2], self.fName)
+        self.assertRaises(ValueError, rewardlog.RewardLogWriter, self.fName,
+                steps=True, resume=True)
+
+    def test_truncate(self):
+        w = rewardlog.RewardLogWriter(self.fName)
+        for r in range(5):
+            w.append(r)
+        w.truncate(2)
+        w.append(9)
+        w.close()
+        self.assertEqual(rewardlog.load(self.fName), [0, 1, 9])
+
+    def test_convert_pickle(self):
+        old = os.path.join(self.dir, 'old')
+        with open(old, 'wb') as f:
+            pickle.dump([3, -4, 5], f, 2)
+        self.assertFalse(rewardlog.is_reward_log(old))
+        self.assertEqual(rewardlog.load(old), [3, -4, 5])
+        rewardlog.convert(old, self.fName)
+        self.assertEqual(rewardlog.load(self.fName), [3, -4, 5])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Tests for the action selection of the robot and the tables it reads.
+#
+
+import itertools
+import unittest
+
+from src import qtable
+from src import rng
+from src import robot
+from src.globaldefs import ACTIONS
+
+class SelectionTest(unittest.TestCase):
+
+    def test_best_column_like_max(self):
+        for row in itertools.product([-1.0, 0.0, 2.5], repeat=3):
+            self.assertEqual(ACTIONS[qtable.best_column(row, 0)],
+                    max(zip(row, ACTIONS))[1], row)
+
+    def test_locate_reads_in_place(self):
+        for t in [qtable.DictQTable(), qtable.DenseQTable(4)]:
+            t.set_row(2, [1.0, 3.0, -2.0])
+            buf, i = t.locate(2)
+            self.assertEqual(list(buf[i:i + 3]), [1.0, 3.0, -2.0])
+            self.assertEqual(t.best(2), 3.0)
+            t.update(2, ACTIONS[2], 10.0)
+            self.assertEqual(buf[i + 2], 8.0)
+
+    def test_uniforms_same_as_uniform(self):
+        a, b = rng.RandomStream(3), rng.RandomStream(3)
+        l = a.uniforms(5) + a.uniforms(rng.BLOCK) + a.uniforms(0)
+        self.assertEqual(l, [b.uniform() for i in range(len(l))])
+        self.assertEqual(a.uniform(), b.uniform())
+
+    def test_choose_batch_same_as_choose(self):
+        t = qtable.DenseQTable(3)
+        for s in range(3):
+            t.set_row(s, [s, -s, 2.0 * s])
+        buf, i = t.locate(0)
+        sm = robot.Softmax(.7)
+        a, b = rng.RandomStream(5), rng.RandomStream(5)
+        got = sm.choose_batch(buf, [0, 3, 6, 3], a)
+        self.assertEqual(got, [sm.choose(buf, b.uniform(), o)
+            for o in [0, 3, 6, 3]])
+
+    def test_gibbs_choice_reuses_selector(self):
+        pairs = [(0.0, 'a'), (100.0, 'b'), (0.0, 'c')]
+        self.assertEqual(robot.gibbs_choice(pairs, .01), 'b')
+        s = robot._gibbs
+        self.assertEqual(robot.gibbs_choice(pairs, .01), 'b')
+        self.assertTrue(robot._gibbs is s)
+        self.assertEqual(robot.gibbs_choice(pairs[:2], .01), 'b')
+        self.assertEqual(len(robot._gibbs), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Tests for searching the grid of settings.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from src import search
+
+class AdvanceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        base = os.path.join(self.dir, 'run')
+        self.files = (base + '.rl', base + '.cp')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def advance(self, epochs, **settings):
+        d = {'seed' : 3}
+        d.update(settings)
+        return search.advance(('run', 'test/1/1.txt', d, epochs) +
+                self.files)
+
+    def test_continues_checkpoint(self):
+        first = self.advance(2)
+        self.assertEqual(first[2:], (2, first[3], 2))
+        again = self.advance(2)
+        self.assertEqual(again, first[:4] + (0,))
+        self.assertEqual(self.advance(4)[4], 2)
+
+    def test_other_settings_start_again(self):
+        self.advance(2)
+        self.assertEqual(self.advance(2, seed=99)[4], 2)
+        self.assertEqual(self.advance(2, seed=99, runs=50)[4], 2)
+        self.assertEqual(self.advance(2, seed=99, runs=50)[4], 0)
+
+if __name__ == '__main__':
+    unittest.main()
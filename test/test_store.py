@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Tests for the keys of the runs kept in a store.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from src import headless
+from src import store
+
+class KeyTest(unittest.TestCase):
+
+    def config(self, world, **settings):
+        return headless.build_config('test/{0}/{0}.txt'.format(world),
+                settings)
+
+    def test_key_stable(self):
+        # changing these keys drops all the stored runs, change
+        # store.VERSION instead if the results of a run change
+        self.assertEqual(store.run_key(self.config(1, seed=1), 10, 0),
+                'fec5f81845584129d39c2a8afd0b3916ee343ed6')
+        self.assertEqual(store.run_key(self.config(3, seed=3), 50, 0),
+                '7cb148acb9d1dd3c5ab1fe6b2b740ae1b285fc56')
+
+    def test_normalize(self):
+        d = store.normalize(self.config(1, seed=1), 10, 0)
+        self.assertEqual(d, {'D' : 5, 'M' : 8, 'N' : 8, 'Q?' : True,
+            'd1' : 1, 'd2' : 2, 'greedy?' : True, 'runs' : 100, 'seed' : 1,
+            'xs' : 4, 'ys' : 4, 'α' : .1, 'γ' : .1, 'ε/τ' : .1,
+            'epochs' : 10, 'steps' : 0, 'version' : store.VERSION})
+
+    def test_speed_settings_ignored(self):
+        key = store.run_key(self.config(3, seed=3), 50, 0)
+        for extra in [{'dense?' : True}, {'tables?' : True},
+                {'dense?' : True, 'tables?' : True}]:
+            c = self.config(3, seed=3, **extra)
+            self.assertEqual(store.run_key(c, 50, 0), key, extra)
+
+    def test_settings_change_key(self):
+        key = store.run_key(self.config(1, seed=1), 10, 0)
+        self.assertNotEqual(store.run_key(self.config(1, seed=2), 10, 0), key)
+        self.assertNotEqual(store.run_key(self.config(1, seed=1), 11, 0), key)
+        self.assertNotEqual(store.run_key(self.config(1, seed=1), 10, 5), key)
+        c = self.config(1, seed=1, **{'α' : .2})
+        self.assertNotEqual(store.run_key(c, 10, 0), key)
+
+    def test_defaults_and_floats(self):
+        key = store.run_key(self.config(1, seed=1, **{'γ' : 1}), 10, 0)
+        c = self.config(1, seed=1, **{'γ' : 1.0, 'λ' : 0, 'minibatch' : 7})
+        self.assertEqual(store.run_key(c, 10, 0), key)
+        c = self.config(1, seed=1, replay=100)
+        d = self.config(1, seed=1, replay=100, minibatch=32)
+        self.assertEqual(store.run_key(c, 10, 0), store.run_key(d, 10, 0))
+
+    def test_no_seed(self):
+        self.assertEqual(store.run_key(self.config(1), 10, 0), None)
+
+class MapKeyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, rows):
+        fName = os.path.join(self.dir, name)
+        with open(fName, 'w') as f:
+            f.write('4 3\n2\n0 0\n1\n2\n')
+            for r in rows:
+                f.write(r + '\n')
+        return headless.build_config(fName, {'seed' : 1})
+
+    def test_map_contents(self):
+        a = self.write('a.txt', ['.#..', '....', '....'])
+        b = self.write('b.txt', ['x#xx', '....', '....'])
+        c = self.write('c.txt', ['..#.', '....', '....'])
+        self.assertEqual(store.run_key(a, 10, 0), store.run_key(b, 10, 0))
+        self.assertNotEqual(store.run_key(a, 10, 0), store.run_key(c, 10, 0))
+        # as saved by older versions, with the name of the file
+        old = dict(a, map=os.path.join(self.dir, 'a.txt'))
+        self.assertEqual(store.run_key(old, 10, 0), store.run_key(a, 10, 0))
+
+if __name__ == '__main__':
+    unittest.main()
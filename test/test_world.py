@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Tests for the world and its precomputed tables.
+#
+
+import unittest
+
+from src import headless
+from src import world
+
+class ModelTest(unittest.TestCase):
+
+    def test_model_built_once(self):
+        w = world.World(headless.build_config('test/3/3.txt', {}))
+        model = w.get_model()
+        w.step()
+        pos = w.get_position()
+        again = w.get_model()
+        self.assertEqual(again, model)
+        for a, b in zip(again[:3], model[:3]):
+            self.assertTrue(a is b)
+        self.assertEqual(w.get_position(), pos)
+
+    def test_model_same_as_tables(self):
+        plain = world.World(headless.build_config('test/3/3.txt', {}))
+        tables = world.World(headless.build_config('test/3/3.txt',
+            {'tables?' : True}))
+        self.assertEqual(plain.get_model(), tables.get_model())
+
+if __name__ == '__main__':
+    unittest.main()
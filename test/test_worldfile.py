@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#
+# (c) Mihai Maruseac, 341C3 (2011), mihai.maruseac@rosedu.org
+#
+# Tests for reading world files.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from src import worldfile
+
+class ReadWorldTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.fName = os.path.join(self.dir, 'world.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self, start, rows=()):
+        with open(self.fName, 'w') as f:
+            f.write('4 3\n2\n{0}\n1\n2\n'.format(start))
+            for r in rows:
+                f.write(r + '\n')
+        d = {}
+        return (worldfile.read_world(self.fName, d), d)
+
+    def test_start_in_grid(self):
+        ok, d = self.read('3 2')
+        self.assertTrue(ok)
+        self.assertEqual((d['N'], d['M'], d['xs'], d['ys']), (4, 3, 3, 2))
+
+    def test_start_outside_grid(self):
+        for start in ['4 0', '0 3', '-1 0', '0 -1', '9 9']:
+            self.assertFalse(self.read(start)[0], start)
+            self.assertFalse(self.read(start, ['....'] * 3)[0], start)
+
+    def test_start_on_obstacle(self):
+        self.assertFalse(self.read('1 0', ['.#..', '....', '....'])[0])
+        self.assertTrue(self.read('0 0', ['.#..', '....', '....'])[0])
+
+class MapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.fName = os.path.join(self.dir, 'world.txt')
+        with open(self.fName, 'w') as f:
+            f.write('3 2\n2\n0 0\n1\n2\n.#x\n##.\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_map_in_config(self):
+        d = {}
+        self.assertTrue(worldfile.read_world(self.fName, d))
+        self.assertEqual(d['map'], ['.#.', '##.'])
+        walls = worldfile.get_map(d)
+        self.assertEqual(list(walls), [0, 1, 1, 1, 0, 0])
+        # the file is not needed anymore
+        os.remove(self.fName)
+        self.assertEqual(worldfile.get_map(d), walls)
+
+    def test_map_file_name(self):
+        # as saved by older versions
+        d = {'N' : 3, 'M' : 2, 'map' : self.fName}
+        self.assertEqual(list(worldfile.get_map(d)), [0, 1, 1, 1, 0, 0])
+
+    def test_no_map(self):
+        self.assertEqual(worldfile.get_map({'N' : 3, 'M' : 2}), None)
+
+    def test_invalid_map(self):
+        d = {'N' : 3, 'M' : 2, 'map' : ['...']}
+        self.assertRaises(ValueError, worldfile.get_map, d)
+
+if __name__ == '__main__':
+    unittest.main()